@@ -1,11 +1,19 @@
+from datetime import datetime
+
 import streamlit as st
 
-from data_layer import get_metadata_cached, get_sales_df
+import tracing
+from data_layer import (
+    get_data_status,
+    get_metadata_cached,
+    schedule_rerun_queries,
+    start_background_refresh,
+)
 from components.filters_view import render_filters
 from components.map_view import render_map
 from components.tables_view import render_tables
-from components.charts_view import render_charts
-from components.sellers_stores_view import render_sellers_and_stores
+from components.crossfilter_view import render_cross_filtered
+from components.debug_view import render_debug_panel
 
 # =========================
 # Config
@@ -14,6 +22,15 @@ st.set_page_config(page_title="Hexagon", layout="wide")
 
 GREEN = "#b4e060"
 
+# Sonda a marca d'água e mantém os caches quentes em segundo plano (1x por processo)
+start_background_refresh()
+
+# =========================
+# Instrumentação (opcional): painel na sidebar e/ou export JSONL
+# =========================
+debug = tracing.DEBUG or st.query_params.get("debug") == "1"
+trace = tracing.start_trace() if debug or tracing.TRACE_FILE else None
+
 # =========================
 # Header: Logo + Nome
 # =========================
@@ -41,25 +58,30 @@ st.markdown(
 # Estado do app (session_state)
 # =========================
 if "filters" not in st.session_state:
-    min_date, max_date, _, products_all = get_metadata_cached()
+    min_date, max_date, _, prod_df = get_metadata_cached()
     st.session_state.filters = {
         "start_date": min_date,
         "end_date": max_date,
-        "products": list(products_all),
-        "states": [],  # vazio = "Todos" no mapa
+        "products": prod_df["ProductID"].tolist(),  # ProductIDs
+        "states": [],  # StateProvinceIDs; vazio = "Todos" no mapa
     }
 
 f = st.session_state.filters
 
+# =========================
+# Consultas do rerun (disparadas em paralelo)
+# =========================
+batch = schedule_rerun_queries(f)
+
 # =========================
 # Layout: Mapa + Filtros
 # =========================
 map_col, filters_col = st.columns([1.0, 1.75], gap="large")
 
-with map_col:
-    render_map(f)
+with map_col, tracing.span("render_map", "render"):
+    render_map(f, batch=batch)
 
-with filters_col:
+with filters_col, tracing.span("render_filters", "render"):
     render_filters(f)
 
 st.divider()
@@ -67,12 +89,8 @@ st.divider()
 # =========================
 # Dados filtrados finais
 # =========================
-df = get_sales_df(
-    f["start_date"],
-    f["end_date"],
-    tuple(f["states"]),
-    tuple(f["products"]),
-)
+with tracing.span("wait_sales", "data"):
+    df = batch.result("sales")
 
 # =========================
 # RESULTADOS (VERDE)
@@ -82,22 +100,38 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
+# Idade dos dados: com pedidos novos a tela mostra o resultado anterior
+# enquanto o recálculo roda em segundo plano
+status = get_data_status(f)
+if status is not None:
+    age_min = int(status["age_s"] // 60)
+    st.caption(
+        f"Dados carregados às {datetime.fromtimestamp(status['fetched_at']):%H:%M:%S}"
+        + (f" (há {age_min} min)" if age_min else "")
+        + (" · atualizando em segundo plano" if status["stale"] or status["refreshing"] else "")
+    )
+
 total_sales = float(df["SalesValue"].sum()) if not df.empty else 0.0
 k1, k2, k3 = st.columns(3)
 k1.metric("Vendas (R$)", f"{total_sales:,.2f}")
 k2.metric("Linhas", f"{len(df):,}")
 k3.metric("Estados filtrados", f"{len(f['states']) if f['states'] else 'Todos'}")
 
-render_tables(df)
+with tracing.span("render_tables", "render"):
+    render_tables(df)
 
 st.divider()
 
 # =========================
-# VISUALIZAÇÕES (AGORA O TÍTULO + BOTÃO FICAM DENTRO DO COMPONENTE)
+# VISUALIZAÇÕES + VENDEDORES/LOJAS (cross-filter: cliques sem ir ao banco)
 # =========================
-render_charts(df)
+with tracing.span("wait_crossfilter", "data"):
+    xf = batch.result("crossfilter")
 
-st.divider()
+render_cross_filtered(xf, top_n=10)
 
-render_sellers_and_stores(f, top_n=10)
+if trace is not None:
+    tracing.finish_trace(trace)
+    if debug:
+        render_debug_panel(trace)
 
@@ -0,0 +1,130 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+from datetime import date, datetime
+
+try:
+    import duckdb
+except ImportError:  # DuckDB é opcional (só para HEXAGON_BACKEND=duckdb)
+    duckdb = None
+
+# "mssql" (padrão), "duckdb" ou "sqlite"
+BACKEND = os.environ.get("HEXAGON_BACKEND", "mssql").lower()
+
+# Arquivo do banco local (duckdb/sqlite); ":memory:" para um banco efêmero
+DB_PATH = os.environ.get("HEXAGON_DB_PATH", "hexagon.duckdb")
+
+ODBC_CONNECTION_STRING = os.environ.get(
+    "HEXAGON_ODBC",
+    "DRIVER={ODBC Driver 17 for SQL Server};"
+    "SERVER=localhost;"
+    "DATABASE=AdventureWorks2025;"
+    "Trusted_Connection=yes;"
+    "MARS_Connection=yes;",
+)
+
+# Schemas do AdventureWorks usados pelo app
+SCHEMAS = ("Sales", "Person", "Production", "dbo")
+
+# Adaptadores explícitos (os padrões do sqlite3 estão obsoletos no 3.12+)
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(" "))
+
+# =========================
+# Dialetos
+# =========================
+Dialect = namedtuple(
+    "Dialect",
+    [
+        "name", "day_template", "concat_op", "id_list", "list_param", "year_month_template",
+    ],
+)
+
+def _json_list(values):
+    return json.dumps(values)
+
+# Listas de IDs vão em um único parâmetro (JSON ou array): o texto do SQL
+# não muda com o tamanho da seleção e o plano em cache é reaproveitado
+MSSQL = Dialect(
+    "mssql", "CAST({} AS DATE)", "+",
+    "(SELECT CAST(value AS INT) FROM OPENJSON(?))", _json_list,
+    "YEAR({0}) * 100 + MONTH({0})",
+)
+DUCKDB = Dialect(
+    "duckdb", "CAST({} AS DATE)", "||",
+    "(SELECT UNNEST(CAST(? AS BIGINT[])))", list,
+    "YEAR({0}) * 100 + MONTH({0})",
+)
+SQLITE = Dialect(
+    "sqlite", "date({})", "||",
+    "(SELECT value FROM json_each(?))", _json_list,
+    "CAST(strftime('%Y%m', {0}) AS INTEGER)",
+)
+
+def dialect_of(conn):
+    if isinstance(conn, sqlite3.Connection):
+        return SQLITE
+    if type(conn).__name__ == "DuckDBPyConnection":
+        return DUCKDB
+    return MSSQL
+
+def day(dialect, expr):
+    """Expressão que trunca `expr` (datetime) para a data."""
+    return dialect.day_template.format(expr)
+
+def year_month(dialect, expr):
+    """Chave inteira AAAAMM de `expr` (data ou datetime)."""
+    return dialect.year_month_template.format(expr)
+
+def concat(dialect, *parts):
+    return f" {dialect.concat_op} ".join(parts)
+
+def id_list(dialect, values):
+    """(trecho SQL para `x IN <trecho>`, parâmetro único com os IDs)."""
+    return dialect.id_list, dialect.list_param([int(v) for v in values])
+
+# =========================
+# Conexões
+# =========================
+def _connect_mssql():
+    # Import tardio: os backends locais rodam em máquinas sem o driver ODBC
+    import pyodbc
+
+    # MARS habilitado na string padrão: várias consultas na mesma conexão
+    return pyodbc.connect(ODBC_CONNECTION_STRING)
+
+def _connect_sqlite(path):
+    cn = sqlite3.connect(path, check_same_thread=False)
+    # Cada schema é o mesmo arquivo anexado com outro nome, assim
+    # `Sales.SalesOrderHeader` resolve igual ao SQL Server
+    # (em ":memory:" cada schema é um banco em memória separado)
+    for schema in SCHEMAS:
+        cn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+    return cn
+
+_duckdb_roots = {}
+_duckdb_lock = threading.Lock()
+
+def _connect_duckdb(path):
+    if duckdb is None:
+        raise RuntimeError("HEXAGON_BACKEND=duckdb requer o pacote duckdb")
+    # Uma instância por arquivo; cada conexão do pool é um cursor dela
+    # (cursores DuckDB são conexões independentes, seguras entre threads)
+    with _duckdb_lock:
+        root = _duckdb_roots.get(path)
+        if root is None:
+            root = _duckdb_roots[path] = duckdb.connect(path)
+    return root.cursor()
+
+def connect(backend=None, path=None):
+    backend = backend or BACKEND
+    path = path or DB_PATH
+    if backend == "mssql":
+        return _connect_mssql()
+    if backend == "sqlite":
+        return _connect_sqlite(path)
+    if backend == "duckdb":
+        return _connect_duckdb(path)
+    raise ValueError(f"backend desconhecido: {backend}")
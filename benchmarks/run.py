@@ -0,0 +1,352 @@
+"""
+Benchmark da camada de dados e das agregações dos componentes.
+
+    python benchmarks/run.py --scales 1 10 100
+    python benchmarks/run.py --compare antes.json depois.json
+
+Roda contra bancos gerados por localdb.py (um por escala, reaproveitados em
+benchmarks/.data/) e grava um JSON com min/mediana/p95 de cada medição em
+benchmarks/results/<commit>.json, para comparar commits.
+
+Grupos medidos por escala:
+- db: consultas de db.py direto na conexão, sem cache algum
+- cube: montagem do cubo e consultas em memória
+- app/<motor>: funções do data_layer com cache frio (tudo limpo) e quente
+- sequence/<motor>: sequência típica de filtros, do rerun às agregações
+- components: agregações de render_tables / render_charts
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+# Antes de importar o app: cache em disco isolado do cache real
+CACHE_DIR = Path(tempfile.mkdtemp(prefix="hexagon-bench-"))
+os.environ["HEXAGON_CACHE_DIR"] = str(CACHE_DIR)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import streamlit as st  # noqa: E402
+from streamlit.logger import set_log_level  # noqa: E402
+
+# Sem servidor não há ScriptRunContext: silencia os avisos de "bare mode"
+set_log_level("error")
+
+import backends  # noqa: E402
+import data_layer  # noqa: E402
+import db  # noqa: E402
+import localdb  # noqa: E402
+from query_log import QUERY_LOG  # noqa: E402
+from components.charts_view import bar_frame, line_frame  # noqa: E402
+from components.tables_view import month_totals, product_totals, state_totals  # noqa: E402
+from cube import SalesCube  # noqa: E402
+
+DATA_DIR = ROOT / "benchmarks" / ".data"
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+ENGINES = ("cube", "sql")
+
+# =========================
+# Medição
+# =========================
+def _measure(fn, repeat, setup=None):
+    times = []
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return times, result
+
+def _rows(result):
+    if isinstance(result, tuple):
+        return sum(len(r) for r in result if isinstance(r, pd.DataFrame))
+    return len(result) if hasattr(result, "__len__") else None
+
+def _record(results, scale, group, name, case, times, result=None):
+    values = np.asarray(times)
+    results.append(
+        {
+            "scale": scale,
+            "group": group,
+            "name": name,
+            "case": case,
+            "n": len(values),
+            "min_ms": round(float(values.min()), 3),
+            "median_ms": round(float(np.median(values)), 3),
+            "p95_ms": round(float(np.percentile(values, 95)), 3),
+            "mean_ms": round(float(values.mean()), 3),
+            "rows": _rows(result),
+        }
+    )
+    print(f"  x{scale:<5g} {group:<16} {name:<28} {case:<6} {np.median(values):10.2f} ms")
+
+def _clear_app_caches():
+    # Cache "frio": caches do Streamlit, cubo, pool e Parquet em disco
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+# =========================
+# Banco por escala
+# =========================
+def _database(backend, scale):
+    suffix = "duckdb" if backend == "duckdb" else "sqlite"
+    path = DATA_DIR / f"{backend}-x{scale:g}-v{localdb.SCHEMA_VERSION}.{suffix}"
+    if not path.exists():
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        print(f"gerando {path.name} ...")
+        cn = backends.connect(backend, str(path))
+        localdb.build(cn, scale=scale)
+        cn.close()
+    return str(path)
+
+def _filter_sequence(min_date, max_date, state_ids, product_ids):
+    """Interações típicas: abrir, estreitar datas, estados, produtos, voltar."""
+    last_quarter = max(min_date, max_date - timedelta(days=90))
+    all_products = tuple(product_ids)
+    few_products = all_products[:10]
+    return [
+        ("initial", (min_date, max_date, (), all_products)),
+        ("last_quarter", (last_quarter, max_date, (), all_products)),
+        ("three_states", (last_quarter, max_date, tuple(state_ids[:3]), all_products)),
+        ("ten_products", (last_quarter, max_date, tuple(state_ids[:3]), few_products)),
+        ("one_state", (last_quarter, max_date, tuple(state_ids[:1]), few_products)),
+        ("back_to_all", (min_date, max_date, (), all_products)),
+    ]
+
+def _render_aggregations(df, xf):
+    state_totals(df)
+    product_totals(df)
+    month_totals(df)
+    bar_frame(xf)
+    line_frame(xf, "Mês")
+    xf.totals("seller", top_n=10)
+    xf.totals("store", top_n=10)
+
+# =========================
+# Grupos
+# =========================
+def bench_db(results, scale, repeat, args):
+    cn = db.get_conn()
+    try:
+        times, result = _measure(lambda: db.get_metadata(cn), repeat)
+        _record(results, scale, "db", "get_metadata", "direct", times, result[2])
+        for name, fn in (
+            ("load_sales_by_state", lambda: db.load_sales_by_state(cn, *args[:2], args[3])),
+            ("load_sales_filtered", lambda: db.load_sales_filtered(cn, *args)),
+            ("load_crossfilter_facts", lambda: db.load_crossfilter_facts(cn, *args)),
+        ):
+            times, result = _measure(fn, repeat)
+            _record(results, scale, "db", name, "direct", times, result)
+    finally:
+        cn.close()
+
+def bench_cube(results, scale, repeat, args):
+    cn = db.get_conn()
+    try:
+        times, cube = _measure(lambda: SalesCube.from_db(cn), max(1, repeat // 2))
+        _record(results, scale, "cube", "from_db", "build", times, cube)
+    finally:
+        cn.close()
+
+    for name, fn in (
+        ("sales_by_state", lambda: cube.sales_by_state(*args[:2], args[3])),
+        ("sales_filtered", lambda: cube.sales_filtered(*args)),
+        ("crossfilter_facts", lambda: cube.crossfilter_facts(*args)),
+    ):
+        times, result = _measure(fn, repeat)
+        _record(results, scale, "cube", name, "warm", times, result)
+
+def bench_app(results, scale, repeat, engine, args):
+    data_layer.ENGINE = engine
+    group = f"app/{engine}"
+    calls = (
+        ("get_metadata_cached", lambda: data_layer.get_metadata_cached()),
+        ("get_map_df", lambda: data_layer.get_map_df(*args[:2], args[3])),
+        ("get_sales_df", lambda: data_layer.get_sales_df(*args)),
+        ("get_crossfilter", lambda: data_layer.get_crossfilter(*args)),
+    )
+
+    # Frio: cada chamada é a primeira depois de limpar todos os caches,
+    # então paga conexão, metadata e (no motor cubo) a montagem do cubo
+    for name, fn in calls:
+        times, result = _measure(fn, repeat, setup=_clear_app_caches)
+        _record(results, scale, group, name, "cold", times, result)
+
+    for name, fn in calls:
+        fn()
+        times, result = _measure(fn, repeat)
+        _record(results, scale, group, name, "warm", times, result)
+
+def bench_sequence(results, scale, repeat, engine, sequence):
+    data_layer.ENGINE = engine
+    group = f"sequence/{engine}"
+
+    def run_step(step_args):
+        start_date, end_date, state_ids, product_ids = step_args
+        batch = data_layer.schedule_rerun_queries(
+            {
+                "start_date": start_date,
+                "end_date": end_date,
+                "states": state_ids,
+                "products": product_ids,
+            }
+        )
+        batch.result("map")
+        df = batch.result("sales")
+        _render_aggregations(df, batch.result("crossfilter"))
+        return df
+
+    # Primeira passada depois de um cache limpo ("cold") e passadas
+    # seguintes com os mesmos filtros já em cache ("warm")
+    for case in ("cold", "warm"):
+        if case == "cold":
+            _clear_app_caches()
+            data_layer.get_metadata_cached()
+        totals = []
+        for _ in range(1 if case == "cold" else repeat):
+            total = 0.0
+            for name, step_args in sequence:
+                times, df = _measure(lambda: run_step(step_args), 1)
+                total += times[0]
+                if case == "cold":
+                    _record(results, scale, group, name, case, times, df)
+            totals.append(total)
+        _record(results, scale, group, "total", case, totals)
+
+def bench_components(results, scale, repeat, df, xf):
+    # Cliques = agregações sobre o cross-filter já em memória
+    top_product = int(bar_frame(xf)["ProductID"].iloc[0]) if len(xf) else None
+    top_month = int(line_frame(xf, "Mês")["YearMonth"].iloc[0]) if len(xf) else None
+    top_seller = int(xf.totals("seller")["SalesPersonID"].iloc[0]) if len(xf) else None
+    for name, fn in (
+        ("state_totals", lambda: state_totals(df)),
+        ("product_totals", lambda: product_totals(df)),
+        ("month_totals", lambda: month_totals(df)),
+        ("bar_frame", lambda: bar_frame(xf)),
+        ("bar_frame_period_click", lambda: bar_frame(xf, {"month": (top_month,)})),
+        ("line_frame", lambda: line_frame(xf, "Mês")),
+        ("line_frame_year", lambda: line_frame(xf, "Ano")),
+        ("line_frame_product_click", lambda: line_frame(xf, "Mês", {"product": (top_product,)})),
+        ("rankings_seller_click", lambda: xf.totals("store", {"seller": (top_seller,)}, top_n=10)),
+    ):
+        times, result = _measure(fn, repeat)
+        _record(results, scale, "components", name, "warm", times, result)
+
+def run_scale(results, backend, scale, repeat):
+    backends.BACKEND = backend
+    backends.DB_PATH = _database(backend, scale)
+    _clear_app_caches()
+
+    cn = db.get_conn()
+    try:
+        min_date, max_date, state_df, prod_df = db.get_metadata(cn)
+    finally:
+        cn.close()
+    product_ids = tuple(prod_df["ProductID"].tolist())
+    state_ids = state_df["StateProvinceID"].tolist()
+    full = (min_date, max_date, (), product_ids)
+
+    bench_db(results, scale, repeat, full)
+    bench_cube(results, scale, repeat, full)
+    for engine in ENGINES:
+        bench_app(results, scale, repeat, engine, full)
+        bench_sequence(
+            results, scale, repeat, engine,
+            _filter_sequence(min_date, max_date, state_ids, product_ids),
+        )
+
+    data_layer.ENGINE = "cube"
+    bench_components(
+        results, scale, repeat, data_layer.get_sales_df(*full), data_layer.get_crossfilter(*full)
+    )
+
+# =========================
+# Comparação entre commits
+# =========================
+def compare(old_path, new_path):
+    def load(path):
+        data = json.loads(Path(path).read_text())
+        return data["meta"], {
+            (r["scale"], r["group"], r["name"], r["case"]): r for r in data["results"]
+        }
+
+    old_meta, old = load(old_path)
+    new_meta, new = load(new_path)
+    print(f"{old_meta['commit']} -> {new_meta['commit']} (mediana; <1 = mais rápido)")
+    for key in sorted(set(old) & set(new)):
+        before, after = old[key]["median_ms"], new[key]["median_ms"]
+        ratio = after / before if before else float("nan")
+        scale, group, name, case = key
+        print(
+            f"  x{scale:<5g} {group:<16} {name:<28} {case:<6}"
+            f" {before:10.2f} -> {after:10.2f} ms  x{ratio:.2f}"
+        )
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do Hexagon")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1, 10, 100])
+    parser.add_argument(
+        "--backend",
+        choices=["duckdb", "sqlite"],
+        default="duckdb" if backends.duckdb is not None else "sqlite",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="arquivo JSON (padrão: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("ANTES", "DEPOIS"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    commit = _commit()
+    results = []
+    try:
+        for scale in args.scales:
+            print(f"escala x{scale:g} ({args.backend})")
+            run_scale(results, args.backend, scale, args.repeat)
+    finally:
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{commit}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    meta = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": args.backend,
+        "repeat": args.repeat,
+    }
+    # Consultas que mais somaram tempo no banco durante toda a rodada
+    offenders = QUERY_LOG.top_offenders().drop(columns="sql").to_dict("records")
+    out.write_text(
+        json.dumps({"meta": meta, "results": results, "top_queries": offenders}, indent=2)
+    )
+    print(f"resultados em {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,477 @@
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pandas as pd
+
+_LOGGER = logging.getLogger(__name__)
+
+# Chaves com acesso nesta janela (s) contam como "quentes" para o refresh proativo
+HOT_WINDOW = 3600
+
+# Copy-on-Write: uma cópia rasa não duplica os dados e qualquer escrita nela
+# copia só a coluna alterada. Padrão (e obrigatório) a partir do pandas 3.0
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+def share_frames(value):
+    """
+    Visão de um resultado em cache (DataFrame ou tupla/lista deles) sem
+    copiar dados. Com Copy-on-Write o chamador pode alterar a visão (nova
+    coluna, atribuição) sem afetar o valor guardado nem as outras sessões.
+    """
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=False)
+    if isinstance(value, (tuple, list)):
+        return type(value)(share_frames(v) for v in value)
+    return value
+
+def value_nbytes(value):
+    """Bytes ocupados por um resultado: DataFrame(s), arrays ou objeto com `nbytes` (cubo)."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (tuple, list)):
+        return sum(value_nbytes(v) for v in value)
+    nbytes = getattr(value, "nbytes", None)
+    if nbytes is not None:
+        return int(nbytes)
+    return sys.getsizeof(value)
+
+class SingleFlight:
+    """
+    Junta chamadas concorrentes com a mesma chave: a primeira executa,
+    as outras esperam e recebem o mesmo resultado (ou a mesma exceção).
+    Ex.: várias sessões abrindo o dashboard com os filtros padrão antes de
+    o cache estar populado disparam uma única consulta.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return call.result()
+
+        try:
+            value = fn()
+        except BaseException as exc:
+            call.set_exception(exc)
+            raise
+        else:
+            call.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
+
+class AgingClock:
+    """
+    Relógio do GreedyDual: sobe até a prioridade de cada entrada removida.
+    Prioridades só são comparáveis entre caches que usam o mesmo relógio.
+    """
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def advance(self, priority):
+        with self._lock:
+            self.value = max(self.value, priority)
+
+class MemoryBudget:
+    """
+    Limite de bytes compartilhado por vários caches (o processo inteiro).
+    Acima do limite, sai a entrada de menor prioridade entre todos eles.
+
+    Um membro implementa nbytes(), victim() -> (prioridade, chave) | None e
+    evict(chave), e calcula as prioridades com `clock` (o mesmo para todos).
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.clock = AgingClock()
+        self._caches = []
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def register(self, cache):
+        with self._lock:
+            self._caches.append(cache)
+
+    def used(self):
+        return sum(cache.nbytes() for cache in self._caches)
+
+    def usage(self):
+        """Bytes por membro (nome -> bytes), para o painel."""
+        return {cache.name: cache.nbytes() for cache in self._caches}
+
+    def enforce(self):
+        with self._lock:
+            while self.used() > self.max_bytes:
+                candidates = [
+                    (victim, cache)
+                    for cache in self._caches
+                    if (victim := cache.victim()) is not None
+                ]
+                if not candidates:
+                    return
+                (_, key), cache = min(candidates, key=lambda item: item[0][0])
+                if cache.evict(key):
+                    self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {"bytes": self.used(), "max_bytes": self.max_bytes, "evictions": self.evictions}
+
+class _Entry:
+    __slots__ = (
+        "value", "version", "fetched_at", "checked_at", "load", "hits", "last_hit",
+        "nbytes", "cost", "priority",
+    )
+
+    def __init__(self, value, version, load, nbytes, cost):
+        self.value = value
+        self.version = version
+        self.fetched_at = time.time()
+        self.checked_at = time.monotonic()
+        self.load = load
+        self.hits = 0
+        self.last_hit = time.monotonic()
+        self.nbytes = nbytes
+        # Segundos que o `load` levou: quanto custa recalcular se a entrada sair
+        self.cost = cost
+        self.priority = 0.0
+
+class SWRCache:
+    """
+    Cache stale-while-revalidate.
+
+    Cada chave guarda o último resultado bom. Uma entrada fica velha quando
+    a versão pedida muda (ex.: pedidos novos) ou quando passa de `ttl`
+    segundos; nesse caso o valor velho é devolvido na hora e o recálculo
+    roda em segundo plano (um por chave). Só a primeira leitura de uma
+    chave espera pelo `load`, e leituras simultâneas dessa mesma chave
+    esperam pela mesma execução (SingleFlight).
+
+    `load(version, stale)` recebe a versão nova e o valor velho (ou None),
+    o que permite atualizações incrementais (ex.: o cubo).
+
+    O tamanho é limitado por `max_entries`, por `max_bytes` e, opcionalmente,
+    por um MemoryBudget compartilhado. A remoção segue o GreedyDual-Size-
+    Frequency: prioridade = relógio + acessos x custo do load / bytes, então
+    saem primeiro as entradas grandes, pouco usadas e baratas de refazer (ex.:
+    que vieram do cache em disco). O relógio sobe a cada remoção, o que
+    envelhece entradas que deixaram de ser usadas.
+    """
+
+    def __init__(
+        self,
+        ttl=None,
+        max_entries=256,
+        copy=None,
+        executor=None,
+        name="cache",
+        max_bytes=None,
+        budget=None,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.name = name
+        self._copy = copy or (lambda value: value)
+        self._executor = executor
+        self._entries = OrderedDict()
+        self._refreshing = {}
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        # Com MemoryBudget o relógio é o do limite: prioridades comparáveis
+        # entre todos os caches que ele controla
+        self._clock = budget.clock if budget is not None else AgingClock()
+        self._budget = budget
+        if budget is not None:
+            budget.register(self)
+
+        self.fresh_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.evictions = 0
+        self.oversized = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=2, thread_name_prefix=f"hexagon-refresh-{self.name}"
+            )
+        return self._executor
+
+    def _is_stale(self, entry, version):
+        if entry.version != version:
+            return True
+        return self.ttl is not None and time.monotonic() - entry.checked_at > self.ttl
+
+    # ---------- leitura ----------
+    def lookup(self, key, load, version=None):
+        """(valor, versão do valor): a versão difere da pedida quando o valor está velho."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                entry.hits += 1
+                entry.last_hit = time.monotonic()
+                entry.priority = self._priority(entry)
+                entry.load = load
+                stale = self._is_stale(entry, version)
+                if stale:
+                    self.stale_hits += 1
+                else:
+                    self.fresh_hits += 1
+                value, served = entry.value, entry.version
+
+        if entry is None:
+            def load_and_store():
+                started = time.perf_counter()
+                value = load(version, None)
+                self._store(key, value, version, load, time.perf_counter() - started)
+                return value
+
+            value = self._flight.do((key, version), load_and_store)
+            return self._copy(value), version
+
+        if stale:
+            self.revalidate(key, version)
+        return self._copy(value), served
+
+    def get(self, key, load, version=None):
+        return self.lookup(key, load, version)[0]
+
+    def peek(self, key):
+        """Valor atual da chave sem contar acesso nem disparar refresh."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else self._copy(entry.value)
+
+    def _store(self, key, value, version, load, cost):
+        nbytes = value_nbytes(value)
+        with self._lock:
+            entry = self._entries.get(key)
+            if self.max_bytes is not None and nbytes > self.max_bytes:
+                # Sozinho já estoura o limite: devolve ao chamador sem guardar
+                self.oversized += 1
+                if entry is not None:
+                    self._remove(key)
+                return
+            if entry is None:
+                entry = self._entries[key] = _Entry(value, version, load, nbytes, cost)
+            else:
+                self._bytes -= entry.nbytes
+                entry.value, entry.version = value, version
+                entry.nbytes, entry.cost = nbytes, cost
+                entry.fetched_at, entry.checked_at = time.time(), time.monotonic()
+            self._bytes += nbytes
+            entry.priority = self._priority(entry)
+            self._entries.move_to_end(key)
+            self._shrink(keep=key)
+        if self._budget is not None:
+            self._budget.enforce()
+
+    # ---------- limite de memória ----------
+    def _priority(self, entry):
+        return self._clock.value + (entry.hits + 1) * max(entry.cost, 1e-6) / max(entry.nbytes, 1)
+
+    def _over_limit(self):
+        if len(self._entries) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self._bytes > self.max_bytes
+
+    def _shrink(self, keep):
+        # A entrada recém-gravada só sai se for a única
+        while self._over_limit() and len(self._entries) > 1:
+            key = min(
+                (k for k in self._entries if k != keep),
+                key=lambda k: self._entries[k].priority,
+            )
+            self._remove(key, evicted=True)
+
+    def _remove(self, key, evicted=False):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.nbytes
+        if evicted:
+            self._clock.advance(entry.priority)
+            self.evictions += 1
+
+    def nbytes(self):
+        return self._bytes
+
+    def victim(self):
+        """(prioridade, chave) da próxima entrada a sair, ou None (usado pelo MemoryBudget)."""
+        with self._lock:
+            if not self._entries:
+                return None
+            return min(
+                ((entry.priority, key) for key, entry in self._entries.items()),
+                key=lambda item: item[0],
+            )
+
+    def evict(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key, evicted=True)
+            return True
+
+    # ---------- recálculo ----------
+    def revalidate(self, key, version=None):
+        """Agenda o recálculo da chave (no máximo um em andamento por chave)."""
+        with self._lock:
+            if key in self._refreshing or key not in self._entries:
+                return self._refreshing.get(key)
+            future = self._get_executor().submit(self._refresh, key, version)
+            self._refreshing[key] = future
+            return future
+
+    def _refresh(self, key, version):
+        try:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is None:
+                return
+            started = time.perf_counter()
+            value = entry.load(version, entry.value)
+            self._store(key, value, version, entry.load, time.perf_counter() - started)
+            self.refreshes += 1
+        except Exception:
+            # Mantém o último valor bom; a próxima leitura tenta de novo
+            self.refresh_errors += 1
+            _LOGGER.exception("falha ao recalcular %s/%r", self.name, key)
+        finally:
+            with self._lock:
+                self._refreshing.pop(key, None)
+
+    def refresh_hot(self, version=None, limit=20):
+        """
+        Recalcula de antemão as `limit` chaves mais acessadas (na última
+        HOT_WINDOW) que estão velhas, antes que algum usuário as peça.
+        """
+        now = time.monotonic()
+        with self._lock:
+            hot = [
+                (entry.hits, key)
+                for key, entry in self._entries.items()
+                if now - entry.last_hit <= HOT_WINDOW and self._is_stale(entry, version)
+            ]
+        hot.sort(key=lambda item: item[0], reverse=True)
+        return [self.revalidate(key, version) for _, key in hot[:limit]]
+
+    def wait(self, timeout=None):
+        """Espera os recálculos em andamento (testes e benchmark)."""
+        with self._lock:
+            pending = list(self._refreshing.values())
+        for future in pending:
+            future.result(timeout=timeout)
+
+    # ---------- introspecção ----------
+    def status(self, key, version=None):
+        """Quando a chave foi carregada, se está velha e se está sendo recalculada."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            return {
+                "fetched_at": entry.fetched_at,
+                "age_s": time.time() - entry.fetched_at,
+                "stale": self._is_stale(entry, version),
+                "refreshing": key in self._refreshing,
+            }
+
+    def entries(self):
+        """Uma linha por entrada: tamanho, acessos, custo do load e prioridade de remoção."""
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    "cache": self.name,
+                    "key": repr(key),
+                    "bytes": entry.nbytes,
+                    "hits": entry.hits,
+                    "cost_ms": round(entry.cost * 1000, 1),
+                    "age_s": round(now - entry.fetched_at),
+                    "priority": entry.priority,
+                }
+                for key, entry in self._entries.items()
+            ]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.fresh_hits + self.stale_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hit_rate": (self.fresh_hits + self.stale_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "oversized": self.oversized,
+                "fresh_hits": self.fresh_hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "refreshing": len(self._refreshing),
+                # Execuções duplicadas evitadas em cache frio
+                "coalesced": self._flight.coalesced,
+            }
+
+class Refresher:
+    """Thread daemon que chama `tick()` a cada `interval` segundos."""
+
+    def __init__(self, tick, interval, name="hexagon-refresher"):
+        self.tick = tick
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.tick()
+            except Exception:
+                _LOGGER.exception("falha no refresh periódico")
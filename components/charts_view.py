@@ -1,7 +1,21 @@
+from functools import partial
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 
+import tracing
+from components.crossfilter_state import (
+    current_selection,
+    describe,
+    has_selection,
+    on_click,
+    render_mode_picker,
+    reset,
+)
+from components.figures import memoized_figure
+from crossfilter import PERIOD_DIMENSIONS, CrossFilter
+
 BG = "#0e1117"
 GREEN = "#b4e060"
 
@@ -28,19 +42,57 @@ def _freeze_axis_margins(fig):
     fig.update_yaxes(automargin=False)
     return fig
 
-def render_charts(df: pd.DataFrame):
-    # =========================
-    # Estado de interação (exclusivo)
-    # =========================
-    if "viz_selected_product" not in st.session_state:
-        st.session_state.viz_selected_product = None
-
-    if "viz_selected_period" not in st.session_state:
-        st.session_state.viz_selected_period = None
-
-    if "viz_period_granularity" not in st.session_state:
-        st.session_state.viz_period_granularity = "Mês"
+# Granularidade do gráfico de linha -> dimensão de período do cross-filter
+PERIOD_BY_GRANULARITY = {"Mês": "month", "Ano": "year"}
+
+# Dimensões limpas pelo "Voltar ao filtro original" desta seção
+CHART_DIMENSIONS = ("product", *PERIOD_DIMENSIONS)
+
+# =========================
+# Agregações (funções puras, também usadas no benchmark)
+# =========================
+def bar_frame(xf: CrossFilter, selection=None):
+    """Vendas por produto sob a seleção de período/vendedor/loja."""
+    return xf.totals("product", selection)
+
+def line_frame(xf: CrossFilter, granularity, selection=None):
+    """Vendas por período sob a seleção de produto/vendedor/loja."""
+    return xf.totals(PERIOD_BY_GRANULARITY[granularity], selection)
+
+# =========================
+# Figuras (reaproveitadas enquanto o agregado não muda)
+# =========================
+@memoized_figure
+def product_bar_figure(sales_by_product: pd.DataFrame):
+    fig_bar = px.bar(
+        sales_by_product,
+        x="Product",
+        y="SalesValue",
+        custom_data=["ProductID"],
+        text_auto=".2s",
+        labels={"Product": "Produto", "SalesValue": "Vendas"},
+    )
+    fig_bar.update_xaxes(tickangle=-45)  # rótulos longos
+    return _freeze_axis_margins(fig_bar)
+
+@memoized_figure
+def period_line_figure(sales_over_time: pd.DataFrame, granularity="Mês"):
+    fig_line = px.line(
+        sales_over_time,
+        x="Period",
+        y="SalesValue",
+        custom_data=[sales_over_time.columns[0]],  # YearMonth / Year
+        markers=True,
+        labels={"Period": granularity, "SalesValue": "Vendas"},
+    )
+    return _freeze_axis_margins(fig_line)
 
+def render_charts(xf: CrossFilter, views: dict):
+    """
+    Barras por produto e linha por período. `views` vem de
+    components/crossfilter_view.py (agregados, muitas vezes pré-calculados
+    pelo prefetch); as figuras são montadas aqui, sob demanda.
+    """
     # =========================
     # Header: título + botão reset (direita)
     # =========================
@@ -53,64 +105,41 @@ def render_charts(df: pd.DataFrame):
         )
 
     with button_col:
-        if st.button(
+        st.button(
             "🔄 Voltar ao filtro original",
             use_container_width=True,
-            disabled=(
-                st.session_state.viz_selected_product is None
-                and st.session_state.viz_selected_period is None
-            ),
+            disabled=not has_selection(CHART_DIMENSIONS),
             key="viz_reset_btn",
-        ):
-            st.session_state.viz_selected_product = None
-            st.session_state.viz_selected_period = None
-            st.rerun()
+            on_click=reset,
+            args=(CHART_DIMENSIONS,),
+        )
 
     # =========================
-    # Controle: "Visualizar por" embaixo do botão (canto direito, estreito)
+    # Controles: modo dos cliques (esquerda) e "Visualizar por" (direita)
     # =========================
     ctrl_left, ctrl_right = st.columns([0.8, 0.2], vertical_alignment="center")
     with ctrl_left:
-        st.write("")  # espaço proposital para manter alinhamento e não ocupar a tela toda
+        render_mode_picker()
 
     with ctrl_right:
-        granularity = st.selectbox(
+        # Trocar a granularidade invalida o período clicado
+        st.selectbox(
             "Visualizar por",
-            ["Mês", "Ano"],
+            list(PERIOD_BY_GRANULARITY),
             index=0,
             key="time_granularity_viz",
+            on_change=reset,
+            args=(PERIOD_DIMENSIONS,),
         )
 
     st.markdown("<div style='margin-bottom:0.5rem;'></div>", unsafe_allow_html=True)
 
-    # Se mudou a granularidade, o filtro de período pode ficar inválido
-    if st.session_state.viz_period_granularity != granularity:
-        st.session_state.viz_period_granularity = granularity
-        st.session_state.viz_selected_period = None
-
     # =========================
-    # Aplicação do cross-filter (exclusivo)
+    # Cross-filter (todas as seleções, inclusive vendedor/loja)
     # =========================
-    df_for_bar = df
-    df_for_line = df
-
-    # Clique em produto -> filtra linha por produto
-    if st.session_state.viz_selected_product:
-        df_for_line = df_for_line[
-            df_for_line["Product"] == st.session_state.viz_selected_product
-        ]
-
-    # Clique em período -> filtra barras por período
-    if st.session_state.viz_selected_period:
-        tmp = df_for_bar.copy()
-        if granularity == "Mês":
-            tmp["__Period"] = tmp["OrderDate"].dt.to_period("M").astype(str)  # YYYY-MM
-        else:
-            tmp["__Period"] = tmp["OrderDate"].dt.year.astype(int).astype(str)  # YYYY
-
-        df_for_bar = tmp[tmp["__Period"] == st.session_state.viz_selected_period].drop(
-            columns=["__Period"]
-        )
+    if current_selection():
+        st.caption(f"Seleção: {describe(xf)}")
+    granularity = views["granularity"]
 
     # =========================
     # Layout: 2 gráficos (alinhados)
@@ -123,45 +152,17 @@ def render_charts(df: pd.DataFrame):
     with g1:
         st.markdown("**Gráfico de Barras — Vendas por Produto**")
 
-        if df_for_bar.empty:
+        if views["product"].empty:
             st.info("Sem dados para os filtros selecionados.")
         else:
-            sales_by_product = (
-                df_for_bar.groupby("Product", as_index=False)["SalesValue"]
-                .sum()
-                .sort_values("SalesValue", ascending=False)
-            )
-
-            fig_bar = px.bar(
-                sales_by_product,
-                x="Product",
-                y="SalesValue",
-                text_auto=".2s",
-                labels={"Product": "Produto", "SalesValue": "Vendas"},
-            )
-            fig_bar.update_xaxes(tickangle=-45)  # rótulos longos
-            fig_bar = _freeze_axis_margins(fig_bar)
-
-            bar_event = st.plotly_chart(
-                fig_bar,
-                use_container_width=True,
-                selection_mode="points",
-                on_select="rerun",
-                key="viz_bar_chart",
-            )
-
-            # Clique exclusivo (produto)
-            if (
-                bar_event
-                and bar_event.selection
-                and bar_event.selection.get("points")
-                and len(bar_event.selection["points"]) > 0
-            ):
-                point = bar_event.selection["points"][0]
-                clicked_product = point.get("x")
-                if clicked_product:
-                    st.session_state.viz_selected_product = clicked_product
-                    st.session_state.viz_selected_period = None
+            with tracing.span("plotly_chart viz_bar_chart", "render"):
+                st.plotly_chart(
+                    product_bar_figure(views["product"]),
+                    use_container_width=True,
+                    selection_mode="points",
+                    on_select=partial(on_click, "viz_bar_chart", "product"),
+                    key="viz_bar_chart",
+                )
 
     # -------------------------
     # 2) Linha — Vendas ao Longo do Tempo (clicável)
@@ -169,54 +170,16 @@ def render_charts(df: pd.DataFrame):
     with g2:
         st.markdown("**Gráfico de Linhas — Vendas ao Longo do Tempo**")
 
-        if df_for_line.empty:
+        if views["period"].empty:
             st.info("Sem dados para os filtros selecionados.")
         else:
-            df_time = df_for_line.copy()
-
-            if granularity == "Mês":
-                df_time["Period"] = df_time["OrderDate"].dt.to_period("M").astype(str)
-                period_label = "Mês"
-                sales_over_time = (
-                    df_time.groupby("Period", as_index=False)["SalesValue"]
-                    .sum()
-                    .sort_values("Period")
+            with tracing.span("plotly_chart viz_line_chart", "render"):
+                st.plotly_chart(
+                    period_line_figure(views["period"], granularity=granularity),
+                    use_container_width=True,
+                    selection_mode="points",
+                    on_select=partial(
+                        on_click, "viz_line_chart", PERIOD_BY_GRANULARITY[granularity]
+                    ),
+                    key="viz_line_chart",
                 )
-            else:
-                df_time["Period"] = df_time["OrderDate"].dt.year.astype(int).astype(str)
-                period_label = "Ano"
-                sales_over_time = (
-                    df_time.groupby("Period", as_index=False)["SalesValue"]
-                    .sum()
-                    .sort_values("Period")
-                )
-
-            fig_line = px.line(
-                sales_over_time,
-                x="Period",
-                y="SalesValue",
-                markers=True,
-                labels={"Period": period_label, "SalesValue": "Vendas"},
-            )
-            fig_line = _freeze_axis_margins(fig_line)
-
-            line_event = st.plotly_chart(
-                fig_line,
-                use_container_width=True,
-                selection_mode="points",
-                on_select="rerun",
-                key="viz_line_chart",
-            )
-
-            # Clique exclusivo (período)
-            if (
-                line_event
-                and line_event.selection
-                and line_event.selection.get("points")
-                and len(line_event.selection["points"]) > 0
-            ):
-                point = line_event.selection["points"][0]
-                clicked_period = point.get("x")
-                if clicked_period:
-                    st.session_state.viz_selected_period = clicked_period
-                    st.session_state.viz_selected_product = None
@@ -0,0 +1,64 @@
+# components/crossfilter_state.py
+import streamlit as st
+
+from crossfilter import CUMULATIVE, EXCLUSIVE, clear, select
+
+# Rótulo do seletor -> semântica do clique
+MODES = {"Exclusivo": EXCLUSIVE, "Cumulativo": CUMULATIVE}
+
+DIMENSION_NAMES = {
+    "seller": "Vendedor",
+    "store": "Loja",
+    "product": "Produto",
+    "month": "Mês",
+    "year": "Ano",
+}
+
+# =========================
+# Seleção compartilhada por todos os gráficos clicáveis
+# (dimensão -> chaves: IDs ou períodos AAAAMM / AAAA)
+# =========================
+def current_selection():
+    if "crossfilter" not in st.session_state:
+        st.session_state.crossfilter = {}
+    return st.session_state.crossfilter
+
+def has_selection(dims):
+    return any(dim in current_selection() for dim in dims)
+
+def _clicked_key(chart_key):
+    # A chave do ponto vem no customdata (IDs, não nomes)
+    points = st.session_state[chart_key].selection.get("points")
+    if not points or points[0].get("customdata") is None:
+        return None
+    custom = points[0]["customdata"]
+    return int(custom[0] if isinstance(custom, (list, tuple)) else custom)
+
+def on_click(chart_key, dim):
+    """Callback de on_select: aplica o clique conforme o modo escolhido."""
+    key = _clicked_key(chart_key)
+    if key is not None:
+        mode = MODES[st.session_state.get("crossfilter_mode", "Exclusivo")]
+        st.session_state.crossfilter = select(current_selection(), dim, key, mode)
+
+def reset(dims):
+    st.session_state.crossfilter = clear(current_selection(), dims)
+
+def describe(xf):
+    """Texto da seleção atual, ex.: "Vendedor: Ana, Bruno · Ano: 2023"."""
+    return " · ".join(
+        f"{DIMENSION_NAMES[dim]}: " + ", ".join(str(xf.label(dim, key)) for key in keys)
+        for dim, keys in current_selection().items()
+    )
+
+def render_mode_picker():
+    st.radio(
+        "Cliques",
+        list(MODES),
+        horizontal=True,
+        key="crossfilter_mode",
+        help=(
+            "Exclusivo: cada clique substitui a seleção. "
+            "Cumulativo: cliques se acumulam (clique de novo para remover)."
+        ),
+    )
@@ -0,0 +1,118 @@
+# components/crossfilter_view.py
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice, zip_longest
+
+import streamlit as st
+
+import tracing
+from components.charts_view import PERIOD_BY_GRANULARITY, bar_frame, line_frame, render_charts
+from components.crossfilter_state import MODES, current_selection
+from components.sellers_stores_view import render_sellers_and_stores
+from crossfilter import DIMENSIONS, select
+from prefetch import PREFETCH_CANDIDATES, PREFETCH_WORKERS, Prefetcher
+
+# =========================
+# Visões (agregados) de uma seleção
+# =========================
+def _views_key(selection, granularity, top_n):
+    return (tuple(sorted(selection.items())), granularity, top_n)
+
+def compute_views(xf, selection, granularity, top_n=10):
+    """
+    Agregados de todos os gráficos clicáveis sob `selection` (cerca de 1 ms
+    cada). As figuras Plotly não entram: o fragmento as monta só para a
+    seleção desenhada, então o prefetch não gasta GIL nem o cache de figuras.
+    """
+    return {
+        "granularity": granularity,
+        "product": bar_frame(xf, selection),
+        "period": line_frame(xf, granularity, selection),
+        "seller": xf.totals("seller", selection, top_n=top_n),
+        "store": xf.totals("store", selection, top_n=top_n),
+    }
+
+# =========================
+# Prefetch dos próximos cliques
+# =========================
+@st.cache_resource(show_spinner=False)
+def _prefetch_executor():
+    # Compartilhado por todas as sessões: é ele que limita a concorrência
+    return ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="hexagon-prefetch")
+
+def _session_prefetcher():
+    if "prefetcher" not in st.session_state:
+        st.session_state.prefetcher = Prefetcher(_prefetch_executor())
+    return st.session_state.prefetcher
+
+def get_prefetch_stats():
+    return _session_prefetcher().stats()
+
+def click_candidates(views, limit=PREFETCH_CANDIDATES):
+    """
+    (dimensão, chave) dos cliques mais prováveis, no máximo `limit` no total:
+    o primeiro item de cada gráfico (rankings, barras e o maior ponto da
+    linha), depois o segundo, e assim por diante.
+    """
+    period_dim = PERIOD_BY_GRANULARITY[views["granularity"]]
+    per_chart = []
+    for dim, frame in (
+        ("seller", views["seller"]),
+        ("store", views["store"]),
+        ("product", views["product"]),
+        (period_dim, views["period"]),
+    ):
+        if dim == period_dim:
+            frame = frame.nlargest(limit, "SalesValue")
+        per_chart.append([(dim, int(key)) for key in frame[DIMENSIONS[dim][0]].head(limit)])
+
+    by_rank = (c for rank in zip_longest(*per_chart) for c in rank if c is not None)
+    return list(islice(by_rank, limit))
+
+def _prefetch_next_clicks(prefetcher, xf, views, top_n):
+    selection = current_selection()
+    mode = MODES[st.session_state.get("crossfilter_mode", "Exclusivo")]
+    granularity = views["granularity"]
+    candidates = {}
+    for dim, key in click_candidates(views):
+        following = select(selection, dim, key, mode)
+        candidates[_views_key(following, granularity, top_n)] = following
+
+    # Candidatos da seleção anterior que ainda nem começaram saem da fila
+    prefetcher.retain(candidates)
+    for views_key, following in candidates.items():
+        prefetcher.schedule(views_key, partial(compute_views, xf, following, granularity, top_n))
+
+@st.fragment
+def render_cross_filtered(xf, top_n: int = 10):
+    """
+    Fragmento com todos os gráficos clicáveis (produto, período, vendedor,
+    loja): um clique em qualquer um reroda só esta parte, e todas as visões
+    saem do mesmo agregado em memória (crossfilter.CrossFilter). Depois de
+    desenhar, os cliques mais prováveis são pré-calculados em segundo plano.
+    """
+    granularity = st.session_state.get("time_granularity_viz", "Mês")
+    selection = current_selection()
+
+    prefetcher = _session_prefetcher()
+    # Filtros globais novos = agregado novo: descarta o que foi pré-calculado
+    prefetcher.reset(xf.generation)
+
+    with tracing.span("crossfilter_views", "data") as current:
+        hits = prefetcher.hits
+        views = prefetcher.get(
+            _views_key(selection, granularity, top_n),
+            partial(compute_views, xf, selection, granularity, top_n),
+        )
+        current.set(cache="prefetch" if prefetcher.hits > hits else "miss")
+
+    with tracing.span("render_charts", "render"):
+        render_charts(xf, views)
+
+    st.divider()
+
+    with tracing.span("render_sellers_and_stores", "render"):
+        render_sellers_and_stores(views)
+
+    if PREFETCH_CANDIDATES > 0:
+        _prefetch_next_clicks(prefetcher, xf, views, top_n)
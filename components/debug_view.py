@@ -0,0 +1,98 @@
+# components/debug_view.py
+import streamlit as st
+import pandas as pd
+
+import tracing
+from components.crossfilter_view import get_prefetch_stats
+from components.figures import figure_cache_stats
+from data_layer import get_cache_entries, get_cache_stats, get_memory_stats
+from query_log import QUERY_LOG
+
+def _span_table(trace):
+    rows = []
+    for record in trace.records():
+        attrs = record["attributes"]
+        rows.append(
+            {
+                "Etapa": record["name"],
+                "Tipo": record["kind"],
+                "ms": record["durationMs"],
+                "Cache": attrs.get("cache", ""),
+                "Linhas": attrs.get("rows"),
+                "Bytes": attrs.get("bytes"),
+                "SQL": attrs.get("sql_fingerprint", ""),
+                "Params": attrs.get("params"),
+            }
+        )
+    return pd.DataFrame(rows).sort_values("ms", ascending=False) if rows else pd.DataFrame()
+
+def render_debug_panel(trace):
+    """Painel opcional (HEXAGON_DEBUG=1 ou ?debug=1) com os spans do rerun."""
+    with st.sidebar:
+        st.markdown("### Desempenho")
+        st.metric("Rerun (ms)", f"{trace.duration_ms:,.1f}")
+
+        spans = _span_table(trace)
+        if spans.empty:
+            st.caption("Nenhum span registrado.")
+        else:
+            queries = spans[spans["Tipo"] == "query"]
+            c1, c2 = st.columns(2)
+            c1.metric("Consultas SQL", len(queries))
+            c2.metric("Linhas lidas", f"{int(queries['Linhas'].fillna(0).sum()):,}")
+            st.dataframe(spans, hide_index=True, use_container_width=True)
+
+        st.markdown("**p50 / p95 do processo**")
+        st.dataframe(
+            tracing.percentiles().sort_values("p95_ms", ascending=False),
+            hide_index=True,
+            use_container_width=True,
+        )
+
+        st.markdown("**Caches em memória**")
+        cache_stats = pd.DataFrame(get_cache_stats()).T
+        memory = get_memory_stats()
+        c1, c2, c3 = st.columns(3)
+        c1.metric(
+            "Memória no limite (MB)",
+            f"{memory['bytes'] / 2**20:,.1f} / {memory['max_bytes'] / 2**20:,.0f}",
+        )
+        c2.metric("Remoções", int(cache_stats["evictions"].fillna(0).sum()))
+        c3.metric("Execuções duplicadas evitadas", int(cache_stats["coalesced"].fillna(0).sum()))
+        figures = figure_cache_stats()
+        st.caption(
+            "No limite: "
+            + ", ".join(
+                f"{name} {size / 2**20:,.1f} MB" for name, size in memory["members"].items()
+            )
+            + f" · fora do limite: cubo {memory['cube_bytes'] / 2**20:,.1f} MB,"
+            f" figuras ~{figures['bytes'] / 2**20:,.1f} MB ({figures['entries']})"
+        )
+        st.dataframe(cache_stats, use_container_width=True)
+        with st.expander("Maiores entradas"):
+            st.dataframe(get_cache_entries(), hide_index=True, use_container_width=True)
+
+        st.markdown("**Prefetch dos cliques (sessão)**")
+        prefetch = get_prefetch_stats()
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Acertos", f"{prefetch['hit_rate']:.0%}")
+        c2.metric("Pré-calculados", prefetch["completed"])
+        c3.metric("Cancelados", prefetch["cancelled"])
+
+        st.markdown("**Consultas que mais custam (processo)**")
+        st.dataframe(QUERY_LOG.top_offenders(), hide_index=True, use_container_width=True)
+
+        slow = QUERY_LOG.slow_queries()
+        st.markdown(f"**Consultas lentas (≥ {QUERY_LOG.threshold_ms:g} ms)**")
+        if slow.empty:
+            st.caption("Nenhuma consulta lenta registrada.")
+        else:
+            slow["time"] = pd.to_datetime(slow["time"], unit="s")
+            st.dataframe(slow.iloc[::-1], hide_index=True, use_container_width=True)
+
+        st.download_button(
+            "Baixar spans (JSONL)",
+            "\n".join(tracing.to_json(r) for r in trace.records()),
+            file_name=f"hexagon-trace-{trace.trace_id}.jsonl",
+            mime="application/jsonl",
+        )
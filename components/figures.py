@@ -0,0 +1,65 @@
+# components/figures.py
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+import tracing
+from cache import value_nbytes
+
+# Figuras guardadas no processo (todas as sessões)
+FIGURE_CACHE_ENTRIES = 256
+
+# Bytes estimados (dados do agregado) das figuras em cache. O cache_resource
+# limita só o número de entradas, então as figuras ficam fora do MemoryBudget;
+# a estimativa espelha o LRU dele para o painel mostrar o total do processo
+_figure_sizes = OrderedDict()
+_sizes_lock = threading.Lock()
+
+def _track(key, df, built):
+    with _sizes_lock:
+        if built or key not in _figure_sizes:
+            _figure_sizes[key] = value_nbytes(df)
+        _figure_sizes.move_to_end(key)
+        while len(_figure_sizes) > FIGURE_CACHE_ENTRIES:
+            _figure_sizes.popitem(last=False)
+
+def figure_cache_stats():
+    with _sizes_lock:
+        return {"entries": len(_figure_sizes), "bytes": sum(_figure_sizes.values())}
+
+def frame_fingerprint(df: pd.DataFrame):
+    """Impressão digital do conteúdo (colunas + valores) de um agregado."""
+    digest = hashlib.sha1("|".join(map(str, df.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def _cached_figure(name, fingerprint, layout, _build, _df, _built):
+    # _build/_df ficam fora da chave: o agregado entra só pela impressão digital
+    _built.append(name)
+    return _build(_df, **dict(layout))
+
+def memoized_figure(build):
+    """
+    Decorador para funções build(df, **layout) -> go.Figure. A figura é
+    reaproveitada enquanto o agregado e o layout não mudam, então o rerun
+    não repete px.bar/px.line/go.Choropleth. A figura é compartilhada entre
+    sessões: quem a recebe não deve alterá-la.
+    """
+    name = f"{build.__module__}.{build.__qualname__}"
+
+    @functools.wraps(build)
+    def wrapper(df, **layout):
+        with tracing.span(f"figure {build.__name__}", "render") as current:
+            built = []
+            key = (name, frame_fingerprint(df), tuple(sorted(layout.items())))
+            figure = _cached_figure(*key, build, df, built)
+            _track(key, df, built)
+            current.set(cache="miss" if built else "memory")
+            return figure
+
+    return wrapper
@@ -1,16 +1,81 @@
 # components/filters_view.py
-import streamlit as st
+import math
+
 import pandas as pd
+import streamlit as st
 
 from data_layer import get_metadata_cached, get_state_df_all, get_products_all
 
 TITLE_GREEN = "#b4e060"
 
+# Produtos por página no seletor: o editor só recebe as linhas visíveis
+PRODUCTS_PAGE_SIZE = 50
+
+ALL_CATEGORIES = "Todas"
+
+# =========================
+# Seletor de produtos (funções puras)
+# =========================
+def filter_products(products: pd.DataFrame, search="", category=ALL_CATEGORIES):
+    """Produtos que batem com a busca (nome, sem caixa) e a categoria."""
+    mask = pd.Series(True, index=products.index)
+    if search:
+        mask &= products["Product"].str.contains(search, case=False, regex=False)
+    if category != ALL_CATEGORIES:
+        mask &= products["Category"] == category
+    return products[mask]
+
+def page_of(products: pd.DataFrame, page, page_size=PRODUCTS_PAGE_SIZE):
+    """(linhas da página, número de páginas); página fora do intervalo é ajustada."""
+    n_pages = max(1, math.ceil(len(products) / page_size))
+    page = min(max(page, 1), n_pages)
+    start = (page - 1) * page_size
+    return products.iloc[start:start + page_size], n_pages
+
+def merge_page(selected: set, page_ids, checked_ids):
+    """Seleção com o que foi marcado/desmarcado na página visível."""
+    return (selected - set(page_ids)) | set(checked_ids)
+
+# =========================
+# Rascunho (só vira filtro no "Aplicar")
+# =========================
+def _draft(filters):
+    if "filters_draft" not in st.session_state:
+        st.session_state.filters_draft = {
+            "states": set(filters["states"]),
+            "products": set(filters["products"]),
+        }
+        # Muda a chave dos editores: marcações antigas não reaparecem
+        st.session_state.filters_editor_rev = st.session_state.get("filters_editor_rev", 0) + 1
+    return st.session_state.filters_draft
+
+def _discard_draft():
+    st.session_state.pop("filters_draft", None)
+
+def _set_draft(kind, ids):
+    st.session_state.filters_draft[kind] = set(ids)
+    st.session_state.filters_editor_rev += 1
+
+def _select_products(ids, selected):
+    products = st.session_state.filters_draft["products"]
+    _set_draft("products", products | set(ids) if selected else products - set(ids))
+
+def _checked(edited, page_ids):
+    return [pid for pid, on in zip(page_ids, edited["Selecionar"]) if on]
+
+@st.fragment
 def render_filters(filters: dict):
+    """
+    Fragmento: marcar estados/produtos, buscar e paginar reroda só os
+    filtros; o app inteiro só reroda no "Aplicar" ou no "Reset geral".
+    """
     min_date, max_date, _, _ = get_metadata_cached()
     state_df_all = get_state_df_all()
     products_all = get_products_all()
 
+    draft = _draft(filters)
+    rev = st.session_state.filters_editor_rev
+
     # Título em azul
     st.markdown(
         f"<h2 style='color:{TITLE_GREEN}; margin-bottom:0.5rem;'>Filtros</h2>",
@@ -23,80 +88,132 @@ def render_filters(filters: dict):
     with col_state:
         st.markdown("**Estado (checkbox)**")
 
-        b1, b2 = st.columns(2)
-        if b1.button("Selecionar todos", key="states_select_all", use_container_width=True):
-            st.session_state.filters["states"] = state_df_all["StateCode"].tolist()
-            st.session_state.pop("regions_editor", None)
-            st.rerun()
+        # Ordem das linhas = state_ids; nomes/códigos só para exibição
+        state_ids = state_df_all["StateProvinceID"].tolist()
 
-        if b2.button("Selecionar nenhum", key="states_select_none", use_container_width=True):
-            st.session_state.filters["states"] = []
-            st.session_state.pop("regions_editor", None)
-            st.rerun()
+        b1, b2 = st.columns(2)
+        b1.button(
+            "Selecionar todos",
+            key="states_select_all",
+            use_container_width=True,
+            on_click=_set_draft,
+            args=("states", state_ids),
+        )
+        b2.button(
+            "Selecionar nenhum",
+            key="states_select_none",
+            use_container_width=True,
+            on_click=_set_draft,
+            args=("states", []),
+        )
 
-        region_tbl = state_df_all.copy()
-        region_tbl["Selecionar"] = region_tbl["StateCode"].isin(filters["states"])
+        region_tbl = state_df_all[["StateName", "StateCode"]].copy()
+        region_tbl.insert(0, "Selecionar", [sid in draft["states"] for sid in state_ids])
 
         edited_regions = st.data_editor(
-            region_tbl[["Selecionar", "StateName", "StateCode"]],
+            region_tbl,
             hide_index=True,
             disabled=["StateName", "StateCode"],
             use_container_width=True,
             height=220,
-            key="regions_editor",
+            key=f"regions_editor_{rev}",
         )
-
-        selected_states_from_table = edited_regions.loc[
-            edited_regions["Selecionar"] == True, "StateCode"
-        ].tolist()
+        draft["states"] = set(_checked(edited_regions, state_ids))
 
     # ---------- PRODUTOS ----------
     with col_prod:
         st.markdown("**Produtos (checkbox)**")
 
-        p1, p2 = st.columns(2)
-        if p1.button("Selecionar todos", key="products_select_all", use_container_width=True):
-            st.session_state.filters["products"] = list(products_all)
-            st.session_state.pop("products_editor", None)
-            st.rerun()
-
-        if p2.button("Selecionar nenhum", key="products_select_none", use_container_width=True):
-            st.session_state.filters["products"] = []
-            st.session_state.pop("products_editor", None)
-            st.rerun()
+        s1, s2 = st.columns([0.6, 0.4])
+        search = s1.text_input(
+            "Buscar", key="products_search", placeholder="Nome do produto",
+            label_visibility="collapsed",
+        )
+        categories = [ALL_CATEGORIES] + sorted(products_all["Category"].unique())
+        category = s2.selectbox(
+            "Categoria", categories, key="products_category", label_visibility="collapsed"
+        )
+        matching = filter_products(products_all, search, category)
 
-        prod_tbl = pd.DataFrame({"Product": products_all})
-        prod_tbl["Selecionar"] = prod_tbl["Product"].isin(filters["products"])
+        # Todos/nenhum valem para a lista filtrada inteira (todas as páginas)
+        matching_ids = matching["ProductID"].tolist()
+        p1, p2 = st.columns(2)
+        p1.button(
+            "Selecionar todos",
+            key="products_select_all",
+            use_container_width=True,
+            on_click=_select_products,
+            args=(matching_ids, True),
+        )
+        p2.button(
+            "Selecionar nenhum",
+            key="products_select_none",
+            use_container_width=True,
+            on_click=_select_products,
+            args=(matching_ids, False),
+        )
 
+        n_pages = max(1, math.ceil(len(matching) / PRODUCTS_PAGE_SIZE))
+        page = 1
+        # Busca/categoria mais restritiva pode deixar a página atual vazia
+        if st.session_state.get("products_page", 1) > n_pages:
+            st.session_state.products_page = n_pages
+        if n_pages > 1:
+            page = st.number_input(
+                f"Página (de {n_pages})", min_value=1, max_value=n_pages, step=1,
+                key="products_page",
+            )
+        visible, _ = page_of(matching, page)
+        page_ids = visible["ProductID"].tolist()
+
+        prod_tbl = visible[["Product", "Category"]].copy()
+        prod_tbl.insert(0, "Selecionar", [pid in draft["products"] for pid in page_ids])
+
+        # Uma chave por visão (busca/categoria/página): as marcações de uma
+        # página não são reaplicadas às linhas de outra
         edited_products = st.data_editor(
-            prod_tbl[["Selecionar", "Product"]],
+            prod_tbl,
             hide_index=True,
-            disabled=["Product"],
+            disabled=["Product", "Category"],
             use_container_width=True,
             height=220,
-            key="products_editor",
+            key=f"products_editor_{rev}_{search}_{category}_{page}",
+        )
+        draft["products"] = merge_page(
+            draft["products"], page_ids, _checked(edited_products, page_ids)
+        )
+        st.caption(
+            f"{len(draft['products'])} de {len(products_all)} produtos selecionados"
+            f" · {len(matching)} na busca"
         )
-
-        selected_products_from_table = edited_products.loc[
-            edited_products["Selecionar"] == True, "Product"
-        ].tolist()
 
     # ---------- AÇÕES ----------
     with col_actions:
         st.markdown("**Ações**")
 
+        pending = (
+            draft["states"] != set(filters["states"])
+            or draft["products"] != set(filters["products"])
+        )
+
         if st.button("Aplicar", key="apply_filters", use_container_width=True):
-            st.session_state.filters["states"] = selected_states_from_table
-            st.session_state.filters["products"] = selected_products_from_table
+            # Mantém a ordem original (nome) das listas
+            st.session_state.filters["states"] = [s for s in state_ids if s in draft["states"]]
+            st.session_state.filters["products"] = [
+                p for p in products_all["ProductID"].tolist() if p in draft["products"]
+            ]
+            _discard_draft()
             st.rerun()
 
+        if pending:
+            st.caption("Alterações ainda não aplicadas.")
+
         if st.button("Reset geral", key="reset_all", use_container_width=True):
             st.session_state.filters = {
                 "start_date": min_date,
                 "end_date": max_date,
-                "products": list(products_all),
+                "products": products_all["ProductID"].tolist(),
                 "states": [],
             }
-            st.session_state.pop("regions_editor", None)
-            st.session_state.pop("products_editor", None)
+            _discard_draft()
             st.rerun()
@@ -2,34 +2,17 @@
 import streamlit as st
 import plotly.graph_objects as go
 
-from data_layer import get_map_df
+import tracing
+from components.figures import memoized_figure
+from data_layer import get_map_df, get_state_codes
 
 BG = "#0e1117"
 MAP_SELECTED = "#b4e060"
 MAP_UNSELECTED = "#1a1f2b"
 MAP_BORDER = "#4c78a8"  # azul alinhado com os gráficos
 
-def render_map(filters: dict):
-    st.markdown("**Mapa (EUA)**")
-
-    base_map = get_map_df(
-        filters["start_date"],
-        filters["end_date"],
-        tuple(filters["products"]),
-    )
-
-    all_state_codes = base_map["StateCode"].tolist()
-
-    # Regra: vazio = "Todos" (mapa inteiro verde na carga inicial)
-    if not filters["states"]:
-        selected_set = set(all_state_codes)
-    else:
-        selected_set = set([str(x).strip().upper() for x in filters["states"]])
-
-    base_map["SelectedNum"] = base_map["StateCode"].apply(
-        lambda x: 1 if x in selected_set else 0
-    )
-
+@memoized_figure
+def map_figure(selection):
     colorscale = [
         [0.0, MAP_UNSELECTED],
         [0.4999, MAP_UNSELECTED],
@@ -39,9 +22,9 @@ def render_map(filters: dict):
 
     fig_map = go.Figure(
         go.Choropleth(
-            locations=base_map["StateCode"],
+            locations=selection["StateCode"],
             locationmode="USA-states",
-            z=base_map["SelectedNum"],
+            z=selection["SelectedNum"],
             zmin=0,
             zmax=1,
             colorscale=colorscale,
@@ -63,19 +46,54 @@ def render_map(filters: dict):
         margin=dict(l=0, r=0, t=0, b=0),
         height=255,
     )
+    return fig_map
+
+def render_map(filters: dict, batch=None):
+    st.markdown("**Mapa (EUA)**")
+
+    # Resultado já disparado em paralelo pelo app, quando disponível
+    if batch is not None:
+        base_map = batch.result("map")
+    else:
+        base_map = get_map_df(
+            filters["start_date"],
+            filters["end_date"],
+            tuple(filters["products"]),
+        )
+
+    all_state_ids = base_map["StateProvinceID"].tolist()
+
+    # Regra: vazio = "Todos" (mapa inteiro verde na carga inicial)
+    if not filters["states"]:
+        selected_set = set(all_state_ids)
+    else:
+        selected_set = set(filters["states"])
 
-    st.plotly_chart(
-        fig_map,
-        use_container_width=True,
-        config={
-            "displayModeBar": False,
-            "scrollZoom": False,
-            "doubleClick": False,
-        },
-        key=f"map_{hash(tuple(filters['products']))}_{hash(tuple(filters['states']))}_{filters['start_date']}_{filters['end_date']}",
+    selection = base_map[["StateCode"]].assign(
+        SelectedNum=base_map["StateProvinceID"].isin(selected_set).astype("int8")
     )
+    fig_map = map_figure(selection)
 
+    with tracing.span("plotly_chart map", "render"):
+        st.plotly_chart(
+            fig_map,
+            use_container_width=True,
+            config={
+                "displayModeBar": False,
+                "scrollZoom": False,
+                "doubleClick": False,
+            },
+            # Chave fixa: o componente não é remontado a cada filtro,
+            # o Plotly só atualiza as cores dos estados
+            key="map",
+        )
+
+    state_codes = get_state_codes()
     st.caption(
         "Selecionados: "
-        + (", ".join(filters["states"]) if filters["states"] else "Todos")
+        + (
+            ", ".join(state_codes.get(x, str(x)) for x in filters["states"])
+            if filters["states"]
+            else "Todos"
+        )
     )
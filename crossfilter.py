@@ -0,0 +1,146 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from cube import NO_SELLER, NO_STORE
+from db import MISSING_KEY
+
+# Semântica dos cliques
+EXCLUSIVE = "exclusive"  # o clique substitui a seleção (um filtro ativo por vez)
+CUMULATIVE = "cumulative"  # o clique entra/sai da seleção da sua dimensão
+
+# Dimensão -> (coluna da chave no agregado/resultado, coluna do rótulo)
+DIMENSIONS = {
+    "seller": ("SalesPersonID", "SalesPerson"),
+    "store": ("StoreID", "Store"),
+    "product": ("ProductID", "Product"),
+    "month": ("YearMonth", "Period"),
+    "year": ("Year", "Period"),
+}
+
+# Mês e ano são o mesmo eixo: o gráfico de período não filtra a si mesmo
+PERIOD_DIMENSIONS = ("month", "year")
+
+_generations = itertools.count(1)
+
+def select(selection, dim, key, mode=EXCLUSIVE):
+    """
+    Seleção depois de um clique em `key` da dimensão `dim`.
+    Exclusiva: só o item clicado fica selecionado. Cumulativa: o item
+    entra (ou sai, se já estava) da dimensão; dentro de uma dimensão os
+    itens somam (OU) e entre dimensões se combinam (E).
+    """
+    if mode == EXCLUSIVE:
+        return {dim: (key,)}
+    keys = set(selection.get(dim, ())) ^ {key}
+    selection = {d: k for d, k in selection.items() if d != dim}
+    if keys:
+        selection[dim] = tuple(sorted(keys))
+    return selection
+
+def clear(selection, dims):
+    """Seleção sem as dimensões `dims` (ex.: reset de uma seção)."""
+    return {d: k for d, k in selection.items() if d not in dims}
+
+def period_label(dim, key):
+    # AAAAMM -> "AAAA-MM" ; AAAA -> "AAAA"
+    return f"{key // 100}-{key % 100:02d}" if dim == "month" else str(key)
+
+class CrossFilter:
+    """
+    Agregado vendedor x loja x produto x mês em arrays NumPy, montado uma
+    vez por combinação de filtros globais (do cubo ou de uma consulta).
+
+    Cada visão clicável (rankings, barras por produto, linha por período) é
+    um bincount sobre as linhas que passam pela seleção das *outras*
+    dimensões: a dimensão do próprio gráfico não se filtra, então as barras
+    não clicadas continuam visíveis. Nenhum clique vai ao banco.
+    """
+
+    def __init__(self, facts: pd.DataFrame, dims: dict):
+        # Identifica o agregado (filtros globais + dados) para o prefetch; os
+        # dois motores guardam o objeto em cache, então o rerun mantém a geração
+        self.generation = next(_generations)
+        self.value = facts["SalesValue"].to_numpy(dtype=np.float64)
+        self._codes, self._keys, self._labels = {}, {}, {}
+
+        names = {
+            "seller": (dims["sellers"], NO_SELLER),
+            "store": (dims["stores"], NO_STORE),
+            "product": (dims["products"], None),
+        }
+        for dim, (dim_df, missing) in names.items():
+            key_col, label_col = DIMENSIONS[dim]
+            codes, keys = pd.factorize(facts[key_col].to_numpy(dtype=np.int64), sort=True)
+            labels = pd.Series(dim_df[label_col].to_numpy(), index=dim_df[key_col]).reindex(keys)
+            if missing is not None:
+                labels[keys == MISSING_KEY] = missing
+            # Chave sem nome na dimensão (ex.: produto novo): mostra o ID
+            labels = labels.fillna(pd.Series(keys.astype(str), index=keys))
+            self._add(dim, codes, keys, labels.to_numpy(dtype=object))
+
+        months = facts["YearMonth"].to_numpy(dtype=np.int64)
+        for dim, period in (("month", months), ("year", months // 100)):
+            codes, keys = pd.factorize(period, sort=True)
+            labels = np.array([period_label(dim, k) for k in keys], dtype=object)
+            self._add(dim, codes, keys, labels)
+
+    def _add(self, dim, codes, keys, labels):
+        self._codes[dim] = codes.astype(np.int32)
+        self._keys[dim] = np.asarray(keys, dtype=np.int64)
+        self._labels[dim] = labels
+
+    def __len__(self):
+        return len(self.value)
+
+    @property
+    def nbytes(self):
+        arrays = [self.value, *self._codes.values(), *self._keys.values()]
+        return sum(a.nbytes for a in arrays) + sum(
+            sum(len(str(v)) for v in labels) for labels in self._labels.values()
+        )
+
+    def label(self, dim, key):
+        """Rótulo de exibição de uma chave (nome do vendedor, "2023-05", ...)."""
+        position = np.searchsorted(self._keys[dim], key)
+        if position < len(self._keys[dim]) and self._keys[dim][position] == key:
+            return self._labels[dim][position]
+        return period_label(dim, key) if dim in PERIOD_DIMENSIONS else str(key)
+
+    def _mask(self, selection, exclude):
+        mask = None
+        for dim, keys in selection.items():
+            if dim in exclude or not keys:
+                continue
+            member = np.isin(self._keys[dim], keys)[self._codes[dim]]
+            mask = member if mask is None else mask & member
+        return mask
+
+    def totals(self, dim, selection=None, top_n=None):
+        """
+        Vendas por membro de `dim` sob a seleção das outras dimensões:
+        períodos em ordem cronológica, os demais do maior para o menor
+        (limitados a `top_n`).
+        """
+        exclude = PERIOD_DIMENSIONS if dim in PERIOD_DIMENSIONS else (dim,)
+        mask = self._mask(selection or {}, exclude)
+        codes, weights = self._codes[dim], self.value
+        if mask is not None:
+            codes, weights = codes[mask], weights[mask]
+
+        size = len(self._keys[dim])
+        counts = np.bincount(codes, minlength=size)
+        sums = np.bincount(codes, weights=weights, minlength=size)
+        present = np.flatnonzero(counts)
+        if dim not in PERIOD_DIMENSIONS:
+            present = present[np.argsort(-sums[present], kind="stable")][:top_n]
+
+        key_col, label_col = DIMENSIONS[dim]
+        return pd.DataFrame(
+            {
+                key_col: self._keys[dim][present],
+                label_col: self._labels[dim][present],
+                "SalesValue": sums[present],
+            }
+        )
@@ -0,0 +1,415 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+from db import (
+    CROSSFILTER_DTYPES,
+    MISSING_KEY,
+    count_changed_orders,
+    get_daily_fact_version,
+    get_dimension_version,
+    get_watermark,
+    iter_sales_fact,
+    load_dimensions,
+    normalize_watermark,
+    typed_sales_frame,
+)
+
+NO_SELLER = "(Sem vendedor)"
+NO_STORE = "(Sem loja)"
+
+FACT_COLUMNS = ("day", "state", "product", "seller", "store", "value")
+
+def _to_day(value):
+    return np.datetime64(pd.Timestamp(value).date(), "D").astype(np.int64)
+
+def _encode(keys, dim_keys):
+    """
+    Converte as chaves do fato (ProductID, StateProvinceID, ...) na posição
+    correspondente da tabela de dimensão. Chaves sem dimensão viram -1.
+    """
+    return pd.Index(dim_keys).get_indexer(keys).astype(np.int32)
+
+class SalesCube:
+    """
+    Cubo colunar em memória com o grão dia x estado x produto x vendedor x loja.
+
+    Cada coluna do fato é um array NumPy de códigos inteiros que apontam para
+    as tabelas de dimensão. Todos os filtros e agregações do dashboard são
+    respondidos com máscaras vetorizadas + bincount, sem ida ao banco.
+    """
+
+    def __init__(self, fact, dims: dict, watermark=None, dims_version=None):
+        states = dims["states"].reset_index(drop=True).copy()
+        states["StateCode"] = states["StateCode"].astype(str).str.strip().str.upper()
+        products = dims["products"].reset_index(drop=True)
+
+        # Vendedor/loja ausentes entram como um membro explícito da dimensão
+        sellers = pd.concat(
+            [
+                pd.DataFrame({"SalesPersonID": [MISSING_KEY], "SalesPerson": [NO_SELLER]}),
+                dims["sellers"],
+            ],
+            ignore_index=True,
+        )
+        stores = pd.concat(
+            [
+                pd.DataFrame({"StoreID": [MISSING_KEY], "Store": [NO_STORE]}),
+                dims["stores"],
+            ],
+            ignore_index=True,
+        )
+
+        self.state_ids = states["StateProvinceID"].to_numpy(dtype=np.int64)
+        self.product_ids = products["ProductID"].to_numpy(dtype=np.int64)
+        self.state_codes = states["StateCode"].to_numpy(dtype=object)
+        self.state_names = states["StateName"].to_numpy(dtype=object)
+        self.product_names = products["Product"].to_numpy(dtype=object)
+        self.seller_ids = sellers["SalesPersonID"].to_numpy(dtype=np.int64)
+        self.store_ids = stores["StoreID"].to_numpy(dtype=np.int64)
+        self.seller_names = sellers["SalesPerson"].to_numpy(dtype=object)
+        self.store_names = stores["Store"].to_numpy(dtype=object)
+
+        for name, values in self._encode_batches(fact).items():
+            setattr(self, name, values)
+
+        # Marca d'água: até onde o fato já foi carregado
+        self.watermark = watermark
+        self.dims_version = dims_version
+        self.daily_fact = False
+        # Só no fato diário: versão da tabela (ver db.get_daily_fact_version)
+        self.fact_version = None
+
+    def _encode_fact(self, fact):
+        arrays = {
+            "day": pd.to_datetime(fact["OrderDate"])
+            .to_numpy()
+            .astype("datetime64[D]")
+            .astype(np.int64),
+            "state": _encode(fact["StateProvinceID"], self.state_ids),
+            "product": _encode(fact["ProductID"], self.product_ids),
+            "seller": _encode(
+                fact["SalesPersonID"].fillna(MISSING_KEY).astype(np.int64),
+                self.seller_ids,
+            ),
+            "store": _encode(
+                fact["StoreID"].fillna(MISSING_KEY).astype(np.int64),
+                self.store_ids,
+            ),
+            "value": fact["SalesValue"].astype(np.float64).to_numpy(),
+        }
+
+        # Vendedor/loja desconhecidos caem no membro "(Sem ...)" (posição 0)
+        arrays["seller"][arrays["seller"] < 0] = 0
+        arrays["store"][arrays["store"] < 0] = 0
+
+        # Linhas cujo estado/produto não está nas dimensões são descartadas
+        keep = (arrays["state"] >= 0) & (arrays["product"] >= 0)
+        if not keep.all():
+            arrays = {name: values[keep] for name, values in arrays.items()}
+        return arrays
+
+    def _encode_batches(self, fact):
+        """
+        Aceita um DataFrame ou um iterável de lotes (leitura em streaming):
+        cada lote é codificado e descartado, só os arrays compactos ficam.
+        """
+        batches = [fact] if isinstance(fact, pd.DataFrame) else fact
+        parts = [self._encode_fact(batch) for batch in batches]
+        if len(parts) == 1:
+            return parts[0]
+        return {name: np.concatenate([p[name] for p in parts]) for name in FACT_COLUMNS}
+
+    @classmethod
+    def from_db(cls, conn, daily_fact=False):
+        # Dimensões e versões antes: o fato é lido em lotes por último,
+        # com o cursor ocupando a conexão até o fim do streaming
+        watermark = get_watermark(conn)
+        dims = load_dimensions(conn)
+        dims_version = get_dimension_version(conn)
+        fact_version = get_daily_fact_version(conn) if daily_fact else None
+        cube = cls(
+            iter_sales_fact(
+                conn, daily_fact=daily_fact, max_order_id=watermark["MaxOrderID"]
+            ),
+            dims,
+            watermark=watermark,
+            dims_version=dims_version,
+        )
+        cube.daily_fact = daily_fact
+        cube.fact_version = fact_version
+        return cube
+
+    # =========================
+    # Snapshot (cache em disco)
+    # =========================
+    def to_frames(self):
+        """
+        Arrays já codificados + dimensões, prontos para gravar em Parquet.
+        Restaurar um snapshot não precisa recodificar nada.
+        """
+        fact = pd.DataFrame({name: getattr(self, name) for name in FACT_COLUMNS})
+        states = pd.DataFrame(
+            {
+                "StateProvinceID": self.state_ids,
+                "StateCode": self.state_codes,
+                "StateName": self.state_names,
+            }
+        )
+        products = pd.DataFrame({"ProductID": self.product_ids, "Product": self.product_names})
+        sellers = pd.DataFrame({"SalesPersonID": self.seller_ids, "SalesPerson": self.seller_names})
+        stores = pd.DataFrame({"StoreID": self.store_ids, "Store": self.store_names})
+
+        watermark = None
+        if self.watermark is not None:
+            watermark = {k: None if v is None else str(v) for k, v in self.watermark.items()}
+        meta = {
+            "watermark": watermark,
+            "dims_version": self.dims_version,
+            "daily_fact": self.daily_fact,
+            "fact_version": self.fact_version,
+        }
+        return [fact, states, products, sellers, stores], meta
+
+    @classmethod
+    def from_frames(cls, frames, meta):
+        fact, states, products, sellers, stores = frames
+        cube = cls.__new__(cls)
+
+        cube.state_ids = states["StateProvinceID"].to_numpy(dtype=np.int64)
+        cube.state_codes = states["StateCode"].to_numpy(dtype=object)
+        cube.state_names = states["StateName"].to_numpy(dtype=object)
+        cube.product_ids = products["ProductID"].to_numpy(dtype=np.int64)
+        cube.product_names = products["Product"].to_numpy(dtype=object)
+        cube.seller_ids = sellers["SalesPersonID"].to_numpy(dtype=np.int64)
+        cube.seller_names = sellers["SalesPerson"].to_numpy(dtype=object)
+        cube.store_ids = stores["StoreID"].to_numpy(dtype=np.int64)
+        cube.store_names = stores["Store"].to_numpy(dtype=object)
+
+        for name in FACT_COLUMNS:
+            setattr(cube, name, fact[name].to_numpy())
+
+        watermark = meta.get("watermark")
+        cube.watermark = None if watermark is None else normalize_watermark(watermark)
+        dims_version = meta.get("dims_version")
+        cube.dims_version = (
+            None if dims_version is None else tuple(tuple(d) for d in dims_version)
+        )
+        cube.daily_fact = bool(meta.get("daily_fact", False))
+        fact_version = meta.get("fact_version")
+        cube.fact_version = None if fact_version is None else tuple(fact_version)
+        return cube
+
+    # =========================
+    # Atualização incremental
+    # =========================
+    def extended(self, delta, watermark):
+        """
+        Novo cubo com as linhas de `delta` anexadas. O cubo atual não é
+        alterado (outras sessões podem estar lendo dele).
+        """
+        new = copy.copy(self)
+        arrays = self._encode_batches(delta)
+        for name in FACT_COLUMNS:
+            setattr(new, name, np.concatenate([getattr(self, name), arrays[name]]))
+        new.watermark = watermark
+        return new
+
+    def _covers(self, watermark):
+        # True se o cubo já contém tudo até `watermark` (que pode ser mais
+        # antiga que a do cubo, vinda de uma sondagem em cache)
+        mine = self.watermark
+        if mine is None:
+            return False
+        if watermark["MaxOrderID"] is None:
+            return True
+        if mine["MaxOrderID"] is None:
+            return False
+        return (
+            watermark["MaxOrderID"] <= mine["MaxOrderID"]
+            and watermark["MaxModified"] <= mine["MaxModified"]
+        )
+
+    def refreshed(self, conn, watermark, dims_version):
+        """
+        Traz o cubo até a marca d'água atual buscando só os pedidos novos.
+        Recarrega tudo quando não dá para aplicar um delta com segurança:
+        dimensões mudaram ou pedidos antigos foram alterados. O fato diário
+        (sem SalesOrderID) é recarregado só quando a própria tabela muda.
+        """
+        if dims_version == self.dims_version and self._covers(watermark):
+            return self
+
+        if self.daily_fact:
+            if (
+                dims_version == self.dims_version
+                and get_daily_fact_version(conn) == self.fact_version
+            ):
+                return self
+            return SalesCube.from_db(conn, daily_fact=True)
+
+        if (
+            self.watermark is None
+            or self.watermark["MaxOrderID"] is None
+            or dims_version != self.dims_version
+            or count_changed_orders(conn, self.watermark) > 0
+        ):
+            return SalesCube.from_db(conn, daily_fact=self.daily_fact)
+
+        delta = iter_sales_fact(
+            conn,
+            min_order_id=self.watermark["MaxOrderID"],
+            max_order_id=watermark["MaxOrderID"],
+        )
+        return self.extended(delta, watermark)
+
+    def __len__(self):
+        return len(self.value)
+
+    @property
+    def nbytes(self):
+        """Memória dos arrays do cubo (fato + dimensões), para o painel de caches."""
+        return sum(v.nbytes for v in vars(self).values() if isinstance(v, np.ndarray))
+
+    # =========================
+    # Máscaras
+    # =========================
+    @staticmethod
+    def _member(codes, labels, selected):
+        lookup = np.isin(labels, list(selected))
+        return lookup[codes]
+
+    def _mask(
+        self,
+        start_date,
+        end_date,
+        state_ids=(),
+        product_ids=None,
+    ):
+        mask = (self.day >= _to_day(start_date)) & (self.day <= _to_day(end_date))
+
+        if product_ids is not None:
+            mask &= self._member(self.product, self.product_ids, product_ids)
+
+        # vazio = todos os estados
+        if state_ids:  # None ou vazio = todos os estados
+            mask &= self._member(self.state, self.state_ids, state_ids)
+
+        return mask
+
+    # =========================
+    # Consultas do dashboard
+    # =========================
+    def sales_by_state(self, start_date, end_date, product_ids):
+        # product_ids=None: todos os produtos (sem máscara)
+        if product_ids is not None and len(product_ids) == 0:
+            return pd.DataFrame(columns=["StateCode", "SalesValue"])
+
+        mask = self._mask(start_date, end_date, product_ids=product_ids)
+        n_states = len(self.state_codes)
+        counts = np.bincount(self.state[mask], minlength=n_states)
+        sums = np.bincount(self.state[mask], weights=self.value[mask], minlength=n_states)
+
+        present = np.flatnonzero(counts)
+        return pd.DataFrame(
+            {"StateCode": self.state_codes[present], "SalesValue": sums[present]}
+        )
+
+    def sales_filtered(self, start_date, end_date, state_ids, product_ids):
+        if product_ids is not None and len(product_ids) == 0:
+            return typed_sales_frame(
+                pd.DataFrame(
+                    columns=[
+                        "OrderDate",
+                        "StateProvinceID",
+                        "StateCode",
+                        "State",
+                        "ProductID",
+                        "Product",
+                        "SalesValue",
+                    ]
+                )
+            )
+
+        mask = self._mask(start_date, end_date, state_ids, product_ids)
+        day = self.day[mask]
+        state = self.state[mask].astype(np.int64)
+        product = self.product[mask].astype(np.int64)
+
+        n_states = len(self.state_codes)
+        n_products = len(self.product_names)
+        day0 = day.min() if len(day) else 0
+
+        # Chave composta (dia, estado, produto) -> um único inteiro
+        key = ((day - day0) * n_states + state) * n_products + product
+        uniq, inverse = np.unique(key, return_inverse=True)
+        sums = np.bincount(inverse, weights=self.value[mask], minlength=len(uniq))
+
+        product_code = uniq % n_products
+        state_code = (uniq // n_products) % n_states
+        day_code = uniq // (n_products * n_states) + day0
+
+        return typed_sales_frame(
+            pd.DataFrame(
+                {
+                    "OrderDate": pd.to_datetime(day_code.astype("datetime64[D]")),
+                    "StateProvinceID": self.state_ids[state_code],
+                    "StateCode": self.state_codes[state_code],
+                    "State": self.state_names[state_code],
+                    "ProductID": self.product_ids[product_code],
+                    "Product": self.product_names[product_code],
+                    "SalesValue": sums,
+                }
+            )
+        )
+
+    def crossfilter_facts(self, start_date, end_date, state_ids, product_ids):
+        """Mesmo agregado de db.load_crossfilter_facts (vendedor x loja x produto x mês)."""
+        if product_ids is not None and len(product_ids) == 0:
+            return pd.DataFrame(columns=list(CROSSFILTER_DTYPES)).astype(
+                {**CROSSFILTER_DTYPES, "SalesPersonID": "int64", "StoreID": "int64"}
+            )
+
+        mask = self._mask(start_date, end_date, state_ids, product_ids)
+        # Meses desde 1970
+        month = self.day[mask].astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        seller = self.seller[mask].astype(np.int64)
+        store = self.store[mask].astype(np.int64)
+        product = self.product[mask].astype(np.int64)
+
+        n_sellers, n_stores, n_products = (
+            len(self.seller_ids), len(self.store_ids), len(self.product_ids)
+        )
+        month0 = month.min() if len(month) else 0
+
+        key = (((month - month0) * n_sellers + seller) * n_stores + store) * n_products + product
+        uniq, inverse = np.unique(key, return_inverse=True)
+        sums = np.bincount(inverse, weights=self.value[mask], minlength=len(uniq))
+
+        product_code = uniq % n_products
+        store_code = (uniq // n_products) % n_stores
+        seller_code = (uniq // (n_products * n_stores)) % n_sellers
+        month_code = uniq // (n_products * n_stores * n_sellers) + month0
+
+        return pd.DataFrame(
+            {
+                "SalesPersonID": self.seller_ids[seller_code],
+                "StoreID": self.store_ids[store_code],
+                "ProductID": self.product_ids[product_code],
+                "YearMonth": (1970 + month_code // 12) * 100 + month_code % 12 + 1,
+                "SalesValue": sums,
+            }
+        )
+
+    def dimensions(self):
+        """Nomes de produtos, vendedores e lojas (mesmo formato de db.load_dimensions)."""
+        return {
+            "products": pd.DataFrame(
+                {"ProductID": self.product_ids, "Product": self.product_names}
+            ),
+            "sellers": pd.DataFrame(
+                {"SalesPersonID": self.seller_ids, "SalesPerson": self.seller_names}
+            ),
+            "stores": pd.DataFrame({"StoreID": self.store_ids, "Store": self.store_names}),
+        }
@@ -0,0 +1,29 @@
+-- Fato diário pré-agregado usado pelo Hexagon quando existir (db.DAILY_FACT_TABLE).
+-- Grão: dia x estado x produto x vendedor x loja -> soma de LineTotal.
+-- Recrie/atualize via job agendado; o app detecta a tabela automaticamente.
+
+IF OBJECT_ID('dbo.HexagonDailySales', 'U') IS NOT NULL
+    DROP TABLE dbo.HexagonDailySales;
+
+SELECT
+    CAST(soh.OrderDate AS DATE) AS OrderDate,
+    a.StateProvinceID,
+    sod.ProductID,
+    soh.SalesPersonID,
+    c.StoreID,
+    SUM(sod.LineTotal) AS SalesValue
+INTO dbo.HexagonDailySales
+FROM Sales.SalesOrderHeader soh
+JOIN Sales.SalesOrderDetail sod ON soh.SalesOrderID = sod.SalesOrderID
+JOIN Person.Address a ON soh.ShipToAddressID = a.AddressID
+LEFT JOIN Sales.Customer c ON soh.CustomerID = c.CustomerID
+GROUP BY
+    CAST(soh.OrderDate AS DATE),
+    a.StateProvinceID,
+    sod.ProductID,
+    soh.SalesPersonID,
+    c.StoreID;
+
+-- Intervalos de data viram seek no índice clusterizado
+CREATE CLUSTERED INDEX IX_HexagonDailySales_OrderDate
+    ON dbo.HexagonDailySales (OrderDate, StateProvinceID, ProductID);
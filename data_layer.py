@@ -1,60 +1,375 @@
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+import tracing
+from cache import MemoryBudget, Refresher, SWRCache, share_frames
+from crossfilter import CrossFilter
+from cube import SalesCube
+from disk_cache import DiskCache, fingerprint
+from filters import Selection, canonical_filters
+from subsumption_cache import SubsumptionCache
+from db import (
+    POOL_SIZE,
+    ConnectionPool,
+    get_conn,
+    get_dimension_version,
+    get_metadata,
+    get_watermark,
+    has_daily_fact,
+    load_crossfilter_facts,
+    load_dimensions,
+    load_sales_by_state,
+    load_sales_filtered,
+)
+
+# "cube" responde tudo em memória; "sql" consulta o SQL Server a cada filtro
+ENGINE = os.environ.get("HEXAGON_ENGINE", "cube").lower()
+
+# Intervalo entre sondagens da marca d'água (pedidos novos / dimensões)
+WATERMARK_TTL = int(os.environ.get("HEXAGON_WATERMARK_TTL", "30"))
 
-from db import get_conn, get_metadata, load_sales_by_state, load_sales_filtered
+# Combinações de filtro mais usadas recalculadas a cada sondagem (modo sql)
+HOT_KEYS = int(os.environ.get("HEXAGON_HOT_KEYS", "20"))
+
+# Memória dos resultados em cache: todas as consultas juntas e cada uma
+MEMORY_BUDGET_MB = int(os.environ.get("HEXAGON_MEMORY_BUDGET_MB", "1024"))
+RESULT_BUDGET_MB = int(os.environ.get("HEXAGON_RESULT_BUDGET_MB", "256"))
 
 # =========================
-# Conexão (1 por sessão)
+# Pool de conexões (compartilhado pelo processo)
 # =========================
 @st.cache_resource
-def get_conn_cached():
-    return get_conn()
+def get_pool():
+    return ConnectionPool(get_conn)
 
 # =========================
-# Metadata
+# Cache em disco (sobrevive a deploys/restarts)
+# =========================
+@st.cache_resource
+def get_disk_cache():
+    # A pré-carga em memória entra no limite global de bytes
+    cache = DiskCache(memory_budget=get_memory_budget())
+    cache.preload()
+    return cache
+
+def _through_disk(name, args, load):
+    """
+    Lê o resultado do disco se já existir para (consulta, argumentos, versão);
+    senão executa `load()` (lista de DataFrames) e grava.
+    """
+    cache = get_disk_cache()
+    key = fingerprint(name, *args)
+    found = cache.get(key)
+    if found is not None:
+        tracing.annotate(cache="disk")
+        frames, _ = found
+        return frames
+
+    tracing.annotate(cache="miss")
+    frames = load()
+    cache.put(key, frames)
+    return frames
+
+# =========================
+# Marca d'água e versão das dimensões
+# Servidas do último valor lido; a releitura após WATERMARK_TTL roda em
+# segundo plano (e o refresher periódico a faz antes de alguém pedir)
+# =========================
+@st.cache_resource
+def get_probe_cache():
+    return SWRCache(ttl=WATERMARK_TTL, name="probe")
+
+def get_watermark_cached():
+    return get_probe_cache().get("watermark", lambda version, stale: get_pool().run(get_watermark))
+
+def get_dimension_version_cached():
+    return get_probe_cache().get(
+        "dims", lambda version, stale: get_pool().run(get_dimension_version)
+    )
+
+def get_data_version():
+    # Entra na chave dos caches SQL: muda só quando os dados mudam
+    watermark = get_watermark_cached()
+    return (
+        watermark["MaxOrderID"],
+        str(watermark["MaxModified"]),
+        get_dimension_version_cached(),
+    )
+
+# =========================
+# Cubo de vendas (carregado 1x, depois só deltas)
+# Com pedidos novos o cubo atual continua respondendo enquanto o delta é
+# aplicado em segundo plano
+# =========================
+CUBE_SNAPSHOT_KEY = "cube-snapshot"
+
+# Intervalo mínimo entre gravações do snapshot após deltas
+CUBE_SNAPSHOT_INTERVAL = 300
+
+@st.cache_resource
+def _cube_store():
+    return {"cache": SWRCache(max_entries=1, name="cube"), "saved_at": None}
+
+def _restore_cube_snapshot():
+    found = get_disk_cache().get(CUBE_SNAPSHOT_KEY)
+    if found is None:
+        return None
+    frames, meta = found
+    return SalesCube.from_frames(frames, meta)
+
+def _save_cube_snapshot(cube):
+    frames, meta = cube.to_frames()
+    get_disk_cache().put(CUBE_SNAPSHOT_KEY, frames, meta)
+
+def _load_cube(version, stale):
+    store = _cube_store()
+    base = stale
+    if base is None:
+        # Warm start: snapshot do disco + só o delta desde a gravação
+        base = _restore_cube_snapshot()
+    if base is None:
+        cube = get_pool().run(SalesCube.from_db, daily_fact=has_daily_fact_cached())
+    else:
+        cube = get_pool().run(
+            base.refreshed, get_watermark_cached(), get_dimension_version_cached()
+        )
+
+    # Só grava quando há cubo novo (carga completa ou delta): um snapshot
+    # restaurado sem pedidos novos já é o que está no disco
+    saved_at = store["saved_at"]
+    if cube is not base and (
+        saved_at is None or time.monotonic() - saved_at > CUBE_SNAPSHOT_INTERVAL
+    ):
+        _save_cube_snapshot(cube)
+        store["saved_at"] = time.monotonic()
+    return cube
+
+def _cube_version(cube):
+    # Versão dos dados que o cubo realmente contém (pode estar atrás da atual
+    # enquanto o delta é aplicado em segundo plano)
+    return str(cube.watermark), cube.dims_version
+
+@tracing.traced()
+def get_cube_cached():
+    # Carga a frio: só uma sessão monta o cubo, as outras esperam por ele
+    return _cube_store()["cache"].get("cube", _load_cube, get_data_version())
+
+# =========================
+# Fato diário pré-agregado (opcional)
 # =========================
 @st.cache_data(ttl=3600)
+def has_daily_fact_cached():
+    return get_pool().run(has_daily_fact)
+
+# =========================
+# Metadata
+# =========================
+@st.cache_resource(max_entries=4)
+def _get_dimensions_versioned(dims_version):
+    # Um único par de frames por processo; quem lê recebe visões (share_frames)
+    def load():
+        _, _, state_df, prod_df = get_pool().run(get_metadata)
+        return [state_df, prod_df]
+
+    # "metadata_v2": produtos com Category (não reaproveita o formato antigo)
+    state_df, prod_df = _through_disk("metadata_v2", (dims_version,), load)
+    # Normalizado uma vez aqui: quem lê só recebe visões, sem alterar o frame
+    state_df = state_df.assign(
+        StateCode=state_df["StateCode"].astype(str).str.strip().str.upper()
+    )
+    return state_df, prod_df
+
+@tracing.traced(cache="memory")
 def get_metadata_cached():
-    cn = get_conn_cached()
-    return get_metadata(cn)
+    # Produtos/estados só são relidos quando a dimensão muda;
+    # o intervalo de datas acompanha a marca d'água
+    watermark = get_watermark_cached()
+    state_df, prod_df = share_frames(_get_dimensions_versioned(get_dimension_version_cached()))
+    return watermark["MinDate"], watermark["MaxDate"], state_df, prod_df
 
 def get_state_df_all():
     _, _, state_df_all, _ = get_metadata_cached()
-    state_df_all = state_df_all.copy()
-    state_df_all["StateCode"] = (
-        state_df_all["StateCode"]
-        .astype(str)
-        .str.strip()
-        .str.upper()
-    )
     return state_df_all
 
 def get_products_all():
-    _, _, _, products_all = get_metadata_cached()
-    return list(products_all)
+    _, _, _, prod_df = get_metadata_cached()
+    return prod_df
+
+def get_all_product_ids():
+    return get_products_all()["ProductID"].tolist()
+
+# =========================
+# Seleções canônicas (ordenadas, sem repetição, ALL/NONE)
+# =========================
+def canonical_states(state_ids):
+    # Vazio ou todos os estados = ALL: o SQL/cubo nem recebe o predicado
+    state_ids_all = get_state_df_all()["StateProvinceID"].tolist()
+    return Selection.of(state_ids, state_ids_all, empty_means_all=True)
+
+def canonical_products(product_ids):
+    return Selection.of(product_ids, get_all_product_ids())
+
+def get_canonical_filters(filters):
+    return canonical_filters(
+        filters, get_state_df_all()["StateProvinceID"].tolist(), get_all_product_ids()
+    )
 
 # =========================
-# Helpers
+# Dicionários de exibição (ID -> nome)
 # =========================
-def _in_clause(values):
-    return ", ".join(["?"] * len(values))
+def get_product_names():
+    prod_df = get_products_all()
+    return dict(zip(prod_df["ProductID"], prod_df["Product"]))
+
+def get_state_codes():
+    state_df_all = get_state_df_all()
+    return dict(zip(state_df_all["StateProvinceID"], state_df_all["StateCode"]))
+
+# =========================
+# Caches das consultas SQL (modo HEXAGON_ENGINE=sql)
+# A versão dos dados decide se o resultado está velho: pedido novo ->
+# o resultado anterior continua sendo servido e a consulta é refeita em
+# segundo plano; só a primeira leitura de uma combinação espera o banco
+# =========================
+SQL_CACHE_ENTRIES = 256
+
+SQL_QUERIES = ("sales_by_state", "sales_filtered", "crossfilter")
+
+# Resultados derivados do cubo (modo cube), guardados como os do SQL
+CUBE_QUERIES = ("sales_filtered_cube", "crossfilter_cube")
+
+@st.cache_resource
+def get_memory_budget():
+    return MemoryBudget(MEMORY_BUDGET_MB * 2**20)
+
+@st.cache_resource
+def get_result_cache(name):
+    # Um cache por consulta (limite próprio), todos dentro do limite global
+    return SWRCache(
+        max_entries=SQL_CACHE_ENTRIES,
+        max_bytes=RESULT_BUDGET_MB * 2**20,
+        budget=get_memory_budget(),
+        copy=share_frames,
+        name=name,
+    )
+
+def _cached_sql(name, load, args, data_version):
+    """(resultado, versão servida) de load(*args, data_version) pelo cache SWR."""
+    return get_result_cache(name).lookup(
+        args, lambda version, stale: load(*args, version), data_version
+    )
+
+def _load_sales_by_state_sql(start_date, end_date, product_ids, data_version):
+    def load():
+        return [
+            get_pool().run(
+                load_sales_by_state,
+                start_date,
+                end_date,
+                product_ids.predicate,
+                daily_fact=has_daily_fact_cached(),
+            )
+        ]
+
+    args = (start_date, end_date, product_ids, data_version)
+    return _through_disk("sales_by_state", args, load)[0]
+
+def _load_sales_filtered_sql(start_date, end_date, state_ids, product_ids, data_version):
+    def load():
+        return [
+            get_pool().run(
+                load_sales_filtered,
+                start_date,
+                end_date,
+                state_ids.predicate,
+                product_ids.predicate,
+                daily_fact=has_daily_fact_cached(),
+            )
+        ]
+
+    args = (start_date, end_date, state_ids, product_ids, data_version)
+    df = _through_disk("sales_filtered", args, load)[0]
+    # Nome do produto só para exibição, vindo do dicionário da metadata (a
+    # versão dos dados inclui a das dimensões); entra uma vez, antes do cache
+    df["Product"] = df["ProductID"].map(get_product_names()).astype("category")
+    return df
+
+@st.cache_resource(max_entries=4)
+def _get_name_dimensions_versioned(dims_version):
+    # Nomes de produtos/vendedores/lojas para os rótulos do cross-filter
+    def load():
+        dims = get_pool().run(load_dimensions)
+        return [dims["products"], dims["sellers"], dims["stores"]]
+
+    products, sellers, stores = _through_disk("dimensions", (dims_version,), load)
+    return {"products": products, "sellers": sellers, "stores": stores}
+
+def _load_crossfilter_sql(start_date, end_date, state_ids, product_ids, data_version):
+    def load():
+        return [
+            get_pool().run(
+                load_crossfilter_facts,
+                start_date,
+                end_date,
+                state_ids.predicate,
+                product_ids.predicate,
+                daily_fact=has_daily_fact_cached(),
+            )
+        ]
+
+    args = (start_date, end_date, state_ids, product_ids, data_version)
+    facts = _through_disk("crossfilter", args, load)[0]
+    return CrossFilter(facts, _get_name_dimensions_versioned(get_dimension_version_cached()))
+
+# =========================
+# Cache semântico: filtros mais estreitos saem de frames já em memória
+# =========================
+@st.cache_resource
+def get_subsumption_cache():
+    return SubsumptionCache(max_bytes=RESULT_BUDGET_MB * 2**20, budget=get_memory_budget())
+
+def get_subsumption_stats():
+    return get_subsumption_cache().stats()
 
 # =========================
 # Dataframe do mapa
 # =========================
-@st.cache_data(ttl=600)
-def get_map_df(start_date, end_date, products_sel):
-    cn = get_conn_cached()
+@tracing.traced(cache="memory")
+def get_map_df(start_date, end_date, product_ids):
     state_df_all = get_state_df_all()
+    products = canonical_products(product_ids)
 
-    if not products_sel:
-        base = state_df_all[["StateCode"]].copy()
+    if products.is_none:
+        base = state_df_all[["StateProvinceID", "StateCode"]].copy()
         base["SalesValue"] = 0
         return base
 
-    sales_df = load_sales_by_state(
-        cn, start_date, end_date, products_sel
-    ).copy()
+    if ENGINE == "cube":
+        tracing.annotate(cache="cube")
+        sales_df = get_cube_cached().sales_by_state(
+            start_date, end_date, products.predicate
+        )
+    else:
+        data_version = get_data_version()
+        sales_df = get_subsumption_cache().sales_by_state(
+            start_date, end_date, products.predicate, data_version
+        )
+        if sales_df is not None:
+            tracing.annotate(cache="semantic")
+        else:
+            sales_df, _ = _cached_sql(
+                "sales_by_state",
+                _load_sales_by_state_sql,
+                (start_date, end_date, products),
+                data_version,
+            )
 
     sales_df["StateCode"] = (
         sales_df["StateCode"]
@@ -63,7 +378,7 @@ def get_map_df(start_date, end_date, products_sel):
         .str.upper()
     )
 
-    base = state_df_all[["StateCode"]].drop_duplicates()
+    base = state_df_all[["StateProvinceID", "StateCode"]].drop_duplicates()
     base = base.merge(sales_df, on="StateCode", how="left")
     base["SalesValue"] = base["SalesValue"].fillna(0)
 
@@ -72,109 +387,184 @@ def get_map_df(start_date, end_date, products_sel):
 # =========================
 # Dados filtrados gerais
 # =========================
-@st.cache_data(ttl=600)
-def get_sales_df(start_date, end_date, states_sel, products_sel):
-    cn = get_conn_cached()
-    return load_sales_filtered(
-        cn, start_date, end_date, states_sel, products_sel
+@tracing.traced(cache="memory")
+def get_sales_df(start_date, end_date, state_ids, product_ids):
+    states, products = canonical_states(state_ids), canonical_products(product_ids)
+    if ENGINE == "cube":
+        tracing.annotate(cache="cube")
+        cube = get_cube_cached()
+
+        def load(version, stale):
+            return cube.sales_filtered(start_date, end_date, states.predicate, products.predicate)
+
+        # Um frame por filtros + versão do cubo no processo; o rerun só
+        # recebe uma visão (share_frames)
+        df, _ = get_result_cache("sales_filtered_cube").lookup(
+            (start_date, end_date, states, products), load, _cube_version(cube)
+        )
+        return df
+
+    data_version = get_data_version()
+    semantic = get_subsumption_cache()
+    df = semantic.sales(start_date, end_date, states.predicate, products.predicate, data_version)
+    if df is not None:
+        tracing.annotate(cache="semantic")
+        return df
+
+    df, served_version = _cached_sql(
+        "sales_filtered",
+        _load_sales_filtered_sql,
+        (start_date, end_date, states, products),
+        data_version,
     )
+    # Resultado velho (servido enquanto recalcula) não entra na versão nova
+    if served_version == data_version:
+        semantic.add(
+            start_date, end_date, states.predicate, products.predicate, data_version, df
+        )
+    return df
 
 # =========================
-# TOP vendedores / lojas (interativo)
-# =========================
-@st.cache_data(ttl=600)
-def get_top_sellers_and_stores(
-    start_date,
-    end_date,
-    states_sel,
-    products_sel,
-    top_n=10,
-    selected_seller=None,
-    selected_store=None,
-):
-    cn = get_conn_cached()
-
-    product_filter = f"AND p.Name IN ({_in_clause(products_sel)})"
-    params_base = [start_date, end_date, *products_sel]
-
-    state_filter = ""
-    params_states = []
-    if states_sel:
-        state_filter = f"AND spv.StateProvinceCode IN ({_in_clause(states_sel)})"
-        params_states = [*states_sel]
-
-    seller_filter = ""
-    seller_params = []
-    if selected_seller:
-        seller_filter = (
-            "AND COALESCE(pp.FirstName + ' ' + pp.LastName, '(Sem vendedor)') = ?"
+# Cross-filter: vendedor x loja x produto x mês (cliques sem ir ao banco)
+# =========================
+@tracing.traced(cache="memory")
+def get_crossfilter(start_date, end_date, state_ids, product_ids):
+    states, products = canonical_states(state_ids), canonical_products(product_ids)
+    if ENGINE == "cube":
+        tracing.annotate(cache="cube")
+        cube = get_cube_cached()
+
+        def load(version, stale):
+            return CrossFilter(
+                cube.crossfilter_facts(
+                    start_date, end_date, states.predicate, products.predicate
+                ),
+                cube.dimensions(),
+            )
+
+        # Montado uma vez por filtros + versão do cubo: o rerun reaproveita o
+        # mesmo objeto (e o prefetch, a mesma geração)
+        result, _ = get_result_cache("crossfilter_cube").lookup(
+            (start_date, end_date, states, products), load, _cube_version(cube)
         )
-        seller_params = [selected_seller]
-
-    store_filter = ""
-    store_params = []
-    if selected_store:
-        store_filter = "AND COALESCE(s.Name, '(Sem loja)') = ?"
-        store_params = [selected_store]
-
-    # ---------- TOP SELLERS ----------
-    sql_sellers = f"""
-    SELECT
-        COALESCE(pp.FirstName + ' ' + pp.LastName, '(Sem vendedor)') AS SalesPerson,
-        SUM(sod.LineTotal) AS SalesValue
-    FROM Sales.SalesOrderHeader soh
-    JOIN Sales.SalesOrderDetail sod ON soh.SalesOrderID = sod.SalesOrderID
-    JOIN Production.Product p ON sod.ProductID = p.ProductID
-    JOIN Person.Address a ON soh.ShipToAddressID = a.AddressID
-    JOIN Person.StateProvince spv ON a.StateProvinceID = spv.StateProvinceID
-    LEFT JOIN Sales.SalesPerson sp ON soh.SalesPersonID = sp.BusinessEntityID
-    LEFT JOIN Person.Person pp ON sp.BusinessEntityID = pp.BusinessEntityID
-    LEFT JOIN Sales.Customer c ON soh.CustomerID = c.CustomerID
-    LEFT JOIN Sales.Store s ON c.StoreID = s.BusinessEntityID
-    WHERE
-        spv.CountryRegionCode = 'US'
-        AND CAST(soh.OrderDate AS DATE) BETWEEN ? AND ?
-        {product_filter}
-        {state_filter}
-        {store_filter}
-    GROUP BY
-        COALESCE(pp.FirstName + ' ' + pp.LastName, '(Sem vendedor)')
-    ORDER BY SalesValue DESC;
+        return result
+
+    result, _ = _cached_sql(
+        "crossfilter",
+        _load_crossfilter_sql,
+        (start_date, end_date, states, products),
+        get_data_version(),
+    )
+    return result
+
+# =========================
+# Execução paralela das consultas de um rerun
+# =========================
+@st.cache_resource
+def get_query_executor():
+    # Cada worker empresta a própria conexão do pool
+    return ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="hexagon-query")
+
+class QueryBatch:
+    """
+    Conjunto de consultas disparadas em paralelo no início de um rerun.
+    Cada componente pega o seu resultado com result(nome) e só espera pela
+    própria consulta, não pela soma de todas.
     """
 
-    params_sellers = params_base + params_states + store_params
-    top_sellers_df = pd.read_sql(sql_sellers, cn, params=params_sellers)
-    top_sellers_df = top_sellers_df.head(top_n)
-
-    # ---------- TOP STORES ----------
-    sql_stores = f"""
-    SELECT
-        COALESCE(s.Name, '(Sem loja)') AS Store,
-        SUM(sod.LineTotal) AS SalesValue
-    FROM Sales.SalesOrderHeader soh
-    JOIN Sales.SalesOrderDetail sod ON soh.SalesOrderID = sod.SalesOrderID
-    JOIN Production.Product p ON sod.ProductID = p.ProductID
-    JOIN Person.Address a ON soh.ShipToAddressID = a.AddressID
-    JOIN Person.StateProvince spv ON a.StateProvinceID = spv.StateProvinceID
-    LEFT JOIN Sales.Customer c ON soh.CustomerID = c.CustomerID
-    LEFT JOIN Sales.Store s ON c.StoreID = s.BusinessEntityID
-    LEFT JOIN Sales.SalesPerson sp ON soh.SalesPersonID = sp.BusinessEntityID
-    LEFT JOIN Person.Person pp ON sp.BusinessEntityID = pp.BusinessEntityID
-    WHERE
-        spv.CountryRegionCode = 'US'
-        AND CAST(soh.OrderDate AS DATE) BETWEEN ? AND ?
-        {product_filter}
-        {state_filter}
-        {seller_filter}
-    GROUP BY
-        COALESCE(s.Name, '(Sem loja)')
-    ORDER BY SalesValue DESC;
+    def __init__(self, executor):
+        self._executor = executor
+        self._futures = {}
+        self._ctx = get_script_run_ctx()
+
+    def submit(self, name, fn, *args, **kwargs):
+        ctx = self._ctx
+        # Leva o trace do rerun (contextvars) para a thread do executor
+        context = contextvars.copy_context()
+
+        def task():
+            # Sem o contexto do script o Streamlit avisa a cada chamada de cache
+            if ctx is not None:
+                add_script_run_ctx(threading.current_thread(), ctx)
+            return fn(*args, **kwargs)
+
+        self._futures[name] = self._executor.submit(context.run, task)
+        return self._futures[name]
+
+    def result(self, name):
+        return self._futures[name].result()
+
+def schedule_rerun_queries(filters):
+    batch = QueryBatch(get_query_executor())
+    # Seleções canônicas uma vez por rerun: mesma seleção em outra ordem ou
+    # "todos marcados" viram a mesma chave de cache (e ALL não gera IN no SQL)
+    start_date, end_date, state_ids, product_ids = get_canonical_filters(filters)
+
+    batch.submit("map", get_map_df, start_date, end_date, product_ids)
+    batch.submit("sales", get_sales_df, start_date, end_date, state_ids, product_ids)
+    # Base de todos os gráficos clicáveis; os cliques não disparam consultas
+    batch.submit("crossfilter", get_crossfilter, start_date, end_date, state_ids, product_ids)
+    return batch
+
+# =========================
+# Refresh em segundo plano (mantém os caches quentes)
+# =========================
+def _refresh_tick():
+    # Relê marca d'água/dimensões e, se os dados mudaram, recalcula o cubo
+    # ou as combinações de filtro mais usadas antes que alguém as peça
+    probe = get_probe_cache()
+    for key in ("watermark", "dims"):
+        probe.revalidate(key)
+    probe.wait()
+
+    version = get_data_version()
+    if ENGINE == "cube":
+        _cube_store()["cache"].refresh_hot(version, limit=1)
+    else:
+        for name in SQL_QUERIES:
+            get_result_cache(name).refresh_hot(version, limit=HOT_KEYS)
+
+@st.cache_resource
+def start_background_refresh():
+    return Refresher(_refresh_tick, WATERMARK_TTL).start()
+
+def get_data_status(filters):
+    """
+    Idade dos dados da tela (dict de SWRCache.status) ou None se a
+    combinação ainda não passou pelo cache (ex.: veio do cache semântico).
     """
+    version = get_data_version()
+    if ENGINE == "cube":
+        return _cube_store()["cache"].status("cube", version)
+    return get_result_cache("sales_filtered").status(
+        tuple(get_canonical_filters(filters)), version
+    )
 
-    params_stores = params_base + params_states + seller_params
-    top_stores_df = pd.read_sql(sql_stores, cn, params=params_stores)
-    top_stores_df = top_stores_df.head(top_n)
+def _all_caches():
+    return [get_probe_cache(), _cube_store()["cache"]] + [
+        get_result_cache(name) for name in CUBE_QUERIES + SQL_QUERIES
+    ]
 
-    return top_sellers_df, top_stores_df
+def get_cache_stats():
+    stats = {cache.name: cache.stats() for cache in _all_caches()}
+    stats["semantic"] = get_subsumption_stats()
+    return stats
 
+def get_memory_stats():
+    """
+    Uso do limite global (HEXAGON_MEMORY_BUDGET_MB): caches de resultados,
+    cache semântico e pré-carga do disco, por membro. O cubo fica fora do
+    limite (é a base de todas as respostas) e aparece à parte.
+    """
+    budget = get_memory_budget()
+    stats = budget.stats()
+    stats["members"] = budget.usage()
+    stats["cube_bytes"] = _cube_store()["cache"].nbytes()
+    return stats
 
+def get_cache_entries(limit=50):
+    """Maiores entradas de todos os caches (painel de diagnóstico)."""
+    rows = [row for cache in _all_caches() for row in cache.entries()]
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).sort_values("bytes", ascending=False).head(limit)
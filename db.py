@@ -1,25 +1,384 @@
-import pyodbc
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import timedelta
+
 import pandas as pd
 
+import tracing
+from query_log import QUERY_LOG
+from backends import concat, connect, day, dialect_of, id_list, year_month
+
+POOL_SIZE = int(os.environ.get("HEXAGON_POOL_SIZE", "8"))
+POOL_TIMEOUT = float(os.environ.get("HEXAGON_POOL_TIMEOUT", "30"))
+
+# Linhas por fetchmany: limita quantas tuplas Python existem ao mesmo tempo
+FETCH_BATCH_ROWS = int(os.environ.get("HEXAGON_FETCH_BATCH_ROWS", "50000"))
+
+# Conexões ociosas há mais que isso passam por health check antes do uso
+POOL_HEALTH_CHECK_AFTER = 30.0
+
 def get_conn():
-    # Habilita MARS para permitir múltiplas consultas simultâneas
-    return pyodbc.connect(
-        "DRIVER={ODBC Driver 17 for SQL Server};"
-        "SERVER=localhost;"
-        "DATABASE=AdventureWorks2025;"
-        "Trusted_Connection=yes;"
-        "MARS_Connection=yes;"
-    )
+    # SQL Server, DuckDB ou SQLite conforme HEXAGON_BACKEND (ver backends.py)
+    return connect()
 
-def _in_clause(values):
-    return ", ".join(["?"] * len(values))
+# =========================
+# Pool de conexões
+# =========================
+class PoolTimeout(Exception):
+    pass
 
-def get_metadata(conn):
-    df_dates = pd.read_sql(
+class ConnectionPool:
+    """
+    Pool limitado de conexões, seguro entre threads.
+
+    Cada thread (sessão/script do Streamlit) empresta a sua própria conexão,
+    então consultas de usuários diferentes rodam em paralelo. O empréstimo é
+    reentrante dentro da mesma thread, conexões ociosas são validadas antes
+    de voltar ao uso e conexões quebradas são descartadas e recriadas.
+    """
+
+    def __init__(self, connect=get_conn, max_size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._size = 0
+
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._reconnects = 0
+        self._timeouts = 0
+
+    # ---------- empréstimo ----------
+    @contextmanager
+    def connection(self):
+        local = self._local
+        if getattr(local, "conn", None) is not None:
+            local.depth += 1
+            try:
+                yield local.conn
+            finally:
+                local.depth -= 1
+            return
+
+        cn = self._acquire()
+        local.conn, local.depth = cn, 1
+        failed = False
+        try:
+            yield cn
+        except Exception:
+            failed = True
+            raise
+        finally:
+            local.conn, local.depth = None, 0
+            # Após erro, só devolve ao pool se a conexão ainda responde
+            if failed and not self._is_healthy(cn):
+                self._discard(cn)
+                local.dropped = True
+            else:
+                self._idle.put((cn, time.monotonic()))
+
+    def run(self, fn, *args, **kwargs):
         """
+        Executa fn(conn, *args, **kwargs) com uma conexão do pool. Se a conexão
+        caiu no meio da consulta, reconecta e tenta mais uma vez.
+        """
+        self._local.dropped = False
+        try:
+            with self.connection() as cn:
+                return fn(cn, *args, **kwargs)
+        except Exception:
+            # Erro de SQL com a conexão saudável não é repetido
+            if not getattr(self._local, "dropped", False):
+                raise
+            self._local.dropped = False
+            with self._lock:
+                self._reconnects += 1
+            with self.connection() as cn:
+                return fn(cn, *args, **kwargs)
+
+    def _acquire(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+
+        while True:
+            try:
+                cn, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                cn = self._try_create()
+                if cn is None:
+                    waited = True
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        with self._lock:
+                            self._timeouts += 1
+                        raise PoolTimeout(
+                            f"Nenhuma conexão livre em {self.timeout:.0f}s "
+                            f"(pool com {self.max_size})"
+                        )
+                    try:
+                        cn, idle_since = self._idle.get(timeout=remaining)
+                    except queue.Empty:
+                        continue
+                else:
+                    idle_since = None
+
+            if idle_since is not None and (
+                time.monotonic() - idle_since > POOL_HEALTH_CHECK_AFTER
+                and not self._is_healthy(cn)
+            ):
+                self._discard(cn)
+                with self._lock:
+                    self._reconnects += 1
+                continue
+
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self._checkouts += 1
+                if waited:
+                    self._waits += 1
+                self._wait_total += elapsed
+                self._wait_max = max(self._wait_max, elapsed)
+            return cn
+
+    def _try_create(self):
+        with self._lock:
+            if self._size >= self.max_size:
+                return None
+            self._size += 1
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._size -= 1
+            raise
+
+    def _discard(self, cn):
+        with self._lock:
+            self._size -= 1
+        try:
+            cn.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _is_healthy(cn):
+        try:
+            cur = cn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchall()
+            cur.close()
+            return True
+        except Exception:
+            return False
+
+    # ---------- métricas ----------
+    def stats(self):
+        with self._lock:
+            return {
+                "max_size": self.max_size,
+                "open": self._size,
+                "idle": self._idle.qsize(),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_avg_ms": 1000 * self._wait_total / max(self._checkouts, 1),
+                "wait_max_ms": 1000 * self._wait_max,
+                "reconnects": self._reconnects,
+                "timeouts": self._timeouts,
+            }
+
+    def close_all(self):
+        while True:
+            try:
+                cn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(cn)
+
+def _id_list(conn, values):
+    return id_list(dialect_of(conn), values)
+
+def _date_range(start_date, end_date):
+    """
+    Converte o intervalo fechado [start_date, end_date] (em dias) no
+    intervalo semiaberto [start, end + 1 dia) usado nos predicados
+    `OrderDate >= ? AND OrderDate < ?`, que permitem seek no índice.
+    Os limites são datas (sem hora) para valerem tanto contra a coluna
+    datetime do OLTP quanto contra a coluna date do fato diário.
+    """
+    start = pd.Timestamp(start_date).date()
+    end = pd.Timestamp(end_date).date() + timedelta(days=1)
+    return [start, end]
+
+# =========================
+# Leitura em lotes (fetchmany -> colunas tipadas)
+# =========================
+def _typed_column(values, dtype):
+    if dtype == "datetime":
+        return pd.to_datetime(pd.Series(values, dtype=object))
+    return pd.Series(values, dtype=dtype)
+
+def iter_batches(sql, conn, params=None, dtypes=None, batch_rows=FETCH_BATCH_ROWS):
+    """
+    Executa a consulta e entrega o resultado em DataFrames de até
+    `batch_rows` linhas. Cada lote é transposto direto em colunas, com os
+    tipos de `dtypes` (nome -> dtype ou "datetime"); as tuplas do driver
+    são descartadas a cada lote. Sempre entrega ao menos um lote (vazio,
+    se preciso), para o consumidor conhecer as colunas.
+    """
+    dtypes = dtypes or {}
+    params = list(params or [])
+    started = time.time_ns()
+    fetched = 0
+    size = 0
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, params)
+        columns = [d[0] for d in cur.description]
+        yielded = False
+        while True:
+            rows = cur.fetchmany(batch_rows)
+            if not rows and yielded:
+                break
+            values = list(zip(*rows)) if rows else [() for _ in columns]
+            batch = pd.DataFrame(
+                {
+                    name: _typed_column(column, dtypes.get(name))
+                    for name, column in zip(columns, values)
+                }
+            )
+            fetched += len(batch)
+            size += int(batch.memory_usage(index=False).sum())
+            yield batch
+            yielded = True
+            if len(rows) < batch_rows:
+                break
+    finally:
+        cur.close()
+        # Span registrado só no fim: o gerador pode ser consumido aos poucos
+        fingerprint = tracing.sql_fingerprint(sql)
+        tracing.record(
+            f"sql {fingerprint}",
+            "query",
+            started,
+            sql_fingerprint=fingerprint,
+            params=len(params),
+            rows=fetched,
+            bytes=size,
+        )
+        QUERY_LOG.observe(sql, params, (time.time_ns() - started) / 1e6, fetched)
+
+def read_frame(sql, conn, params=None, dtypes=None, batch_rows=FETCH_BATCH_ROWS):
+    """Mesma assinatura de pd.read_sql, lendo em lotes tipados."""
+    batches = list(iter_batches(sql, conn, params, dtypes, batch_rows))
+    if len(batches) == 1:
+        return batches[0]
+    return pd.concat(batches, ignore_index=True)
+
+def typed_sales_frame(df):
+    """
+    Tipos fixos do frame de vendas, calculados uma vez na carga:
+    SalesValue float64 (o pyodbc entrega Decimal), nomes como category
+    e as chaves de período YearMonth (AAAAMM) e Year como inteiros.
+    """
+    df["OrderDate"] = pd.to_datetime(df["OrderDate"])
+    df["SalesValue"] = df["SalesValue"].astype("float64")
+    for col in ("StateCode", "State", "Product"):
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    df["Year"] = df["OrderDate"].dt.year.astype("int32")
+    df["YearMonth"] = df["Year"] * 100 + df["OrderDate"].dt.month.astype("int32")
+    return df
+
+# =========================
+# Origem do fato: tabelas OLTP ou fato diário pré-agregado
+# =========================
+DAILY_FACT_TABLE = "dbo.HexagonDailySales"
+
+# Chave substituta para vendas sem vendedor / sem loja (NULL no banco)
+MISSING_KEY = -1
+
+FactSource = namedtuple(
+    "FactSource",
+    ["from_sql", "date_col", "day_col", "state", "product", "seller", "store", "value"],
+)
+
+OLTP_SOURCE = FactSource(
+    from_sql="""
+    FROM Sales.SalesOrderHeader soh
+    JOIN Sales.SalesOrderDetail sod ON soh.SalesOrderID = sod.SalesOrderID
+    JOIN Person.Address a ON soh.ShipToAddressID = a.AddressID
+    JOIN Person.StateProvince sp ON a.StateProvinceID = sp.StateProvinceID
+    LEFT JOIN Sales.Customer c ON soh.CustomerID = c.CustomerID""",
+    date_col="soh.OrderDate",
+    day_col=None,  # depende do dialeto, ver _source
+    state="a.StateProvinceID",
+    product="sod.ProductID",
+    seller="soh.SalesPersonID",
+    store="c.StoreID",
+    value="sod.LineTotal",
+)
+
+DAILY_SOURCE = FactSource(
+    from_sql=f"""
+    FROM {DAILY_FACT_TABLE} f
+    JOIN Person.StateProvince sp ON f.StateProvinceID = sp.StateProvinceID""",
+    date_col="f.OrderDate",
+    day_col="f.OrderDate",
+    state="f.StateProvinceID",
+    product="f.ProductID",
+    seller="f.SalesPersonID",
+    store="f.StoreID",
+    value="f.SalesValue",
+)
+
+# Tipos das colunas numéricas lidas em lotes (vendedor/loja podem ser NULL)
+SALES_DTYPES = {
+    "OrderDate": "datetime",
+    "StateProvinceID": "int64",
+    "ProductID": "int64",
+    "SalesValue": "float64",
+}
+FACT_DTYPES = {
+    **SALES_DTYPES,
+    "SalesPersonID": "float64",
+    "StoreID": "float64",
+}
+
+def has_daily_fact(conn):
+    # Sonda portátil: só falha se a tabela não existir
+    cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT 1 FROM {DAILY_FACT_TABLE} WHERE 1 = 0")
+        cur.fetchall()
+        return True
+    except Exception:
+        return False
+    finally:
+        cur.close()
+
+def _source(daily_fact, conn):
+    if daily_fact:
+        return DAILY_SOURCE
+    return OLTP_SOURCE._replace(day_col=day(dialect_of(conn), OLTP_SOURCE.date_col))
+
+def get_metadata(conn):
+    dialect = dialect_of(conn)
+    df_dates = read_frame(
+        f"""
         SELECT
-            MIN(CAST(soh.OrderDate AS DATE)) AS MinDate,
-            MAX(CAST(soh.OrderDate AS DATE)) AS MaxDate
+            {day(dialect, "MIN(soh.OrderDate)")} AS MinDate,
+            {day(dialect, "MAX(soh.OrderDate)")} AS MaxDate
         FROM Sales.SalesOrderHeader soh;
         """,
         conn,
@@ -27,9 +386,10 @@ def get_metadata(conn):
     min_date = df_dates.loc[0, "MinDate"]
     max_date = df_dates.loc[0, "MaxDate"]
 
-    state_df = pd.read_sql(
+    state_df = read_frame(
         """
         SELECT DISTINCT
+            sp.StateProvinceID,
             sp.StateProvinceCode AS StateCode,
             sp.Name AS StateName
         FROM Sales.SalesOrderHeader soh
@@ -41,77 +401,340 @@ def get_metadata(conn):
         conn,
     )
 
-    prod_df = pd.read_sql(
+    # Categoria para agrupar o seletor de produtos (sem subcategoria -> "Outros")
+    prod_df = read_frame(
         """
-        SELECT DISTINCT p.Name AS Product
+        SELECT DISTINCT
+            p.ProductID,
+            p.Name AS Product,
+            COALESCE(pc.Name, 'Outros') AS Category
         FROM Sales.SalesOrderDetail sod
         JOIN Production.Product p ON sod.ProductID = p.ProductID
+        LEFT JOIN Production.ProductSubcategory ps
+            ON p.ProductSubcategoryID = ps.ProductSubcategoryID
+        LEFT JOIN Production.ProductCategory pc
+            ON ps.ProductCategoryID = pc.ProductCategoryID
         ORDER BY p.Name;
         """,
         conn,
     )
 
-    products = prod_df["Product"].tolist()
-    return min_date, max_date, state_df, products
+    return min_date, max_date, state_df, prod_df
+
+def _in_filter(conn, column, ids):
+    """
+    (" AND coluna IN (...)", [parâmetro]); ids=None (todos) não gera predicado.
+    Listas vazias são tratadas antes, sem ir ao banco.
+    """
+    if ids is None:
+        return "", []
+    ids_sql, ids_param = _id_list(conn, ids)
+    return f" AND {column} IN {ids_sql}", [ids_param]
 
-def load_sales_by_state(conn, start_date, end_date, products_sel):
-    if not products_sel:
+def _is_empty(ids):
+    # None = todos; lista vazia = nenhum
+    return ids is not None and len(ids) == 0
+
+def load_sales_by_state(conn, start_date, end_date, product_ids, daily_fact=False):
+    if _is_empty(product_ids):
         return pd.DataFrame(columns=["StateCode", "SalesValue"])
 
+    src = _source(daily_fact, conn)
+    product_filter_sql, product_params = _in_filter(conn, src.product, product_ids)
     sql = f"""
     SELECT
         sp.StateProvinceCode AS StateCode,
-        SUM(sod.LineTotal) AS SalesValue
-    FROM Sales.SalesOrderHeader soh
-    JOIN Sales.SalesOrderDetail sod ON soh.SalesOrderID = sod.SalesOrderID
-    JOIN Production.Product p ON sod.ProductID = p.ProductID
-    JOIN Person.Address a ON soh.ShipToAddressID = a.AddressID
-    JOIN Person.StateProvince sp ON a.StateProvinceID = sp.StateProvinceID
+        SUM({src.value}) AS SalesValue
+    {src.from_sql}
     WHERE
         sp.CountryRegionCode = 'US'
-        AND CAST(soh.OrderDate AS DATE) BETWEEN ? AND ?
-        AND p.Name IN ({_in_clause(products_sel)})
+        AND {src.date_col} >= ? AND {src.date_col} < ?
+        {product_filter_sql}
     GROUP BY sp.StateProvinceCode;
     """
-    params = [start_date, end_date, *products_sel]
-    return pd.read_sql(sql, conn, params=params)
+    params = [*_date_range(start_date, end_date), *product_params]
+    return read_frame(sql, conn, params=params, dtypes={"SalesValue": "float64"})
 
-def load_sales_filtered(conn, start_date, end_date, states_sel, products_sel):
-    if not products_sel:
-        return pd.DataFrame(
-            columns=["OrderDate", "StateCode", "State", "Product", "SalesValue"]
+def load_sales_filtered(
+    conn, start_date, end_date, state_ids, product_ids, daily_fact=False
+):
+    # Nomes de produto são resolvidos depois, a partir da metadata
+    if _is_empty(product_ids):
+        return typed_sales_frame(
+            pd.DataFrame(
+                columns=[
+                    "OrderDate",
+                    "StateProvinceID",
+                    "StateCode",
+                    "State",
+                    "ProductID",
+                    "SalesValue",
+                ]
+            )
         )
 
-    state_filter_sql = ""
-    params = [start_date, end_date, *products_sel]
-
-    if states_sel:
-        state_filter_sql = f" AND sp.StateProvinceCode IN ({_in_clause(states_sel)})"
-        params = [start_date, end_date, *products_sel, *states_sel]
+    src = _source(daily_fact, conn)
+    product_filter_sql, product_params = _in_filter(conn, src.product, product_ids)
+    # Estados: None ou vazio = todos
+    state_filter_sql, state_params = _in_filter(conn, src.state, state_ids or None)
+    params = [*_date_range(start_date, end_date), *product_params, *state_params]
 
     sql = f"""
     SELECT
-        CAST(soh.OrderDate AS DATE) AS OrderDate,
+        {src.day_col} AS OrderDate,
+        sp.StateProvinceID,
         sp.StateProvinceCode AS StateCode,
         sp.Name AS State,
-        p.Name AS Product,
-        SUM(sod.LineTotal) AS SalesValue
-    FROM Sales.SalesOrderHeader soh
-    JOIN Sales.SalesOrderDetail sod ON soh.SalesOrderID = sod.SalesOrderID
-    JOIN Production.Product p ON sod.ProductID = p.ProductID
-    JOIN Person.Address a ON soh.ShipToAddressID = a.AddressID
-    JOIN Person.StateProvince sp ON a.StateProvinceID = sp.StateProvinceID
+        {src.product} AS ProductID,
+        SUM({src.value}) AS SalesValue
+    {src.from_sql}
     WHERE
         sp.CountryRegionCode = 'US'
-        AND CAST(soh.OrderDate AS DATE) BETWEEN ? AND ?
-        AND p.Name IN ({_in_clause(products_sel)})
+        AND {src.date_col} >= ? AND {src.date_col} < ?
+        {product_filter_sql}
         {state_filter_sql}
     GROUP BY
-        CAST(soh.OrderDate AS DATE),
+        {src.day_col},
+        sp.StateProvinceID,
         sp.StateProvinceCode,
         sp.Name,
-        p.Name;
+        {src.product};
     """
-    df = pd.read_sql(sql, conn, params=params)
-    df["OrderDate"] = pd.to_datetime(df["OrderDate"])
-    return df
+    df = read_frame(sql, conn, params=params, dtypes=SALES_DTYPES)
+    return typed_sales_frame(df)
+
+# Vendedor/loja podem ser NULL (lidos como float, viram MISSING_KEY)
+CROSSFILTER_DTYPES = {
+    "SalesPersonID": "float64",
+    "StoreID": "float64",
+    "ProductID": "int64",
+    "YearMonth": "int64",
+    "SalesValue": "float64",
+}
+
+def load_crossfilter_facts(
+    conn, start_date, end_date, state_ids, product_ids, daily_fact=False
+):
+    """
+    Vendas por vendedor x loja x produto x mês, só com as chaves (os nomes
+    vêm das dimensões). Uma leitura por combinação de filtros globais:
+    todos os cliques são respondidos em memória a partir dela.
+    """
+    if _is_empty(product_ids):
+        df = pd.DataFrame(columns=list(CROSSFILTER_DTYPES)).astype(CROSSFILTER_DTYPES)
+    else:
+        src = _source(daily_fact, conn)
+        month = year_month(dialect_of(conn), src.date_col)
+        product_filter_sql, product_params = _in_filter(conn, src.product, product_ids)
+        state_filter_sql, state_params = _in_filter(conn, src.state, state_ids or None)
+        params = [*_date_range(start_date, end_date), *product_params, *state_params]
+
+        sql = f"""
+        SELECT
+            {src.seller} AS SalesPersonID,
+            {src.store} AS StoreID,
+            {src.product} AS ProductID,
+            {month} AS YearMonth,
+            SUM({src.value}) AS SalesValue
+        {src.from_sql}
+        WHERE
+            sp.CountryRegionCode = 'US'
+            AND {src.date_col} >= ? AND {src.date_col} < ?
+            {product_filter_sql}
+            {state_filter_sql}
+        GROUP BY
+            {src.seller},
+            {src.store},
+            {src.product},
+            {month};
+        """
+        df = read_frame(sql, conn, params=params, dtypes=CROSSFILTER_DTYPES)
+
+    # Vendas sem vendedor/loja (NULL) ganham a chave substituta
+    return df.fillna({"SalesPersonID": MISSING_KEY, "StoreID": MISSING_KEY}).astype(
+        {"SalesPersonID": "int64", "StoreID": "int64"}
+    )
+
+# =========================
+# Fato + dimensões (motor de cubo)
+# =========================
+def load_dimensions(conn):
+    states = read_frame(
+        """
+        SELECT
+            sp.StateProvinceID,
+            sp.StateProvinceCode AS StateCode,
+            sp.Name AS StateName
+        FROM Person.StateProvince sp
+        WHERE sp.CountryRegionCode = 'US';
+        """,
+        conn,
+    )
+
+    products = read_frame(
+        """
+        SELECT p.ProductID, p.Name AS Product
+        FROM Production.Product p;
+        """,
+        conn,
+    )
+
+    seller_name = concat(dialect_of(conn), "pp.FirstName", "' '", "pp.LastName")
+    sellers = read_frame(
+        f"""
+        SELECT
+            sp.BusinessEntityID AS SalesPersonID,
+            {seller_name} AS SalesPerson
+        FROM Sales.SalesPerson sp
+        JOIN Person.Person pp ON sp.BusinessEntityID = pp.BusinessEntityID;
+        """,
+        conn,
+    )
+
+    stores = read_frame(
+        """
+        SELECT s.BusinessEntityID AS StoreID, s.Name AS Store
+        FROM Sales.Store s;
+        """,
+        conn,
+    )
+
+    return {
+        "states": states,
+        "products": products,
+        "sellers": sellers,
+        "stores": stores,
+    }
+
+def _sales_fact_query(conn, daily_fact, min_order_id, max_order_id):
+    # Grão do cubo: dia x estado x produto x vendedor x loja
+    # min/max_order_id recortam a faixa (min, max] de SalesOrderID (só OLTP)
+    src = _source(daily_fact, conn)
+    order_filter = ""
+    params = []
+    if not daily_fact:
+        if min_order_id is not None:
+            order_filter += " AND soh.SalesOrderID > ?"
+            params.append(int(min_order_id))
+        if max_order_id is not None:
+            order_filter += " AND soh.SalesOrderID <= ?"
+            params.append(int(max_order_id))
+
+    sql = f"""
+    SELECT
+        {src.day_col} AS OrderDate,
+        {src.state} AS StateProvinceID,
+        {src.product} AS ProductID,
+        {src.seller} AS SalesPersonID,
+        {src.store} AS StoreID,
+        SUM({src.value}) AS SalesValue
+    {src.from_sql}
+    WHERE
+        sp.CountryRegionCode = 'US'
+        {order_filter}
+    GROUP BY
+        {src.day_col},
+        {src.state},
+        {src.product},
+        {src.seller},
+        {src.store};
+    """
+    return sql, params
+
+def iter_sales_fact(conn, daily_fact=False, min_order_id=None, max_order_id=None):
+    """Fato do cubo em lotes, para codificar sem materializar tudo antes."""
+    sql, params = _sales_fact_query(conn, daily_fact, min_order_id, max_order_id)
+    return iter_batches(sql, conn, params=params, dtypes=FACT_DTYPES)
+
+def load_sales_fact(conn, daily_fact=False, min_order_id=None, max_order_id=None):
+    sql, params = _sales_fact_query(conn, daily_fact, min_order_id, max_order_id)
+    return read_frame(sql, conn, params=params, dtypes=FACT_DTYPES)
+
+# =========================
+# Marca d'água / versões (refresh incremental)
+# =========================
+def get_watermark(conn):
+    # Consultas baratas: MAX/MIN nas chaves e índices de SalesOrderHeader
+    dialect = dialect_of(conn)
+    df = read_frame(
+        f"""
+        SELECT
+            MAX(soh.SalesOrderID) AS MaxOrderID,
+            MAX(soh.ModifiedDate) AS MaxModified,
+            {day(dialect, "MIN(soh.OrderDate)")} AS MinDate,
+            {day(dialect, "MAX(soh.OrderDate)")} AS MaxDate
+        FROM Sales.SalesOrderHeader soh;
+        """,
+        conn,
+    )
+    row = df.iloc[0]
+    return normalize_watermark(row.to_dict())
+
+def normalize_watermark(raw):
+    # Tipos fixos (int / Timestamp / date) independentemente do driver,
+    # para comparar e serializar marcas d'água vindas do banco ou do disco
+    def _get(name, cast):
+        value = raw.get(name)
+        return None if value is None or pd.isna(value) else cast(value)
+
+    return {
+        "MaxOrderID": _get("MaxOrderID", int),
+        "MaxModified": _get("MaxModified", pd.Timestamp),
+        "MinDate": _get("MinDate", lambda v: pd.Timestamp(v).date()),
+        "MaxDate": _get("MaxDate", lambda v: pd.Timestamp(v).date()),
+    }
+
+def count_changed_orders(conn, watermark):
+    # Pedidos já carregados que foram alterados depois da marca d'água
+    if watermark["MaxOrderID"] is None:
+        return 0
+    modified = watermark["MaxModified"]
+    if isinstance(modified, pd.Timestamp):
+        modified = modified.to_pydatetime()
+    df = read_frame(
+        """
+        SELECT COUNT(*) AS Changed
+        FROM Sales.SalesOrderHeader soh
+        WHERE soh.ModifiedDate > ? AND soh.SalesOrderID <= ?;
+        """,
+        conn,
+        params=[modified, watermark["MaxOrderID"]],
+    )
+    return int(df.loc[0, "Changed"])
+
+def get_daily_fact_version(conn):
+    """
+    Versão do fato diário (linhas, último dia, soma das vendas). A tabela só
+    muda quando o job externo a reconstrói, não a cada pedido novo no OLTP.
+    """
+    df = read_frame(
+        f"""
+        SELECT COUNT(*) AS N, MAX(f.OrderDate) AS MaxDate, SUM(f.SalesValue) AS Total
+        FROM {DAILY_FACT_TABLE} f;
+        """,
+        conn,
+    )
+    row = df.iloc[0]
+    return (int(row.N), str(row.MaxDate), f"{float(row.Total or 0):.4f}")
+
+def get_dimension_version(conn):
+    """
+    Versão das dimensões (contagem + última alteração de cada tabela).
+    Só muda quando produtos, estados, lojas ou vendedores mudam de fato.
+    """
+    df = read_frame(
+        """
+        SELECT 'Product' AS Dim, COUNT(*) AS N, MAX(ModifiedDate) AS LastModified
+        FROM Production.Product
+        UNION ALL
+        SELECT 'StateProvince', COUNT(*), MAX(ModifiedDate) FROM Person.StateProvince
+        UNION ALL
+        SELECT 'Store', COUNT(*), MAX(ModifiedDate) FROM Sales.Store
+        UNION ALL
+        SELECT 'SalesPerson', COUNT(*), MAX(ModifiedDate) FROM Sales.SalesPerson;
+        """,
+        conn,
+    )
+    return tuple(
+        (row.Dim, int(row.N), str(row.LastModified)) for row in df.itertuples()
+    )
@@ -0,0 +1,240 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from cache import AgingClock, value_nbytes
+
+try:
+    import pyarrow  # noqa: F401  (motor do to_parquet/read_parquet)
+except ImportError:  # sem pyarrow o cache em disco fica desligado
+    pyarrow = None
+
+CACHE_DIR = os.environ.get("HEXAGON_CACHE_DIR", ".hexagon_cache")
+CACHE_BUDGET_MB = int(os.environ.get("HEXAGON_CACHE_BUDGET_MB", "512"))
+
+# Entradas mais recentes carregadas em memória na subida do processo
+PRELOAD_MB = int(os.environ.get("HEXAGON_CACHE_PRELOAD_MB", "128"))
+
+# Temporários mais velhos que isso são restos de gravações interrompidas
+# (um put em andamento em outro processo ainda não passou desse tempo)
+TMP_MAX_AGE = 600
+
+def fingerprint(*parts):
+    """
+    Chave estável do cache: hash da consulta (nome + argumentos) e da versão
+    dos dados. Mesma entrada -> mesmo arquivo, entre processos e restarts.
+    """
+    raw = json.dumps(parts, default=str, sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+class DiskCache:
+    """
+    Cache de resultados em Parquet no disco local.
+
+    Cada entrada é uma lista de DataFrames (`<chave>.<i>.parquet`) mais um
+    JSON opcional de metadados. O tamanho total respeita `budget_bytes`,
+    removendo as entradas usadas há mais tempo (LRU pelo mtime, que é
+    atualizado a cada leitura).
+
+    As entradas pré-carregadas em memória (preload) entram no MemoryBudget
+    `memory_budget`, se houver: saem da memória (o arquivo fica) quando o
+    processo passa do limite.
+    """
+
+    def __init__(
+        self,
+        directory=CACHE_DIR,
+        budget_bytes=CACHE_BUDGET_MB * 1024 * 1024,
+        memory_budget=None,
+        name="disk_preload",
+    ):
+        self.directory = Path(directory)
+        self.budget_bytes = budget_bytes
+        self.enabled = pyarrow is not None and budget_bytes > 0
+        self.name = name
+        self._lock = threading.Lock()
+        self._memory = {}
+        # Bytes e último uso (relógio do MemoryBudget) de cada entrada em memória
+        self._memory_bytes = {}
+        self._memory_used = {}
+        self._budget = memory_budget
+        self._clock = memory_budget.clock if memory_budget is not None else AgingClock()
+        if memory_budget is not None:
+            memory_budget.register(self)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.enabled:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    # ---------- arquivos ----------
+    def _parts(self, key):
+        return sorted(
+            self.directory.glob(f"{key}.*.parquet"),
+            key=lambda p: int(p.name.split(".")[-2]),
+        )
+
+    def _meta_path(self, key):
+        return self.directory / f"{key}.json"
+
+    def _entries(self):
+        # chave -> (arquivos, bytes, último uso)
+        entries = {}
+        for path in self.directory.glob("*.parquet"):
+            key = path.name.split(".")[0]
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files, size, used = entries.get(key, ([], 0, 0.0))
+            entries[key] = (files + [path], size + stat.st_size, max(used, stat.st_mtime))
+        return entries
+
+    # ---------- API ----------
+    def get(self, key):
+        """Retorna (frames, meta) ou None."""
+        if not self.enabled:
+            return None
+
+        if key in self._memory:
+            self.hits += 1
+            frames, meta = self._memory[key]
+            self._memory_used[key] = self._clock.value
+            # Cópias rasas (Copy-on-Write): o frame em memória não é duplicado
+            return [f.copy(deep=False) for f in frames], meta
+
+        # Listagem + leitura sob o lock: um put no meio (apaga as partes
+        # velhas e grava as novas uma a uma) não entrega uma lista parcial
+        with self._lock:
+            parts = self._parts(key)
+            if not parts:
+                self.misses += 1
+                return None
+
+            try:
+                frames = [pd.read_parquet(p) for p in parts]
+                meta_path = self._meta_path(key)
+                meta = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+                now = time.time()
+                for p in parts:
+                    os.utime(p, (now, now))
+            except (OSError, ValueError):
+                # Arquivo removido/corrompido no meio da leitura: trata como miss
+                self.misses += 1
+                return None
+
+        self.hits += 1
+        return frames, meta
+
+    def put(self, key, frames, meta=None):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            for old in self._parts(key):
+                old.unlink(missing_ok=True)
+
+            for i, frame in enumerate(frames):
+                final = self.directory / f"{key}.{i}.parquet"
+                tmp = final.with_suffix(f".tmp{threading.get_ident()}")
+                frame.reset_index(drop=True).to_parquet(tmp, index=False)
+                os.replace(tmp, final)
+
+            if meta is not None:
+                tmp = self._meta_path(key).with_suffix(".jsontmp")
+                tmp.write_text(json.dumps(meta, default=str))
+                os.replace(tmp, self._meta_path(key))
+
+            self._forget(key)
+            self._evict()
+
+    def _evict(self):
+        # Temporários de um put que não terminou (processo caiu no meio)
+        cutoff = time.time() - TMP_MAX_AGE
+        for pattern in ("*.tmp*", "*.jsontmp"):
+            for path in self.directory.glob(pattern):
+                try:
+                    if path.stat().st_mtime < cutoff:
+                        path.unlink()
+                except FileNotFoundError:
+                    pass
+
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries.values())
+        for key, (files, size, _) in sorted(entries.items(), key=lambda kv: kv[1][2]):
+            if total <= self.budget_bytes:
+                break
+            for path in files:
+                path.unlink(missing_ok=True)
+            self._meta_path(key).unlink(missing_ok=True)
+            self._forget(key)
+            total -= size
+            self.evictions += 1
+
+    def preload(self, budget_bytes=PRELOAD_MB * 1024 * 1024):
+        """Carrega em memória as entradas usadas mais recentemente."""
+        if not self.enabled:
+            return 0
+
+        loaded = 0
+        entries = sorted(self._entries().items(), key=lambda kv: kv[1][2], reverse=True)
+        for key, (_, size, _) in entries:
+            if loaded + size > budget_bytes:
+                break
+            found = self.get(key)
+            if found is not None:
+                with self._lock:
+                    self._memory[key] = found
+                    self._memory_bytes[key] = value_nbytes(found[0])
+                    self._memory_used[key] = self._clock.value
+                loaded += size
+        if self._budget is not None:
+            self._budget.enforce()
+        return loaded
+
+    def _forget(self, key):
+        # Tira a entrada só da memória (chamar com o lock)
+        self._memory.pop(key, None)
+        self._memory_bytes.pop(key, None)
+        return self._memory_used.pop(key, None)
+
+    # ---------- membro do MemoryBudget ----------
+    def nbytes(self):
+        with self._lock:
+            return sum(self._memory_bytes.values())
+
+    def victim(self):
+        with self._lock:
+            if not self._memory_used:
+                return None
+            return min(
+                ((used, key) for key, used in self._memory_used.items()), key=lambda item: item[0]
+            )
+
+    def evict(self, key):
+        with self._lock:
+            if key not in self._memory:
+                return False
+            self._clock.advance(self._forget(key))
+            return True
+
+    def stats(self):
+        entries = self._entries() if self.enabled else {}
+        return {
+            "enabled": self.enabled,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries.values()),
+            "budget_bytes": self.budget_bytes,
+            "preloaded": len(self._memory),
+            "preloaded_bytes": self.nbytes(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
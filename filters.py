@@ -0,0 +1,87 @@
+import hashlib
+from collections import namedtuple
+
+import numpy as np
+
+class Selection:
+    """
+    Seleção canônica de IDs (estados ou produtos).
+
+    Os IDs ficam ordenados e sem repetição, então a mesma seleção em outra
+    ordem dá a mesma chave de cache. ALL ("todos", sem predicado no SQL) e
+    NONE ("nenhum", resultado vazio sem ir ao banco) são sentinelas. O
+    hash e o texto (usado na chave do cache em disco) são compactos:
+    "all", "none" ou "<n>:<sha1>" em vez de centenas de IDs.
+    """
+
+    __slots__ = ("kind", "ids", "token", "_hash")
+
+    def __init__(self, kind, ids=()):
+        self.kind = kind
+        self.ids = ids
+        if kind == "some":
+            digest = hashlib.sha1(np.asarray(ids, dtype=np.int64).tobytes()).hexdigest()[:16]
+            self.token = f"{len(ids)}:{digest}"
+        else:
+            self.token = kind
+        self._hash = hash(self.token)
+
+    @classmethod
+    def of(cls, ids, universe=None, empty_means_all=False):
+        """
+        Normaliza `ids`. Com `universe` (todos os IDs existentes), selecionar
+        todos vira ALL; `empty_means_all` trata a lista vazia como ALL (regra
+        do filtro de estados: vazio = "Todos").
+        """
+        if isinstance(ids, Selection):
+            return ids
+        unique = tuple(sorted({int(i) for i in ids}))
+        if not unique:
+            return ALL if empty_means_all else NONE
+        if universe is not None and set(universe) <= set(unique):
+            return ALL
+        return cls("some", unique)
+
+    @property
+    def is_all(self):
+        return self.kind == "all"
+
+    @property
+    def is_none(self):
+        return self.kind == "none"
+
+    @property
+    def predicate(self):
+        """IDs para o IN do SQL/cubo, ou None quando não há predicado (ALL)."""
+        return None if self.is_all else self.ids
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, Selection)
+            and self.token == other.token
+            and self.ids == other.ids
+        )
+
+    def __hash__(self):
+        return self._hash
+
+    def __repr__(self):
+        return f"Selection({self.token})"
+
+    def __reduce__(self):
+        return (Selection, (self.kind, self.ids))
+
+ALL = Selection("all")
+NONE = Selection("none")
+
+# Filtros do dashboard já normalizados (chave dos caches)
+CanonicalFilters = namedtuple("CanonicalFilters", ["start_date", "end_date", "states", "products"])
+
+def canonical_filters(filters, state_universe, product_universe):
+    """Filtros do session_state -> CanonicalFilters (vazio em estados = todos)."""
+    return CanonicalFilters(
+        start_date=filters["start_date"],
+        end_date=filters["end_date"],
+        states=Selection.of(filters["states"], state_universe, empty_means_all=True),
+        products=Selection.of(filters["products"], product_universe),
+    )
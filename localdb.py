@@ -0,0 +1,410 @@
+"""
+Banco local com o formato do AdventureWorks (DuckDB ou SQLite).
+
+    python localdb.py build --backend duckdb --path hexagon.duckdb --scale 1
+    python localdb.py export --path hexagon.duckdb
+
+`build` gera dados sintéticos na escala pedida (1 ~ volume do AdventureWorks);
+`export` copia do SQL Server (HEXAGON_ODBC) as tabelas que o app lê, para
+servir as análises a partir de um snapshot DuckDB, longe do OLTP.
+Depois: HEXAGON_BACKEND=duckdb HEXAGON_DB_PATH=hexagon.duckdb streamlit run app.py
+"""
+import argparse
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from backends import DUCKDB, SCHEMAS, SQLITE, connect, day, dialect_of
+from db import DAILY_FACT_TABLE, iter_batches
+
+# =========================
+# Esquema (só as colunas usadas pelo app)
+# =========================
+# Incrementar ao mudar TABLES: bancos gerados antes ficam incompatíveis
+SCHEMA_VERSION = 2
+
+TABLES = {
+    "Person.StateProvince": [
+        ("StateProvinceID", "int"),
+        ("StateProvinceCode", "text"),
+        ("CountryRegionCode", "text"),
+        ("Name", "text"),
+        ("ModifiedDate", "timestamp"),
+    ],
+    "Person.Address": [("AddressID", "int"), ("StateProvinceID", "int")],
+    "Person.Person": [
+        ("BusinessEntityID", "int"),
+        ("FirstName", "text"),
+        ("LastName", "text"),
+    ],
+    "Production.ProductCategory": [("ProductCategoryID", "int"), ("Name", "text")],
+    "Production.ProductSubcategory": [
+        ("ProductSubcategoryID", "int"),
+        ("ProductCategoryID", "int"),
+        ("Name", "text"),
+    ],
+    "Production.Product": [
+        ("ProductID", "int"),
+        ("Name", "text"),
+        ("ProductSubcategoryID", "int"),
+        ("ModifiedDate", "timestamp"),
+    ],
+    "Sales.SalesPerson": [("BusinessEntityID", "int"), ("ModifiedDate", "timestamp")],
+    "Sales.Store": [
+        ("BusinessEntityID", "int"),
+        ("Name", "text"),
+        ("ModifiedDate", "timestamp"),
+    ],
+    "Sales.Customer": [("CustomerID", "int"), ("StoreID", "int")],
+    "Sales.SalesOrderHeader": [
+        ("SalesOrderID", "int"),
+        ("OrderDate", "timestamp"),
+        ("CustomerID", "int"),
+        ("SalesPersonID", "int"),
+        ("ShipToAddressID", "int"),
+        ("ModifiedDate", "timestamp"),
+    ],
+    "Sales.SalesOrderDetail": [
+        ("SalesOrderDetailID", "int"),
+        ("SalesOrderID", "int"),
+        ("ProductID", "int"),
+        ("LineTotal", "money"),
+    ],
+}
+
+COLUMN_TYPES = {
+    "sqlite": {"int": "INTEGER", "text": "TEXT", "timestamp": "TEXT", "money": "REAL"},
+    "duckdb": {"int": "INTEGER", "text": "VARCHAR", "timestamp": "TIMESTAMP", "money": "DOUBLE"},
+}
+
+# Tipos das colunas ao ler em lotes (ex.: exportação do SQL Server)
+READ_DTYPES = {"int": "Int64", "text": None, "timestamp": "datetime", "money": "float64"}
+
+INDEXES = [
+    ("Sales", "IX_SOH_OrderDate", "SalesOrderHeader", "OrderDate"),
+    ("Sales", "IX_SOD_SalesOrderID", "SalesOrderDetail", "SalesOrderID"),
+]
+
+def create_schema(conn):
+    dialect = dialect_of(conn)
+    types = COLUMN_TYPES[dialect.name]
+    if dialect is DUCKDB:
+        for schema in SCHEMAS:
+            conn.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+
+    for table, columns in TABLES.items():
+        cols = ", ".join(f"{name} {types[kind]}" for name, kind in columns)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({cols})")
+
+    if dialect is SQLITE:
+        for schema, name, table, column in INDEXES:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.{name} ON {table} ({column})")
+    conn.commit()
+
+def _insert(conn, table, frame, chunk_rows=100_000):
+    if frame.empty:
+        return
+    if dialect_of(conn) is DUCKDB:
+        conn.register("_hexagon_rows", frame)
+        try:
+            conn.execute(f"INSERT INTO {table} SELECT * FROM _hexagon_rows")
+        finally:
+            conn.unregister("_hexagon_rows")
+        return
+
+    # SQLite: datas como texto ISO, nulos como None
+    frame = frame.copy()
+    for name in frame.columns:
+        if pd.api.types.is_datetime64_any_dtype(frame[name]):
+            frame[name] = frame[name].dt.strftime("%Y-%m-%d %H:%M:%S")
+
+    placeholders = ", ".join(["?"] * len(frame.columns))
+    sql = f"INSERT INTO {table} VALUES ({placeholders})"
+    for start in range(0, len(frame), chunk_rows):
+        chunk = frame.iloc[start:start + chunk_rows].astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        conn.executemany(sql, chunk.itertuples(index=False, name=None))
+    conn.commit()
+
+# =========================
+# Dados sintéticos
+# =========================
+Shape = namedtuple(
+    "Shape", ["orders", "products", "us_states", "sellers", "stores", "customers", "addresses"]
+)
+
+US_STATES = [
+    ("CA", "California"), ("WA", "Washington"), ("TX", "Texas"), ("NY", "New York"),
+    ("FL", "Florida"), ("OR", "Oregon"), ("IL", "Illinois"), ("OH", "Ohio"),
+    ("GA", "Georgia"), ("AZ", "Arizona"), ("MI", "Michigan"), ("NC", "North Carolina"),
+    ("PA", "Pennsylvania"), ("CO", "Colorado"), ("MA", "Massachusetts"), ("NV", "Nevada"),
+    ("UT", "Utah"), ("MN", "Minnesota"), ("VA", "Virginia"), ("MO", "Missouri"),
+]
+OTHER_STATES = [("ON", "CA", "Ontario"), ("BC", "CA", "British Columbia")]
+
+# Categorias e subcategorias do AdventureWorks (amostra)
+CATEGORIES = {
+    "Bikes": ["Mountain Bikes", "Road Bikes", "Touring Bikes"],
+    "Components": ["Handlebars", "Wheels", "Brakes", "Chains"],
+    "Clothing": ["Jerseys", "Gloves", "Shorts"],
+    "Accessories": ["Helmets", "Bottles and Cages", "Lights"],
+}
+
+# Faixas de IDs parecidas com as do AdventureWorks
+FIRST_ADDRESS_ID = 100
+FIRST_SELLER_ID = 270
+FIRST_PRODUCT_ID = 700
+FIRST_STORE_ID = 900
+
+DIMENSIONS_MODIFIED = datetime(2021, 1, 1)
+ORDERS_START = datetime(2022, 1, 1)
+
+def shape_for(scale):
+    """Escala 1 ~ volume do AdventureWorks (31 mil pedidos, ~120 mil linhas)."""
+    return Shape(
+        orders=max(1, int(31_000 * scale)),
+        products=266,
+        us_states=len(US_STATES),
+        sellers=17,
+        stores=700,
+        customers=max(30, int(19_000 * min(scale, 10))),
+        addresses=max(20, int(19_000 * min(scale, 10))),
+    )
+
+def add_dimensions(conn, shape):
+    states = [
+        (i + 1, code, "US", name) for i, (code, name) in enumerate(US_STATES[: shape.us_states])
+    ]
+    states += [
+        (len(states) + i + 1, code, country, name)
+        for i, (code, country, name) in enumerate(OTHER_STATES)
+    ]
+    state_df = pd.DataFrame(
+        states, columns=["StateProvinceID", "StateProvinceCode", "CountryRegionCode", "Name"]
+    )
+    state_df["ModifiedDate"] = DIMENSIONS_MODIFIED
+    _insert(conn, "Person.StateProvince", state_df)
+
+    _insert(
+        conn,
+        "Person.Address",
+        pd.DataFrame(
+            {
+                "AddressID": FIRST_ADDRESS_ID + np.arange(shape.addresses),
+                "StateProvinceID": np.arange(shape.addresses) % len(states) + 1,
+            }
+        ),
+    )
+
+    seller_ids = FIRST_SELLER_ID + np.arange(shape.sellers)
+    _insert(
+        conn,
+        "Person.Person",
+        pd.DataFrame(
+            {
+                "BusinessEntityID": seller_ids,
+                "FirstName": [f"Seller{i}" for i in range(shape.sellers)],
+                "LastName": [f"Last{i}" for i in range(shape.sellers)],
+            }
+        ),
+    )
+    _insert(
+        conn,
+        "Sales.SalesPerson",
+        pd.DataFrame({"BusinessEntityID": seller_ids, "ModifiedDate": DIMENSIONS_MODIFIED}),
+    )
+
+    _insert(
+        conn,
+        "Production.ProductCategory",
+        pd.DataFrame(
+            {"ProductCategoryID": np.arange(1, len(CATEGORIES) + 1), "Name": list(CATEGORIES)}
+        ),
+    )
+    subcategories = [
+        (category_id, name)
+        for category_id, names in enumerate(CATEGORIES.values(), start=1)
+        for name in names
+    ]
+    _insert(
+        conn,
+        "Production.ProductSubcategory",
+        pd.DataFrame(
+            {
+                "ProductSubcategoryID": np.arange(1, len(subcategories) + 1),
+                "ProductCategoryID": [category_id for category_id, _ in subcategories],
+                "Name": [name for _, name in subcategories],
+            }
+        ),
+    )
+
+    # Como no AdventureWorks, alguns produtos não têm subcategoria
+    product_index = np.arange(shape.products)
+    subcategory_ids = pd.array(product_index % len(subcategories) + 1, dtype="Int64")
+    subcategory_ids[product_index % 10 == 9] = pd.NA
+    _insert(
+        conn,
+        "Production.Product",
+        pd.DataFrame(
+            {
+                "ProductID": FIRST_PRODUCT_ID + product_index,
+                "Name": [f"Product {i:02d}" for i in range(shape.products)],
+                "ProductSubcategoryID": subcategory_ids,
+                "ModifiedDate": DIMENSIONS_MODIFIED,
+            }
+        ),
+    )
+    _insert(
+        conn,
+        "Sales.Store",
+        pd.DataFrame(
+            {
+                "BusinessEntityID": FIRST_STORE_ID + np.arange(shape.stores),
+                "Name": [f"Store {i}" for i in range(shape.stores)],
+                "ModifiedDate": DIMENSIONS_MODIFIED,
+            }
+        ),
+    )
+
+    # Um a cada três clientes é pessoa física (sem loja)
+    customer_ids = np.arange(1, shape.customers + 1)
+    store_ids = pd.array(FIRST_STORE_ID + customer_ids % shape.stores, dtype="Int64")
+    store_ids[customer_ids % 3 == 0] = pd.NA
+    _insert(
+        conn,
+        "Sales.Customer",
+        pd.DataFrame({"CustomerID": customer_ids, "StoreID": store_ids}),
+    )
+
+def _ids(conn, sql):
+    cur = conn.cursor()
+    try:
+        cur.execute(sql)
+        return np.array([row[0] for row in cur.fetchall()], dtype=np.int64)
+    finally:
+        cur.close()
+
+def add_orders(conn, n_orders, seed=0, start=ORDERS_START, days=365):
+    """
+    Acrescenta `n_orders` pedidos (1 a 3 linhas cada) após o último
+    SalesOrderID, com datas em [start, start + days).
+    """
+    rng = np.random.default_rng(seed)
+    last_order = _ids(conn, "SELECT COALESCE(MAX(SalesOrderID), 0) FROM Sales.SalesOrderHeader")[0]
+    last_detail = _ids(
+        conn, "SELECT COALESCE(MAX(SalesOrderDetailID), 0) FROM Sales.SalesOrderDetail"
+    )[0]
+    customers = _ids(conn, "SELECT CustomerID FROM Sales.Customer")
+    addresses = _ids(conn, "SELECT AddressID FROM Person.Address")
+    sellers = _ids(conn, "SELECT BusinessEntityID FROM Sales.SalesPerson")
+    products = _ids(conn, "SELECT ProductID FROM Production.Product")
+
+    order_ids = last_order + 1 + np.arange(n_orders)
+    # Horários fora da meia-noite exercitam o limite do intervalo semiaberto
+    when = (
+        pd.Timestamp(start)
+        + pd.to_timedelta(rng.integers(0, days, n_orders), unit="D")
+        + pd.to_timedelta(rng.choice([0, 0, 9, 23], n_orders), unit="h")
+        + pd.to_timedelta(rng.choice([0, 30], n_orders), unit="min")
+    )
+    seller_ids = pd.array(rng.choice(sellers, n_orders), dtype="Int64")
+    seller_ids[rng.random(n_orders) < 1 / (len(sellers) + 1)] = pd.NA
+
+    _insert(
+        conn,
+        "Sales.SalesOrderHeader",
+        pd.DataFrame(
+            {
+                "SalesOrderID": order_ids,
+                "OrderDate": when,
+                "CustomerID": rng.choice(customers, n_orders),
+                "SalesPersonID": seller_ids,
+                "ShipToAddressID": rng.choice(addresses, n_orders),
+                "ModifiedDate": when,
+            }
+        ),
+    )
+
+    lines = rng.integers(1, 4, n_orders)
+    n_lines = int(lines.sum())
+    _insert(
+        conn,
+        "Sales.SalesOrderDetail",
+        pd.DataFrame(
+            {
+                "SalesOrderDetailID": last_detail + 1 + np.arange(n_lines),
+                "SalesOrderID": np.repeat(order_ids, lines),
+                "ProductID": rng.choice(products, n_lines),
+                "LineTotal": np.round(rng.uniform(5, 500, n_lines), 2),
+            }
+        ),
+    )
+
+def build_daily_fact(conn):
+    # Mesmo SELECT do daily_sales_fact.sql, no dialeto da conexão
+    order_day = day(dialect_of(conn), "soh.OrderDate")
+    conn.execute(f"DROP TABLE IF EXISTS {DAILY_FACT_TABLE}")
+    conn.execute(
+        f"""
+        CREATE TABLE {DAILY_FACT_TABLE} AS
+        SELECT
+            {order_day} AS OrderDate,
+            a.StateProvinceID,
+            sod.ProductID,
+            soh.SalesPersonID,
+            c.StoreID,
+            SUM(sod.LineTotal) AS SalesValue
+        FROM Sales.SalesOrderHeader soh
+        JOIN Sales.SalesOrderDetail sod ON soh.SalesOrderID = sod.SalesOrderID
+        JOIN Person.Address a ON soh.ShipToAddressID = a.AddressID
+        LEFT JOIN Sales.Customer c ON soh.CustomerID = c.CustomerID
+        GROUP BY {order_day}, a.StateProvinceID, sod.ProductID,
+                 soh.SalesPersonID, c.StoreID
+        """
+    )
+    conn.commit()
+
+def build(conn, scale=1.0, seed=7, shape=None, start=ORDERS_START, days=3 * 365):
+    shape = shape or shape_for(scale)
+    create_schema(conn)
+    add_dimensions(conn, shape)
+    add_orders(conn, shape.orders, seed=seed, start=start, days=days)
+    return conn
+
+# =========================
+# Snapshot do SQL Server
+# =========================
+def copy_tables(source, target):
+    """Copia (em lotes) as tabelas do app de `source` para `target`."""
+    create_schema(target)
+    for table, columns in TABLES.items():
+        names = [name for name, _ in columns]
+        dtypes = {name: READ_DTYPES[kind] for name, kind in columns}
+        target.execute(f"DELETE FROM {table}")
+        sql = f"SELECT {', '.join(names)} FROM {table}"
+        for batch in iter_batches(sql, source, dtypes=dtypes):
+            _insert(target, table, batch)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", choices=["build", "export"])
+    parser.add_argument("--backend", choices=["duckdb", "sqlite"], default="duckdb")
+    parser.add_argument("--path", default="hexagon.duckdb")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--daily-fact", action="store_true")
+    args = parser.parse_args()
+
+    target = connect(args.backend, args.path)
+    if args.command == "build":
+        build(target, scale=args.scale, seed=args.seed)
+    else:
+        copy_tables(connect("mssql"), target)
+    if args.daily_fact:
+        build_daily_fact(target)
+    target.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+_LOGGER = logging.getLogger(__name__)
+
+# Tarefas especulativas rodando ao mesmo tempo (no processo inteiro)
+PREFETCH_WORKERS = int(os.environ.get("HEXAGON_PREFETCH_WORKERS", "2"))
+
+# Cliques pré-calculados por render (somando todos os gráficos); 0 desliga
+PREFETCH_CANDIDATES = int(os.environ.get("HEXAGON_PREFETCH_CANDIDATES", "6"))
+
+class Prefetcher:
+    """
+    Pré-cálculo especulativo dos próximos cliques de uma sessão.
+
+    `schedule(key, fn)` enfileira fn() num executor compartilhado e pequeno
+    (o limite de concorrência vale para todas as sessões); `get(key, fn)`
+    devolve o resultado já pronto (hit), espera o que já está rodando ou
+    calcula na hora (miss). Cada resultado pertence a uma geração (ex.: o
+    agregado dos filtros atuais): `reset(generation)` descarta o que foi
+    calculado e cancela o que ainda está na fila quando os filtros mudam.
+    """
+
+    def __init__(self, executor, max_entries=256):
+        self._executor = executor
+        self.max_entries = max_entries
+        self.generation = None
+        self._results = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+        self.scheduled = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.hits = 0
+        self.misses = 0
+
+    def reset(self, generation):
+        """Muda de geração: resultados velhos saem e a fila é cancelada."""
+        with self._lock:
+            if generation == self.generation:
+                return
+            self.generation = generation
+            self._results.clear()
+            for future in self._pending.values():
+                if future.cancel():
+                    self.cancelled += 1
+            self._pending.clear()
+
+    def retain(self, keys):
+        """Cancela o que está na fila e não está em `keys` (candidatos antigos)."""
+        keys = set(keys)
+        with self._lock:
+            for key in [k for k in self._pending if k not in keys]:
+                if self._pending[key].cancel():
+                    self.cancelled += 1
+                    del self._pending[key]
+
+    def _store(self, key, value):
+        self._results[key] = value
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    def schedule(self, key, fn):
+        """Enfileira fn() se `key` ainda não foi calculada nem está na fila."""
+        with self._lock:
+            if key in self._results or key in self._pending:
+                return None
+            generation = self.generation
+            future = self._executor.submit(self._run, generation, key, fn)
+            self._pending[key] = future
+            self.scheduled += 1
+            return future
+
+    def _run(self, generation, key, fn):
+        with self._lock:
+            # Filtros mudaram enquanto a tarefa esperava: nem começa
+            if generation != self.generation:
+                self.cancelled += 1
+                return None
+        try:
+            value = fn()
+        except Exception:
+            with self._lock:
+                # Mesma regra do sucesso: a chave em _pending pode já ser da
+                # nova geração, e a falha de uma geração velha é cancelamento
+                if generation == self.generation:
+                    self.failed += 1
+                    self._pending.pop(key, None)
+                else:
+                    self.cancelled += 1
+            _LOGGER.exception("falha no prefetch de %r", key)
+            return None
+        with self._lock:
+            if generation == self.generation:
+                self._store(key, value)
+                self._pending.pop(key, None)
+                self.completed += 1
+            else:
+                self.cancelled += 1
+        return value
+
+    def get(self, key, fn):
+        """Resultado de `key`: pré-calculado, em andamento ou calculado agora."""
+        with self._lock:
+            if key in self._results:
+                self.hits += 1
+                self._results.move_to_end(key)
+                return self._results[key]
+            future = self._pending.get(key)
+            generation = self.generation
+
+        if future is not None:
+            if future.cancel():
+                # Ainda na fila: calcula aqui mesmo, sem esperar o executor
+                with self._lock:
+                    self.cancelled += 1
+            else:
+                # Já está rodando: esperar sai mais barato que recomeçar
+                value = future.result()
+                if value is not None:
+                    with self._lock:
+                        self.hits += 1
+                    return value
+
+        value = fn()
+        with self._lock:
+            self.misses += 1
+            self._pending.pop(key, None)
+            if generation == self.generation:
+                self._store(key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "scheduled": self.scheduled,
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "failed": self.failed,
+                "pending": len(self._pending),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
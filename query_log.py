@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from tracing import normalize_sql, sql_fingerprint
+
+# Consultas acima disso (ms) entram no log de lentas
+SLOW_QUERY_MS = float(os.environ.get("HEXAGON_SLOW_QUERY_MS", "500"))
+
+# Se definido, cada consulta lenta também é anexada a este JSONL
+SLOW_QUERY_FILE = os.environ.get("HEXAGON_SLOW_QUERY_FILE")
+
+# Consultas lentas guardadas e durações por fingerprint (para o p95)
+SLOW_LOG_ENTRIES = 500
+DURATIONS_PER_FINGERPRINT = 200
+
+def param_cardinalities(params):
+    """
+    Tamanho de cada parâmetro: listas de IDs (JSON ou array) contam os
+    itens, escalares contam 1. Mostra o tamanho das seleções sem gravar
+    os valores.
+    """
+    sizes = []
+    for value in params:
+        if isinstance(value, (list, tuple)):
+            sizes.append(len(value))
+        elif isinstance(value, str) and value.startswith("["):
+            sizes.append(_json_list_size(value))
+        else:
+            sizes.append(1)
+    return sizes
+
+def _json_list_size(value):
+    # Nome de vendedor/loja também pode começar com "[" (ex.: "[Outlet] Centro")
+    try:
+        decoded = json.loads(value)
+    except ValueError:
+        return 1
+    return len(decoded) if isinstance(decoded, list) else 1
+
+class QueryLog:
+    """
+    Estatísticas por fingerprint de todas as consultas e log das lentas.
+    O fingerprint ignora o tamanho das listas IN e o espaçamento, então
+    seleções diferentes da mesma consulta caem no mesmo grupo.
+    """
+
+    def __init__(self, threshold_ms=SLOW_QUERY_MS, max_entries=SLOW_LOG_ENTRIES, path=SLOW_QUERY_FILE):
+        self.threshold_ms = threshold_ms
+        self.path = path
+        self._slow = deque(maxlen=max_entries)
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def observe(self, sql, params, duration_ms, rows):
+        fingerprint = sql_fingerprint(sql)
+        slow = duration_ms >= self.threshold_ms
+
+        with self._lock:
+            stats = self._stats.get(fingerprint)
+            if stats is None:
+                stats = self._stats[fingerprint] = {
+                    "sql": normalize_sql(sql),
+                    "calls": 0,
+                    "slow": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "rows": 0,
+                    "durations": deque(maxlen=DURATIONS_PER_FINGERPRINT),
+                }
+            stats["calls"] += 1
+            stats["slow"] += int(slow)
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+            stats["rows"] += rows
+            stats["durations"].append(duration_ms)
+
+            if not slow:
+                return
+            entry = {
+                "time": time.time(),
+                "fingerprint": fingerprint,
+                "duration_ms": round(duration_ms, 3),
+                "rows": rows,
+                "param_cardinalities": param_cardinalities(params),
+                "sql": stats["sql"],
+            }
+            self._slow.append(entry)
+
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps(entry) + "\n")
+
+    def slow_queries(self):
+        with self._lock:
+            return pd.DataFrame(
+                list(self._slow),
+                columns=["time", "fingerprint", "duration_ms", "rows", "param_cardinalities", "sql"],
+            )
+
+    def top_offenders(self, n=10):
+        """Fingerprints com mais tempo total no banco."""
+        with self._lock:
+            rows = [
+                {
+                    "fingerprint": fingerprint,
+                    "calls": s["calls"],
+                    "slow": s["slow"],
+                    "total_ms": round(s["total_ms"], 3),
+                    "p95_ms": round(float(np.percentile(list(s["durations"]), 95)), 3),
+                    "max_ms": round(s["max_ms"], 3),
+                    "avg_rows": s["rows"] / s["calls"],
+                    "sql": s["sql"],
+                }
+                for fingerprint, s in self._stats.items()
+            ]
+        columns = ["fingerprint", "calls", "slow", "total_ms", "p95_ms", "max_ms", "avg_rows", "sql"]
+        report = pd.DataFrame(rows, columns=columns)
+        return report.sort_values("total_ms", ascending=False).head(n).reset_index(drop=True)
+
+    def reset(self):
+        with self._lock:
+            self._slow.clear()
+            self._stats.clear()
+
+# Log do processo (compartilhado por todas as sessões)
+QUERY_LOG = QueryLog()
@@ -0,0 +1,168 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+import pandas as pd
+
+from cache import AgingClock, value_nbytes
+
+# Quantos frames "superconjunto" manter em memória
+MAX_ENTRIES = 8
+
+SalesFilter = namedtuple("SalesFilter", ["start", "end", "states", "products"])
+
+def make_filter(start_date, end_date, state_ids, product_ids):
+    # states=None / products=None significam "todos" (sem predicado)
+    return SalesFilter(
+        start=pd.Timestamp(start_date).normalize(),
+        end=pd.Timestamp(end_date).normalize(),
+        states=frozenset(state_ids) if state_ids else None,
+        products=None if product_ids is None else frozenset(product_ids),
+    )
+
+def _subset(inner, outer):
+    # None = conjunto completo
+    if outer is None:
+        return True
+    return inner is not None and inner <= outer
+
+def contains(outer: SalesFilter, inner: SalesFilter):
+    """True se todo dado que satisfaz `inner` também satisfaz `outer`."""
+    if outer.start > inner.start or outer.end < inner.end:
+        return False
+    return _subset(inner.states, outer.states) and _subset(inner.products, outer.products)
+
+class SubsumptionCache:
+    """
+    Cache semântico do frame de vendas (grão dia x estado x produto).
+
+    Um pedido mais estreito (menos produtos/estados, janela menor) que um
+    frame já em memória é respondido filtrando esse frame, sem ir ao banco.
+    Como o grão é o mesmo, filtrar linhas basta; o mapa (por estado) é
+    reagregado a partir de um frame com todos os estados.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=None, budget=None, name="semantic"):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.name = name
+        self._entries = OrderedDict()  # (versão, filtro) -> frame
+        self._sizes = {}
+        # Prioridade no MemoryBudget: o relógio no último uso, sem o termo de
+        # custo dos SWRCache. Os frames repetem dados que já estão no cache
+        # de resultados, então são os primeiros a sair quando falta memória
+        self._used_at = {}
+        self._lock = threading.Lock()
+        self._budget = budget
+        self._clock = budget.clock if budget is not None else AgingClock()
+        if budget is not None:
+            budget.register(self)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _find(self, wanted, data_version):
+        with self._lock:
+            for key, frame in self._entries.items():
+                version, flt = key
+                if version == data_version and contains(flt, wanted):
+                    self._entries.move_to_end(key)
+                    self._used_at[key] = self._clock.value
+                    self.hits += 1
+                    return flt, frame
+            self.misses += 1
+            return None, None
+
+    def add(self, start_date, end_date, state_ids, product_ids, data_version, frame):
+        flt = make_filter(start_date, end_date, state_ids, product_ids)
+        with self._lock:
+            # Um frame coberto por outro já guardado não acrescenta nada
+            for version, other in self._entries:
+                if version == data_version and contains(other, flt):
+                    return
+            for key in [k for k in self._entries if k[0] != data_version or contains(flt, k[1])]:
+                self._drop(key)
+
+            nbytes = value_nbytes(frame)
+            if self.max_bytes is not None and nbytes > self.max_bytes:
+                return
+            self._entries[(data_version, flt)] = frame
+            self._sizes[(data_version, flt)] = nbytes
+            self._used_at[(data_version, flt)] = self._clock.value
+            # LRU: os frames menos usados saem até caber
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and sum(self._sizes.values()) > self.max_bytes
+            ):
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        if self._budget is not None:
+            self._budget.enforce()
+
+    def _drop(self, key):
+        del self._entries[key]
+        del self._sizes[key]
+        return self._used_at.pop(key)
+
+    # ---------- membro do MemoryBudget ----------
+    def nbytes(self):
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def victim(self):
+        with self._lock:
+            if not self._entries:
+                return None
+            return min(((self._used_at[k], k) for k in self._entries), key=lambda item: item[0])
+
+    def evict(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._clock.advance(self._drop(key))
+            self.evictions += 1
+            return True
+
+    @staticmethod
+    def _restrict(frame, flt, wanted):
+        mask = None
+        if (flt.start, flt.end) != (wanted.start, wanted.end):
+            mask = frame["OrderDate"].between(wanted.start, wanted.end)
+        if wanted.states is not None and wanted.states != flt.states:
+            states = frame["StateProvinceID"].isin(wanted.states)
+            mask = states if mask is None else mask & states
+        if wanted.products is not None and wanted.products != flt.products:
+            products = frame["ProductID"].isin(wanted.products)
+            mask = products if mask is None else mask & products
+        # Mesmo filtro: visão sem cópia (Copy-on-Write protege o frame guardado)
+        return frame.copy(deep=False) if mask is None else frame[mask]
+
+    def sales(self, start_date, end_date, state_ids, product_ids, data_version):
+        wanted = make_filter(start_date, end_date, state_ids, product_ids)
+        flt, frame = self._find(wanted, data_version)
+        if frame is None:
+            return None
+        return self._restrict(frame, flt, wanted).reset_index(drop=True)
+
+    def sales_by_state(self, start_date, end_date, product_ids, data_version):
+        # O mapa ignora o filtro de estado: precisa de um frame com todos
+        wanted = make_filter(start_date, end_date, (), product_ids)
+        flt, frame = self._find(wanted, data_version)
+        if frame is None:
+            return None
+        return (
+            self._restrict(frame, flt, wanted)
+            .groupby("StateCode", as_index=False, observed=True)["SalesValue"]
+            .sum()
+        )
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(self._sizes.values()),
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
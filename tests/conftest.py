@@ -0,0 +1,43 @@
+import itertools
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import localdb  # noqa: E402
+from backends import connect  # noqa: E402
+
+# Banco pequeno: 4 estados dos EUA (+ 2 fora), 12 produtos, 5 vendedores,
+# 6 lojas e pedidos espalhados por 90 dias a partir de 2022-01-01
+SHAPE = localdb.Shape(
+    orders=400, products=12, us_states=4, sellers=5, stores=6, customers=30, addresses=20
+)
+START = datetime(2022, 1, 1)
+DAYS = 90
+
+_databases = itertools.count()
+
+def build_standin(n_orders=SHAPE.orders, seed=7, backend="sqlite"):
+    # Cada chamada abre um banco novo em memória
+    path = ":memory:" if backend == "sqlite" else f":memory:standin{next(_databases)}"
+    cn = connect(backend, path)
+    return localdb.build(cn, seed=seed, shape=SHAPE._replace(orders=n_orders), start=START, days=DAYS)
+
+def add_orders(cn, n_orders, seed, start=START, days=DAYS):
+    localdb.add_orders(cn, n_orders, seed=seed, start=start, days=days)
+
+@pytest.fixture(scope="session")
+def standin():
+    cn = build_standin()
+    yield cn
+    cn.close()
+
+@pytest.fixture(scope="session")
+def standin_daily():
+    cn = build_standin()
+    localdb.build_daily_fact(cn)
+    yield cn
+    cn.close()
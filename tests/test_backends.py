@@ -0,0 +1,63 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import db
+import localdb
+from backends import DUCKDB, MSSQL, SQLITE, concat, day
+from conftest import build_standin
+from cube import SalesCube
+
+pytest.importorskip("duckdb")
+
+PRODUCTS = list(range(700, 712))
+ARGS = (date(2022, 1, 10), date(2022, 3, 10), (1, 3), PRODUCTS)
+
+@pytest.fixture(scope="module")
+def duck():
+    cn = build_standin(backend="duckdb")
+    localdb.build_daily_fact(cn)
+    yield cn
+    cn.close()
+
+def _same(left, right, keys):
+    pd.testing.assert_frame_equal(
+        left.sort_values(keys).reset_index(drop=True),
+        right.sort_values(keys).reset_index(drop=True),
+        check_dtype=False,
+        check_categorical=False,
+        check_exact=False,
+    )
+
+def test_dialects_render_tsql_constructs():
+    assert day(MSSQL, "soh.OrderDate") == "CAST(soh.OrderDate AS DATE)"
+    assert day(SQLITE, "soh.OrderDate") == "date(soh.OrderDate)"
+    assert concat(MSSQL, "a", "b") == "a + b"
+    assert concat(DUCKDB, "a", "b") == "a || b"
+
+def test_generator_is_deterministic_across_backends(standin, duck):
+    keys = ["OrderDate", "StateProvinceID", "ProductID", "SalesPersonID", "StoreID"]
+    _same(db.load_sales_fact(standin), db.load_sales_fact(duck), keys)
+
+@pytest.mark.parametrize("daily_fact", [False, True])
+def test_duckdb_matches_sqlite(standin_daily, duck, daily_fact):
+    keys = ["OrderDate", "StateProvinceID", "ProductID"]
+    _same(
+        db.load_sales_filtered(standin_daily, *ARGS, daily_fact=daily_fact),
+        db.load_sales_filtered(duck, *ARGS, daily_fact=daily_fact),
+        keys,
+    )
+    _same(
+        db.load_crossfilter_facts(standin_daily, *ARGS, daily_fact=daily_fact),
+        db.load_crossfilter_facts(duck, *ARGS, daily_fact=daily_fact),
+        ["SalesPersonID", "StoreID", "ProductID", "YearMonth"],
+    )
+
+def test_cube_loads_from_duckdb(standin, duck):
+    _same(
+        SalesCube.from_db(duck).sales_filtered(*ARGS),
+        SalesCube.from_db(standin).sales_filtered(*ARGS),
+        ["OrderDate", "StateProvinceID", "ProductID"],
+    )
+    assert db.get_watermark(duck) == db.get_watermark(standin)
@@ -0,0 +1,27 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import data_layer
+
+def test_each_result_waits_only_for_its_own_query():
+    release = threading.Event()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        batch = data_layer.QueryBatch(executor)
+        batch.submit("slow", lambda: release.wait(timeout=5) and "slow")
+        batch.submit("fast", lambda: "fast")
+
+        assert batch.result("fast") == "fast"
+        release.set()
+        assert batch.result("slow") == "slow"
+
+def test_query_errors_surface_in_result():
+    def failing():
+        raise RuntimeError("timeout")
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        batch = data_layer.QueryBatch(executor)
+        batch.submit("map", failing)
+        with pytest.raises(RuntimeError, match="timeout"):
+            batch.result("map")
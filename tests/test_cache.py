@@ -0,0 +1,230 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from cache import MemoryBudget, SingleFlight, SWRCache, share_frames, value_nbytes
+
+def _loader(calls, gate=None):
+    def load(version, stale):
+        calls.append((version, stale))
+        if gate is not None:
+            gate.wait(timeout=5)
+        return f"result@{version}"
+
+    return load
+
+def test_stale_value_is_served_while_the_new_version_loads():
+    cache = SWRCache()
+    calls = []
+    gate = threading.Event()
+
+    assert cache.get("k", _loader(calls), version=1) == "result@1"
+
+    # Versão nova: devolve na hora o valor velho, recalcula em segundo plano
+    value, served = cache.lookup("k", _loader(calls, gate), version=2)
+    assert (value, served) == ("result@1", 1)
+    assert cache.status("k", version=2)["refreshing"]
+
+    # Um recálculo por chave, mesmo com várias leituras no meio
+    assert cache.get("k", _loader(calls, gate), version=2) == "result@1"
+    gate.set()
+    cache.wait(timeout=5)
+
+    assert calls == [(1, None), (2, "result@1")]
+    assert cache.lookup("k", _loader(calls), version=2) == ("result@2", 2)
+    assert cache.stats()["stale_hits"] == 2 and cache.stats()["refreshes"] == 1
+
+def test_ttl_expiry_refreshes_in_background():
+    cache = SWRCache(ttl=0.01)
+    calls = []
+    cache.get("watermark", _loader(calls))
+    time.sleep(0.02)
+
+    assert cache.get("watermark", _loader(calls)) == "result@None"
+    cache.wait(timeout=5)
+    assert len(calls) == 2
+    assert not cache.status("watermark")["stale"]
+
+def test_failed_refresh_keeps_the_last_good_value():
+    cache = SWRCache()
+    cache.get("k", lambda version, stale: "good", version=1)
+
+    def broken(version, stale):
+        raise RuntimeError("banco fora do ar")
+
+    assert cache.get("k", broken, version=2) == "good"
+    cache.wait(timeout=5)
+    assert cache.peek("k") == "good"
+    assert cache.stats()["refresh_errors"] == 1
+
+def test_refresh_hot_only_touches_the_most_used_stale_keys():
+    cache = SWRCache()
+    calls = []
+    for key, hits in (("a", 5), ("b", 1), ("c", 3)):
+        for _ in range(hits):
+            cache.get(key, _loader(calls), version=1)
+
+    cache.refresh_hot(version=2, limit=2)
+    cache.wait(timeout=5)
+
+    assert cache.status("a", 2)["stale"] is False
+    assert cache.status("c", 2)["stale"] is False
+    assert cache.status("b", 2)["stale"] is True
+
+def test_reads_share_memory_but_writes_stay_local():
+    cache = SWRCache(copy=share_frames)
+    frame = pd.DataFrame({"x": [1, 2]})
+    first = cache.get("k", lambda version, stale: (frame, frame))
+    second = cache.get("k", lambda version, stale: None)
+
+    # Sem cópia dos dados: as duas leituras apontam para o mesmo buffer
+    assert np.shares_memory(first[0]["x"].to_numpy(), second[0]["x"].to_numpy())
+    assert not first[0]["x"].to_numpy().flags.writeable
+
+    first[0]["x"] = 0
+    first[0]["y"] = 1
+    again = cache.get("k", lambda version, stale: None)[0]
+    assert again["x"].tolist() == [1, 2] and list(again.columns) == ["x"]
+
+def test_concurrent_misses_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def expensive():
+        calls.append(1)
+        release.wait(timeout=5)
+        return "frame"
+
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("default", expensive)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    # Espera todas as sessões estarem presas na mesma execução
+    while flight.stats()["coalesced"] < 7:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1 and results == ["frame"] * 8
+    assert flight.stats() == {"executions": 1, "coalesced": 7, "in_flight": 0}
+
+def test_waiters_get_the_leader_error_and_the_next_call_retries():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        release.wait(timeout=5)
+        raise RuntimeError("timeout")
+
+    def call():
+        try:
+            flight.do("k", failing)
+        except RuntimeError as exc:
+            errors.append(str(exc))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(timeout=5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while flight.stats()["coalesced"] < 1:
+        time.sleep(0.001)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert errors == ["timeout", "timeout"]
+    assert flight.do("k", lambda: "ok") == "ok"
+
+def test_cold_swr_reads_are_coalesced():
+    cache = SWRCache()
+    calls = []
+    gate = threading.Event()
+    load = _loader(calls, gate)
+
+    threads = [threading.Thread(target=cache.get, args=("k", load, 1)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    while cache.stats()["coalesced"] < 3:
+        time.sleep(0.001)
+    gate.set()
+    for t in threads:
+        t.join()
+
+    assert calls == [(1, None)]
+    assert cache.stats()["misses"] == 4
+
+def _frame(rows):
+    return pd.DataFrame({"x": range(rows)})
+
+def _load_in(seconds, rows):
+    def load(version, stale):
+        time.sleep(seconds)
+        return _frame(rows)
+
+    return load
+
+def test_byte_budget_evicts_cheap_entries_before_expensive_ones():
+    size = value_nbytes(_frame(1000))
+    cache = SWRCache(max_bytes=int(size * 2.5))
+    cache.get("expensive", _load_in(0.05, 1000))
+    cache.get("cheap", _load_in(0, 1000))
+    cache.get("new", _load_in(0, 1000))
+
+    assert cache.peek("expensive") is not None and cache.peek("cheap") is None
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["bytes"] == 2 * size <= stats["max_bytes"]
+
+def test_global_budget_is_shared_between_caches():
+    size = value_nbytes(_frame(1000))
+    budget = MemoryBudget(max_bytes=int(size * 1.5))
+    first, second = SWRCache(budget=budget, name="a"), SWRCache(budget=budget, name="b")
+    first.get("k", _load_in(0, 1000))
+    second.get("k", _load_in(0, 1000))
+
+    assert first.stats()["entries"] + second.stats()["entries"] == 1
+    assert budget.stats() == {"bytes": size, "max_bytes": budget.max_bytes, "evictions": 1}
+
+def test_value_larger_than_the_budget_is_returned_but_not_kept():
+    cache = SWRCache(max_bytes=100)
+    assert len(cache.get("huge", _load_in(0, 1000))) == 1000
+    assert cache.peek("huge") is None and cache.stats()["oversized"] == 1
+    assert [row["key"] for row in cache.entries()] == []
+
+def test_budget_members_share_one_aging_clock():
+    size = value_nbytes(_frame(1000))
+    budget = MemoryBudget(max_bytes=int(size * 2.5))
+    first, second = SWRCache(budget=budget, name="a"), SWRCache(budget=budget, name="b")
+    first.get("old", _load_in(0.02, 1000))
+    second.get("k", _load_in(0, 1000))
+    # Estoura o limite: sai a entrada barata de "b" e o relógio comum sobe
+    first.get("new", _load_in(0.02, 1000))
+
+    assert second.peek("k") is None and budget.clock.value > 0
+    budget.max_bytes = 10 * size
+    second.get("late", _load_in(0, 1000))
+    priority, _ = second.victim()
+    assert priority >= budget.clock.value
+
+def test_semantic_frames_leave_the_budget_before_results():
+    from subsumption_cache import SubsumptionCache
+
+    size = value_nbytes(_frame(1000))
+    budget = MemoryBudget(max_bytes=int(size * 2.5))
+    results = SWRCache(budget=budget, name="results")
+    semantic = SubsumptionCache(budget=budget)
+    results.get("k", _load_in(0, 1000))
+    semantic.add("2022-01-01", "2022-01-31", None, None, "v1", _frame(1000))
+    results.get("k2", _load_in(0, 1000))
+
+    assert semantic.nbytes() == 0 and results.stats()["entries"] == 2
+    assert budget.usage() == {"results": 2 * size, "semantic": 0}
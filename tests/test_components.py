@@ -0,0 +1,77 @@
+from datetime import date
+
+import pandas as pd
+
+import db
+from crossfilter import CrossFilter
+from components.charts_view import bar_frame, line_frame, product_bar_figure
+from components.figures import frame_fingerprint
+from components.filters_view import filter_products, merge_page, page_of
+from components.map_view import map_figure
+from components.tables_view import month_totals, product_totals, state_totals
+
+ARGS = (date(2022, 1, 1), date(2022, 3, 31), (), list(range(700, 712)))
+
+def test_table_aggregations_cover_all_sales(standin):
+    df = db.load_sales_filtered(standin, *ARGS)
+    df["Product"] = df["ProductID"].map(lambda pid: f"Product {pid - 700:02d}").astype("category")
+    total = df["SalesValue"].sum()
+
+    for frame in (state_totals(df), product_totals(df), month_totals(df)):
+        assert abs(frame["SalesValue"].sum() - total) < 1e-6
+    assert month_totals(df)["Month"].tolist() == ["2022-01", "2022-02", "2022-03"]
+
+def _crossfilter(conn, args=ARGS):
+    return CrossFilter(db.load_crossfilter_facts(conn, *args), db.load_dimensions(conn))
+
+def test_chart_clicks_filter_the_other_chart(standin):
+    df = db.load_sales_filtered(standin, *ARGS)
+    xf = _crossfilter(standin)
+
+    february = bar_frame(xf, {"month": (202202,)})
+    expected = df.loc[df["YearMonth"] == 202202, "SalesValue"].sum()
+    assert abs(february["SalesValue"].sum() - expected) < 1e-6
+
+    line = line_frame(xf, "Ano", {"product": (703,)})
+    assert line["Period"].tolist() == ["2022"]
+    assert abs(
+        line["SalesValue"].sum() - df.loc[df["ProductID"] == 703, "SalesValue"].sum()
+    ) < 1e-6
+
+def test_empty_frame_gives_empty_aggregates(standin):
+    df = db.typed_sales_frame(
+        pd.DataFrame(columns=["OrderDate", "State", "Product", "SalesValue"])
+    )
+    assert state_totals(df).empty and month_totals(df).empty
+
+    xf = _crossfilter(standin, ARGS[:3] + ([],))
+    assert bar_frame(xf).empty and line_frame(xf, "Ano").empty
+
+def test_figures_are_reused_while_the_aggregate_is_unchanged():
+    sales = pd.DataFrame({"ProductID": [1, 2], "Product": ["A", "B"], "SalesValue": [2.0, 1.0]})
+
+    first = product_bar_figure(sales)
+    assert product_bar_figure(sales.copy()) is first
+    assert product_bar_figure(sales.assign(SalesValue=[3.0, 1.0])) is not first
+
+def test_map_figure_depends_only_on_the_selection():
+    selection = pd.DataFrame({"StateCode": ["CA", "TX"], "SelectedNum": [1, 0]})
+    assert frame_fingerprint(selection) == frame_fingerprint(selection.copy())
+    assert map_figure(selection) is map_figure(selection.copy())
+    assert list(map_figure(selection.assign(SelectedNum=[0, 1])).data[0].z) == [0, 1]
+
+def test_product_picker_search_category_and_paging(standin):
+    _, _, _, products = db.get_metadata(standin)
+    assert products.loc[products["ProductID"] == 709, "Category"].item() == "Outros"
+
+    bikes = filter_products(products, category="Bikes")
+    assert len(bikes) and (bikes["Category"] == "Bikes").all()
+    assert filter_products(products, search="product 1")["Product"].tolist() == [
+        "Product 10", "Product 11"
+    ]
+
+    page, n_pages = page_of(products, 9, page_size=5)
+    assert n_pages == 3 and page["ProductID"].tolist() == products["ProductID"].tolist()[10:]
+
+def test_page_edits_only_touch_visible_products():
+    assert merge_page({1, 2, 3, 10}, page_ids=[1, 2, 3], checked_ids=[2]) == {2, 10}
@@ -0,0 +1,85 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import db
+from conftest import build_standin
+from crossfilter import CUMULATIVE, EXCLUSIVE, CrossFilter, clear, select
+from cube import SalesCube
+
+PRODUCTS = list(range(700, 712))
+ARGS = (date(2022, 1, 1), date(2022, 3, 31), (1, 2, 3), PRODUCTS)
+
+@pytest.fixture(scope="module")
+def cube(standin):
+    return SalesCube.from_db(standin)
+
+@pytest.fixture(scope="module")
+def xf(cube):
+    return CrossFilter(cube.crossfilter_facts(*ARGS), cube.dimensions())
+
+@pytest.mark.parametrize("backend", ["sqlite", "duckdb"])
+def test_sql_aggregate_matches_the_cube(cube, backend):
+    conn = build_standin(backend=backend)
+    keys = ["SalesPersonID", "StoreID", "ProductID", "YearMonth"]
+    got = db.load_crossfilter_facts(conn, *ARGS).sort_values(keys, ignore_index=True)
+    expected = cube.crossfilter_facts(*ARGS).sort_values(keys, ignore_index=True)
+    pd.testing.assert_frame_equal(got, expected, check_exact=False)
+
+def test_rankings_match_a_pandas_groupby(standin, xf):
+    # Loja clicada -> ranking de vendedores igual ao groupby do agregado lido do banco
+    facts = db.load_crossfilter_facts(standin, *ARGS)
+    for store in xf.totals("store")["StoreID"].iloc[:2]:
+        expected = (
+            facts[facts["StoreID"] == store]
+            .groupby("SalesPersonID")["SalesValue"]
+            .sum()
+            .sort_values(ascending=False, kind="stable")
+            .head(5)
+        )
+        got = xf.totals("seller", {"store": (int(store),)}, top_n=5)
+        assert got["SalesPersonID"].tolist() == expected.index.tolist()
+        assert got["SalesValue"].to_numpy() == pytest.approx(expected.to_numpy())
+
+def test_a_view_is_not_filtered_by_its_own_dimension(xf):
+    store = int(xf.totals("store")["StoreID"].iloc[0])
+    selection = {"store": (store,)}
+    pd.testing.assert_frame_equal(xf.totals("store", selection), xf.totals("store"))
+    assert xf.totals("month", selection)["SalesValue"].sum() < xf.value.sum()
+
+def test_exclusive_and_cumulative_clicks(xf):
+    sellers = xf.totals("seller")["SalesPersonID"].tolist()
+    selection = select({}, "seller", sellers[0], EXCLUSIVE)
+    assert select(selection, "product", 703, EXCLUSIVE) == {"product": (703,)}
+
+    selection = select(selection, "seller", sellers[1], CUMULATIVE)
+    selection = select(selection, "month", 202202, CUMULATIVE)
+    assert selection == {"seller": tuple(sorted(sellers[:2])), "month": (202202,)}
+
+    # Vendedores somam entre si (OU) e combinam com o mês (E)
+    by_product = xf.totals("product", selection)["SalesValue"].sum()
+    one = sum(
+        xf.totals("product", {"seller": (s,), "month": (202202,)})["SalesValue"].sum()
+        for s in sellers[:2]
+    )
+    assert abs(by_product - one) < 1e-6
+
+    # Clicar de novo no mesmo item tira da seleção
+    selection = select(selection, "seller", sellers[0], CUMULATIVE)
+    assert selection["seller"] == (sellers[1],)
+    assert clear(selection, ("month", "year")) == {"seller": (sellers[1],)}
+
+def test_cube_mode_reuses_the_crossfilter_between_reruns(monkeypatch, cube):
+    import data_layer
+
+    monkeypatch.setattr(data_layer, "ENGINE", "cube")
+    monkeypatch.setattr(data_layer, "get_cube_cached", lambda: cube)
+    monkeypatch.setattr(
+        data_layer, "get_state_df_all", lambda: pd.DataFrame({"StateProvinceID": [1, 2, 3, 4]})
+    )
+    monkeypatch.setattr(data_layer, "get_all_product_ids", lambda: PRODUCTS)
+
+    first = data_layer.get_crossfilter(*ARGS)
+    assert data_layer.get_crossfilter(*ARGS) is first
+    assert data_layer.get_crossfilter(ARGS[0], ARGS[1], (1,), PRODUCTS) is not first
@@ -0,0 +1,61 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import db
+from cube import SalesCube
+
+START, END = date(2022, 1, 10), date(2022, 3, 5)
+PRODUCTS = list(range(700, 712))
+
+@pytest.fixture(scope="module")
+def cube(standin):
+    return SalesCube.from_db(standin)
+
+def _sorted(df, by):
+    return df.sort_values(by).reset_index(drop=True)
+
+@pytest.mark.parametrize("product_ids", [None, PRODUCTS[:5], []])
+def test_sales_by_state_matches_sql(standin, cube, product_ids):
+    expected = db.load_sales_by_state(standin, START, END, product_ids)
+    got = cube.sales_by_state(START, END, product_ids)
+
+    pd.testing.assert_frame_equal(
+        _sorted(got, "StateCode"), _sorted(expected, "StateCode"), check_dtype=False
+    )
+
+@pytest.mark.parametrize("state_ids", [(), (1, 3)])
+@pytest.mark.parametrize("product_ids", [None, PRODUCTS[::2]])
+def test_sales_filtered_matches_sql(standin, cube, state_ids, product_ids):
+    expected = db.load_sales_filtered(standin, START, END, state_ids, product_ids)
+    got = cube.sales_filtered(START, END, state_ids, product_ids)
+
+    # O SQL não traz o nome do produto (vem da metadata)
+    keys = ["OrderDate", "StateProvinceID", "ProductID"]
+    assert len(got) > 0
+    pd.testing.assert_frame_equal(
+        _sorted(got[list(expected.columns)], keys),
+        _sorted(expected, keys),
+        check_dtype=False,
+        check_categorical=False,
+    )
+
+def test_cube_mode_sales_frame_is_built_once(monkeypatch, cube):
+    import numpy as np
+
+    import data_layer
+
+    monkeypatch.setattr(data_layer, "ENGINE", "cube")
+    monkeypatch.setattr(data_layer, "get_cube_cached", lambda: cube)
+    monkeypatch.setattr(
+        data_layer, "get_state_df_all", lambda: pd.DataFrame({"StateProvinceID": [1, 2, 3, 4]})
+    )
+    monkeypatch.setattr(data_layer, "get_all_product_ids", lambda: PRODUCTS)
+
+    args = (START, END, (1, 3), PRODUCTS[:4])
+    first, second = data_layer.get_sales_df(*args), data_layer.get_sales_df(*args)
+
+    # Mesmo frame do cache (visões sem cópia), não um novo sales_filtered
+    assert np.shares_memory(first["SalesValue"].to_numpy(), second["SalesValue"].to_numpy())
+    pd.testing.assert_frame_equal(first, cube.sales_filtered(START, END, (1, 3), PRODUCTS[:4]))
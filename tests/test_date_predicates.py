@@ -0,0 +1,132 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import db
+from backends import day, dialect_of
+
+PRODUCTS = list(range(700, 712))
+
+# Janelas estreitas, de um dia e nas bordas do histórico
+WINDOWS = [
+    (date(2022, 1, 1), date(2022, 3, 31)),
+    (date(2022, 1, 15), date(2022, 1, 15)),
+    (date(2022, 2, 1), date(2022, 2, 28)),
+    (date(2021, 12, 1), date(2022, 1, 1)),
+    (date(2022, 3, 31), date(2022, 4, 30)),
+]
+
+def _placeholders(values):
+    return ", ".join(["?"] * len(values))
+
+def _legacy_sales_filtered(cn, start_date, end_date, state_ids, product_ids):
+    # Forma original: CAST(OrderDate AS DATE) BETWEEN ? AND ?
+    state_sql = ""
+    params = [start_date, end_date, *product_ids]
+    if state_ids:
+        state_sql = f"AND a.StateProvinceID IN ({_placeholders(state_ids)})"
+        params += list(state_ids)
+
+    order_day = day(dialect_of(cn), "soh.OrderDate")
+    sql = f"""
+    SELECT
+        {order_day} AS OrderDate,
+        sp.StateProvinceID,
+        sp.StateProvinceCode AS StateCode,
+        sp.Name AS State,
+        sod.ProductID,
+        SUM(sod.LineTotal) AS SalesValue
+    FROM Sales.SalesOrderHeader soh
+    JOIN Sales.SalesOrderDetail sod ON soh.SalesOrderID = sod.SalesOrderID
+    JOIN Person.Address a ON soh.ShipToAddressID = a.AddressID
+    JOIN Person.StateProvince sp ON a.StateProvinceID = sp.StateProvinceID
+    WHERE
+        sp.CountryRegionCode = 'US'
+        AND {order_day} BETWEEN ? AND ?
+        AND sod.ProductID IN ({_placeholders(product_ids)})
+        {state_sql}
+    GROUP BY
+        {order_day},
+        sp.StateProvinceID,
+        sp.StateProvinceCode,
+        sp.Name,
+        sod.ProductID;
+    """
+    df = db.read_frame(sql, cn, params=params)
+    df["OrderDate"] = pd.to_datetime(df["OrderDate"])
+    return df
+
+def _sorted(df, keys):
+    return df.sort_values(keys).reset_index(drop=True)
+
+def _assert_same(left, right, keys):
+    left = _sorted(left, keys)
+    right = _sorted(right, keys)
+    pd.testing.assert_frame_equal(
+        left[keys], right[keys], check_dtype=False, check_categorical=False
+    )
+    assert left["SalesValue"].astype(float).to_numpy() == pytest.approx(
+        right["SalesValue"].astype(float).to_numpy()
+    )
+
+def test_date_range_is_half_open():
+    start, end = db._date_range(date(2022, 1, 15), date(2022, 1, 15))
+    assert (start, end) == (date(2022, 1, 15), date(2022, 1, 16))
+
+@pytest.mark.parametrize("window", WINDOWS)
+@pytest.mark.parametrize("state_ids", [(), (1, 3)])
+def test_half_open_range_matches_legacy_between(standin, window, state_ids):
+    start_date, end_date = window
+    products = PRODUCTS[::2]
+
+    expected = _legacy_sales_filtered(standin, start_date, end_date, state_ids, products)
+    got = db.load_sales_filtered(standin, start_date, end_date, state_ids, products)
+
+    _assert_same(got, expected, ["OrderDate", "StateProvinceID", "ProductID"])
+
+@pytest.mark.parametrize("window", WINDOWS)
+def test_sales_by_state_matches_filtered_total(standin, window):
+    start_date, end_date = window
+    by_state = db.load_sales_by_state(standin, start_date, end_date, PRODUCTS)
+    filtered = db.load_sales_filtered(standin, start_date, end_date, (), PRODUCTS)
+
+    expected = filtered.groupby("StateCode", as_index=False)["SalesValue"].sum()
+    _assert_same(by_state, expected, ["StateCode"])
+
+def test_daily_fact_probe(standin, standin_daily):
+    assert not db.has_daily_fact(standin)
+    assert db.has_daily_fact(standin_daily)
+
+@pytest.mark.parametrize("window", WINDOWS)
+def test_daily_fact_matches_oltp(standin_daily, window):
+    start_date, end_date = window
+    states = (1, 2, 4)
+
+    oltp = db.load_sales_filtered(standin_daily, start_date, end_date, states, PRODUCTS)
+    daily = db.load_sales_filtered(
+        standin_daily, start_date, end_date, states, PRODUCTS, daily_fact=True
+    )
+    _assert_same(daily, oltp, ["OrderDate", "StateProvinceID", "ProductID"])
+
+    oltp = db.load_sales_by_state(standin_daily, start_date, end_date, PRODUCTS)
+    daily = db.load_sales_by_state(
+        standin_daily, start_date, end_date, PRODUCTS, daily_fact=True
+    )
+    _assert_same(daily, oltp, ["StateCode"])
+
+def test_daily_fact_crossfilter_matches_oltp(standin_daily):
+    args = (standin_daily, date(2022, 1, 1), date(2022, 2, 15), (), PRODUCTS)
+
+    oltp = db.load_crossfilter_facts(*args)
+    daily = db.load_crossfilter_facts(*args, daily_fact=True)
+
+    _assert_same(daily, oltp, ["SalesPersonID", "StoreID", "ProductID", "YearMonth"])
+
+def test_daily_fact_matches_oltp_cube_grain(standin_daily):
+    keys = ["OrderDate", "StateProvinceID", "ProductID", "SalesPersonID", "StoreID"]
+    oltp = db.load_sales_fact(standin_daily).fillna({"SalesPersonID": -1, "StoreID": -1})
+    daily = db.load_sales_fact(standin_daily, daily_fact=True).fillna(
+        {"SalesPersonID": -1, "StoreID": -1}
+    )
+    _assert_same(daily, oltp, keys)
@@ -0,0 +1,150 @@
+import os
+import threading
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from cube import SalesCube
+from disk_cache import DiskCache, fingerprint
+
+pytest.importorskip("pyarrow")
+
+ARGS = (date(2022, 1, 1), date(2022, 3, 31), (), list(range(700, 712)))
+
+def _frame(n):
+    return pd.DataFrame({"StateCode": [f"S{i}" for i in range(n)], "SalesValue": range(n)})
+
+def test_roundtrip_with_meta(tmp_path):
+    cache = DiskCache(tmp_path, budget_bytes=10**7)
+    key = fingerprint("sales", date(2022, 1, 1), (1, 2), ("v", 1))
+
+    assert cache.get(key) is None
+    cache.put(key, [_frame(3), _frame(5)], {"version": 1})
+
+    frames, meta = cache.get(key)
+    assert [len(f) for f in frames] == [3, 5]
+    assert meta == {"version": 1}
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_fingerprint_depends_on_data_version():
+    assert fingerprint("sales", (1, 2), "v1") == fingerprint("sales", (1, 2), "v1")
+    assert fingerprint("sales", (1, 2), "v1") != fingerprint("sales", (1, 2), "v2")
+
+def test_evicts_least_recently_used(tmp_path):
+    probe = DiskCache(tmp_path / "probe", budget_bytes=10**7)
+    probe.put("probe", [_frame(50)])
+    entry_size = probe.stats()["bytes"]
+
+    cache = DiskCache(tmp_path / "lru", budget_bytes=int(entry_size * 2.5))
+    for i, key in enumerate(["a", "b"]):
+        cache.put(key, [_frame(50)])
+        os.utime(next((tmp_path / "lru").glob(f"{key}.*")), (i, i))
+
+    cache.get("a")  # "a" passa a ser o mais recente
+    cache.put("c", [_frame(50)])
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+def test_preload_serves_from_memory(tmp_path):
+    DiskCache(tmp_path, budget_bytes=10**7).put("k", [_frame(4)])
+
+    restarted = DiskCache(tmp_path, budget_bytes=10**7)
+    restarted.preload()
+    for path in tmp_path.glob("k.*"):
+        path.unlink()
+
+    frames, _ = restarted.get("k")
+    assert len(frames[0]) == 4
+
+def test_reader_never_sees_a_partial_entry(tmp_path):
+    cache = DiskCache(tmp_path, budget_bytes=10**8)
+    cache.put("k", [_frame(3)] * 3)
+    stop = threading.Event()
+
+    def writer():
+        while not stop.is_set():
+            cache.put("k", [_frame(3)] * 3)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        sizes = {len(cache.get("k")[0]) for _ in range(50)}
+    finally:
+        stop.set()
+        thread.join()
+    assert sizes == {3}
+
+def test_leftover_temporaries_are_removed(tmp_path):
+    cache = DiskCache(tmp_path, budget_bytes=10**7)
+    old = [tmp_path / "k.0.tmp123", tmp_path / "k.jsontmp"]
+    for path in old:
+        path.write_bytes(b"x")
+        os.utime(path, (0, 0))
+    recent = tmp_path / "j.0.tmp456"
+    recent.write_bytes(b"x")
+
+    cache.put("other", [_frame(2)])
+
+    assert not any(path.exists() for path in old)
+    # Pode ser um put em andamento em outro processo
+    assert recent.exists()
+
+def test_cube_snapshot_roundtrip(tmp_path, standin):
+    cube = SalesCube.from_db(standin)
+    cache = DiskCache(tmp_path, budget_bytes=10**8)
+    frames, meta = cube.to_frames()
+    cache.put("cube-snapshot", frames, meta)
+
+    restored = SalesCube.from_frames(*cache.get("cube-snapshot"))
+
+    assert restored.watermark == cube.watermark
+    assert restored.dims_version == cube.dims_version
+    pd.testing.assert_frame_equal(restored.sales_filtered(*ARGS), cube.sales_filtered(*ARGS))
+
+class _Pool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def run(self, fn, *args, **kwargs):
+        return fn(self.conn, *args, **kwargs)
+
+def test_snapshot_is_rewritten_only_for_a_new_cube(monkeypatch, standin):
+    import data_layer
+    import db
+
+    saved, snapshot = [], [None]
+    monkeypatch.setattr(data_layer, "_cube_store", lambda: {"saved_at": None})
+    monkeypatch.setattr(data_layer, "_restore_cube_snapshot", lambda: snapshot[-1])
+    monkeypatch.setattr(data_layer, "_save_cube_snapshot", saved.append)
+    monkeypatch.setattr(data_layer, "get_pool", lambda: _Pool(standin))
+    monkeypatch.setattr(data_layer, "has_daily_fact_cached", lambda: False)
+    monkeypatch.setattr(data_layer, "get_watermark_cached", lambda: db.get_watermark(standin))
+    monkeypatch.setattr(
+        data_layer, "get_dimension_version_cached", lambda: db.get_dimension_version(standin)
+    )
+
+    # Cold start: cubo lido do banco vai para o disco
+    cube = data_layer._load_cube(None, None)
+    assert saved == [cube]
+
+    # Warm start com a marca d'água parada: nada a regravar
+    snapshot.append(cube)
+    assert data_layer._load_cube(None, None) is cube
+    assert saved == [cube]
+
+def test_preloaded_frames_count_against_the_memory_budget(tmp_path):
+    from cache import MemoryBudget
+
+    DiskCache(tmp_path, budget_bytes=10**7).put("k", [_frame(400)])
+    budget = MemoryBudget(max_bytes=10**9)
+    restarted = DiskCache(tmp_path, budget_bytes=10**7, memory_budget=budget)
+    restarted.preload()
+    assert budget.used() == restarted.nbytes() > 0
+
+    # Fora da memória, mas o arquivo continua servindo
+    budget.max_bytes = 0
+    budget.enforce()
+    assert restarted.nbytes() == 0 and len(restarted.get("k")[0][0]) == 400
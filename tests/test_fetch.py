@@ -0,0 +1,45 @@
+from datetime import date
+
+import pandas as pd
+
+import db
+from cube import SalesCube
+
+ARGS = (date(2022, 1, 1), date(2022, 12, 31), (), list(range(700, 712)))
+
+def test_batches_are_typed_and_bounded(standin):
+    sql, params = db._sales_fact_query(standin, False, None, None)
+    batches = list(db.iter_batches(sql, standin, params, db.FACT_DTYPES, batch_rows=64))
+
+    assert len(batches) > 1
+    assert all(len(b) <= 64 for b in batches)
+    first = batches[0]
+    assert first["SalesValue"].dtype == "float64"
+    assert first["ProductID"].dtype == "int64"
+    assert pd.api.types.is_datetime64_any_dtype(first["OrderDate"])
+
+def test_read_frame_does_not_depend_on_batch_size(standin):
+    sql, params = db._sales_fact_query(standin, False, None, None)
+    whole = db.read_frame(sql, standin, params, db.FACT_DTYPES)
+    small = db.read_frame(sql, standin, params, db.FACT_DTYPES, batch_rows=7)
+    pd.testing.assert_frame_equal(whole, small)
+
+def test_empty_result_keeps_columns(standin):
+    df = db.read_frame(
+        "SELECT ProductID, Name FROM Production.Product WHERE 1 = 0", standin
+    )
+    assert df.empty
+    assert list(df.columns) == ["ProductID", "Name"]
+
+def test_cube_from_stream_matches_cube_from_frame(standin):
+    dims = db.load_dimensions(standin)
+    sql, params = db._sales_fact_query(standin, False, None, None)
+    streamed = SalesCube(
+        db.iter_batches(sql, standin, params, db.FACT_DTYPES, batch_rows=50), dims
+    )
+    whole = SalesCube(db.load_sales_fact(standin), dims)
+
+    assert len(streamed) == len(whole)
+    pd.testing.assert_frame_equal(
+        streamed.sales_filtered(*ARGS), whole.sales_filtered(*ARGS)
+    )
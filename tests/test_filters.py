@@ -0,0 +1,62 @@
+import pickle
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import db
+import tracing
+from disk_cache import fingerprint
+from filters import ALL, NONE, Selection, canonical_filters
+from subsumption_cache import SubsumptionCache
+
+PRODUCTS = list(range(700, 712))
+RANGE = (date(2022, 1, 1), date(2022, 3, 31))
+
+def test_same_set_in_any_order_is_the_same_selection():
+    a = Selection.of([703, 701, 701, 702])
+    b = Selection.of((702, 703, 701))
+    assert a == b and hash(a) == hash(b)
+    assert a.ids == (701, 702, 703)
+    assert fingerprint("sales", a) == fingerprint("sales", b)
+    assert pickle.loads(pickle.dumps(a)) == a
+
+def test_sentinels_and_compact_token():
+    assert Selection.of(PRODUCTS, universe=PRODUCTS) is ALL
+    assert Selection.of([], universe=PRODUCTS) is NONE
+    assert Selection.of([], empty_means_all=True) is ALL
+    assert ALL.predicate is None and NONE.predicate == ()
+
+    many = Selection.of(range(1000))
+    assert len(repr(many)) < 40 and repr(many).startswith("Selection(1000:")
+
+    flt = canonical_filters(
+        {"start_date": RANGE[0], "end_date": RANGE[1], "states": [], "products": PRODUCTS[::-1]},
+        state_universe=[1, 2, 3],
+        product_universe=PRODUCTS,
+    )
+    assert flt.states is ALL and flt.products is ALL
+
+def test_all_products_drops_the_in_predicate(standin):
+    trace = tracing.start_trace()
+    everything = db.load_sales_filtered(standin, *RANGE, None, None)
+    listed = db.load_sales_filtered(standin, *RANGE, (), PRODUCTS)
+    tracing.finish_trace(trace)
+
+    fast, slow = trace.spans
+    assert fast.attributes["params"] == 2 and slow.attributes["params"] == 3
+    pd.testing.assert_frame_equal(everything, listed, check_categorical=False)
+
+    facts = db.load_crossfilter_facts(standin, *RANGE, None, None)
+    assert facts["SalesValue"].sum() == pytest.approx(
+        db.load_crossfilter_facts(standin, *RANGE, (), PRODUCTS)["SalesValue"].sum()
+    )
+
+def test_semantic_cache_serves_subsets_of_all(standin):
+    frame = db.load_sales_filtered(standin, *RANGE, None, None)
+    semantic = SubsumptionCache()
+    semantic.add(*RANGE, None, None, "v1", frame)
+
+    few = semantic.sales(*RANGE, (1,), PRODUCTS[:3], "v1")
+    assert few is not None and set(few["ProductID"]) <= set(PRODUCTS[:3])
+    assert semantic.sales(*RANGE, None, None, "v1") is not None
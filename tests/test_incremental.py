@@ -0,0 +1,92 @@
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+
+import db
+import localdb
+from conftest import add_orders, build_standin
+from cube import SalesCube
+
+ARGS = (date(2022, 1, 1), date(2022, 6, 30), (), list(range(700, 712)))
+
+def _assert_same_cube(left, right):
+    pd.testing.assert_frame_equal(
+        left.sales_filtered(*ARGS), right.sales_filtered(*ARGS), check_exact=False
+    )
+    keys = ["SalesPersonID", "StoreID", "ProductID", "YearMonth"]
+    pd.testing.assert_frame_equal(
+        left.crossfilter_facts(*ARGS).sort_values(keys, ignore_index=True),
+        right.crossfilter_facts(*ARGS).sort_values(keys, ignore_index=True),
+        check_exact=False,
+    )
+
+@pytest.fixture
+def fresh():
+    cn = build_standin(n_orders=200)
+    yield cn
+    cn.close()
+
+def test_unchanged_watermark_keeps_cube(fresh):
+    cube = SalesCube.from_db(fresh)
+    same = cube.refreshed(fresh, db.get_watermark(fresh), db.get_dimension_version(fresh))
+    assert same is cube
+
+def test_new_orders_are_merged_as_delta(fresh):
+    cube = SalesCube.from_db(fresh)
+    add_orders(fresh, 50, 1, start=datetime(2022, 4, 1), days=60)
+
+    watermark = db.get_watermark(fresh)
+    refreshed = cube.refreshed(fresh, watermark, db.get_dimension_version(fresh))
+
+    assert refreshed is not cube
+    assert refreshed.watermark == watermark
+    assert len(cube) < len(refreshed) < len(cube) + 200  # só o delta entrou
+    _assert_same_cube(refreshed, SalesCube.from_db(fresh))
+
+def test_stale_watermark_does_not_move_cube_backwards(fresh):
+    old_watermark = db.get_watermark(fresh)
+    add_orders(fresh, 10, 2)
+    cube = SalesCube.from_db(fresh)
+
+    assert cube.refreshed(fresh, old_watermark, db.get_dimension_version(fresh)) is cube
+
+def test_changed_old_orders_trigger_full_reload(fresh):
+    cube = SalesCube.from_db(fresh)
+    fresh.execute(
+        "UPDATE Sales.SalesOrderDetail SET LineTotal = LineTotal * 2 WHERE SalesOrderID = 5"
+    )
+    fresh.execute(
+        "UPDATE Sales.SalesOrderHeader SET ModifiedDate = '2023-01-01 00:00:00'"
+        " WHERE SalesOrderID = 5"
+    )
+
+    watermark = db.get_watermark(fresh)
+    assert db.count_changed_orders(fresh, cube.watermark) == 1
+    refreshed = cube.refreshed(fresh, watermark, db.get_dimension_version(fresh))
+    _assert_same_cube(refreshed, SalesCube.from_db(fresh))
+
+def test_dimension_version_changes_only_with_dimensions(fresh):
+    before = db.get_dimension_version(fresh)
+    add_orders(fresh, 5, 3)
+    assert db.get_dimension_version(fresh) == before
+
+    fresh.execute(
+        "INSERT INTO Production.Product (ProductID, Name, ModifiedDate)"
+        " VALUES (799, 'New product', '2023-01-01 00:00:00')"
+    )
+    assert db.get_dimension_version(fresh) != before
+
+def test_daily_fact_cube_reloads_only_when_the_fact_table_changes(fresh):
+    localdb.build_daily_fact(fresh)
+    cube = SalesCube.from_db(fresh, daily_fact=True)
+
+    # Pedido novo no OLTP: o fato diário ainda não foi reconstruído
+    add_orders(fresh, 20, 4, start=datetime(2022, 4, 1), days=30)
+    watermark, dims_version = db.get_watermark(fresh), db.get_dimension_version(fresh)
+    assert cube.refreshed(fresh, watermark, dims_version) is cube
+
+    localdb.build_daily_fact(fresh)
+    refreshed = cube.refreshed(fresh, watermark, dims_version)
+    assert refreshed is not cube and refreshed.fact_version != cube.fact_version
+    assert len(refreshed) > len(cube)
@@ -0,0 +1,83 @@
+import sqlite3
+import threading
+
+import pytest
+
+import db
+
+def _connect():
+    return sqlite3.connect(":memory:", check_same_thread=False)
+
+def test_threads_get_distinct_connections():
+    pool = db.ConnectionPool(_connect, max_size=4)
+    barrier = threading.Barrier(3)
+    seen = []
+
+    def worker():
+        with pool.connection() as cn:
+            seen.append(id(cn))
+            barrier.wait(timeout=5)
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(set(seen)) == 3
+    assert pool.stats()["open"] == 3
+
+def test_checkout_is_reentrant_per_thread():
+    pool = db.ConnectionPool(_connect, max_size=1, timeout=0.2)
+    with pool.connection() as outer:
+        with pool.connection() as inner:
+            assert inner is outer
+    assert pool.stats()["checkouts"] == 1
+
+def test_waits_and_times_out_when_exhausted():
+    pool = db.ConnectionPool(_connect, max_size=1, timeout=0.1)
+    held = threading.Event()
+    release = threading.Event()
+
+    def holder():
+        with pool.connection():
+            held.set()
+            release.wait(timeout=5)
+
+    t = threading.Thread(target=holder)
+    t.start()
+    held.wait(timeout=5)
+    with pytest.raises(db.PoolTimeout):
+        with pool.connection():
+            pass
+    release.set()
+    t.join()
+
+    assert pool.stats()["timeouts"] == 1
+
+def test_run_reconnects_after_dropped_connection():
+    pool = db.ConnectionPool(_connect, max_size=2)
+    calls = []
+
+    def query(cn):
+        calls.append(cn)
+        if len(calls) == 1:
+            cn.close()  # simula queda da conexão no meio da consulta
+        return cn.execute("SELECT 42").fetchone()[0]
+
+    assert pool.run(query) == 42
+    assert calls[0] is not calls[1]
+    assert pool.stats()["reconnects"] == 1
+
+def test_sql_errors_are_not_retried():
+    pool = db.ConnectionPool(_connect, max_size=1)
+    calls = []
+
+    def bad_query(cn):
+        calls.append(cn)
+        cn.execute("SELECT * FROM missing_table")
+
+    with pytest.raises(sqlite3.OperationalError):
+        pool.run(bad_query)
+    assert len(calls) == 1
+    assert pool.stats()["open"] == 1
@@ -0,0 +1,132 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from components.crossfilter_view import click_candidates, compute_views
+from crossfilter import CrossFilter
+from cube import SalesCube
+from prefetch import Prefetcher
+
+def _fail(*args):
+    raise AssertionError("não devia recalcular")
+
+def test_prefetched_result_is_a_hit():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        prefetcher = Prefetcher(executor)
+        prefetcher.reset(1)
+        prefetcher.schedule("click", lambda: "views").result(timeout=5)
+
+        assert prefetcher.get("click", _fail) == "views"
+        assert prefetcher.get("other", lambda: "computed") == "computed"
+        stats = prefetcher.stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+def test_new_generation_cancels_queued_work_and_drops_results():
+    release = threading.Event()
+    calls = []
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        prefetcher = Prefetcher(executor)
+        prefetcher.reset(1)
+        running = prefetcher.schedule("a", lambda: release.wait(timeout=5) and "a")
+        queued = prefetcher.schedule("b", lambda: calls.append("b"))
+
+        # Filtros mudaram: "b" nem começa e "a" não é guardado
+        prefetcher.reset(2)
+        release.set()
+        running.result(timeout=5)
+
+        assert queued.cancelled() and calls == []
+        assert prefetcher.get("a", lambda: "recalculado") == "recalculado"
+        assert prefetcher.stats()["cancelled"] == 2
+
+def test_workers_cap_concurrency_and_duplicates_are_skipped():
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        threading.Event().wait(0.01)
+        with lock:
+            active[0] -= 1
+        return True
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        prefetcher = Prefetcher(executor)
+        prefetcher.reset(1)
+        futures = [prefetcher.schedule(key, work) for key in range(8)]
+        assert prefetcher.schedule(0, work) is None
+        for future in futures:
+            future.result(timeout=5)
+
+    assert peak[0] <= 2 and prefetcher.stats()["completed"] == 8
+
+def test_retain_drops_queued_candidates_of_the_previous_click():
+    release = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        prefetcher = Prefetcher(executor)
+        prefetcher.reset(1)
+        prefetcher.schedule("busy", lambda: release.wait(timeout=5))
+        old = prefetcher.schedule("old", lambda: "old")
+        kept = prefetcher.schedule("kept", lambda: "kept")
+
+        prefetcher.retain(["kept"])
+        release.set()
+
+        assert old.cancelled() and kept.result(timeout=5) == "kept"
+        assert prefetcher.stats()["pending"] == 0
+
+def test_queued_task_computed_inline_counts_as_cancelled():
+    release = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        prefetcher = Prefetcher(executor)
+        prefetcher.reset(1)
+        prefetcher.schedule("busy", lambda: release.wait(timeout=5))
+        queued = prefetcher.schedule("click", _fail)
+
+        assert prefetcher.get("click", lambda: "inline") == "inline"
+        release.set()
+
+        assert queued.cancelled()
+        stats = prefetcher.stats()
+        assert (stats["cancelled"], stats["misses"]) == (1, 1)
+
+def test_failure_of_an_old_generation_keeps_the_new_pending_task():
+    started, release, busy = threading.Event(), threading.Event(), threading.Event()
+
+    def broken():
+        started.set()
+        release.wait(timeout=5)
+        raise RuntimeError("banco caiu")
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        prefetcher = Prefetcher(executor)
+        prefetcher.reset(1)
+        old = prefetcher.schedule("click", broken)
+        started.wait(timeout=5)
+
+        # Filtros mudaram com a tarefa rodando; a nova geração agenda a mesma chave
+        prefetcher.reset(2)
+        new = prefetcher.schedule("click", lambda: busy.wait(timeout=5) and "novo")
+        release.set()
+        assert old.result(timeout=5) is None
+
+        stats = prefetcher.stats()
+        assert (stats["failed"], stats["cancelled"], stats["pending"]) == (0, 1, 1)
+        busy.set()
+        assert new.result(timeout=5) == "novo"
+        assert prefetcher.get("click", _fail) == "novo"
+
+def test_candidates_are_capped_in_total_and_alternate_between_charts(standin):
+    cube = SalesCube.from_db(standin)
+    args = (date(2022, 1, 1), date(2022, 3, 31), (), list(range(700, 712)))
+    xf = CrossFilter(cube.crossfilter_facts(*args), cube.dimensions())
+    views = compute_views(xf, {}, "Mês")
+
+    assert "figures" not in views
+    candidates = click_candidates(views, limit=6)
+    assert len(candidates) == 6
+    assert [dim for dim, _ in candidates[:4]] == ["seller", "store", "product", "month"]
+    assert candidates[4] == ("seller", int(views["seller"]["SalesPersonID"].iloc[1]))
+    assert click_candidates(views, limit=0) == []
@@ -0,0 +1,37 @@
+from datetime import date
+
+import db
+from query_log import QUERY_LOG, QueryLog, param_cardinalities
+
+PRODUCTS = list(range(700, 712))
+
+def test_sql_text_does_not_depend_on_selection_size(standin):
+    # Mesmo SQL (e mesmo plano em cache) para 1 ou 12 produtos
+    QUERY_LOG.reset()
+    for products in (PRODUCTS[:1], PRODUCTS[:5], PRODUCTS):
+        db.load_sales_filtered(standin, date(2022, 1, 1), date(2022, 2, 1), (), products)
+
+    top = QUERY_LOG.top_offenders()
+    assert len(top) == 1 and top.loc[0, "calls"] == 3
+
+def test_slow_log_keeps_normalized_sql_and_cardinalities(tmp_path):
+    log = QueryLog(threshold_ms=100, path=tmp_path / "slow.jsonl")
+    sql = "SELECT * FROM t WHERE a IN (SELECT value FROM json_each(?)) AND d >= ?"
+    log.observe(sql, ["[1, 2, 3]", "2022-01-01"], 5.0, 10)
+    log.observe(sql, ["[1, 2, 3, 4]", "2022-01-01"], 250.0, 40)
+
+    slow = log.slow_queries()
+    assert len(slow) == 1
+    assert slow.loc[0, "param_cardinalities"] == [4, 1]
+    assert "  " not in slow.loc[0, "sql"]
+    assert len((tmp_path / "slow.jsonl").read_text().splitlines()) == 1
+
+    top = log.top_offenders()
+    assert top.loc[0, "calls"] == 2 and top.loc[0, "slow"] == 1
+    assert top.loc[0, "max_ms"] == 250.0
+
+def test_param_cardinalities():
+    assert param_cardinalities([[1, 2], "[3]", 7, "abc"]) == [2, 1, 1, 1]
+
+def test_names_that_look_like_json_count_as_one():
+    assert param_cardinalities(["[Outlet] Centro", "[1, 2]", "[7]x", ("a", "b")]) == [1, 2, 1, 2]
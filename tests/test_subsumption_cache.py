@@ -0,0 +1,84 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import db
+from cache import value_nbytes
+from subsumption_cache import SubsumptionCache
+
+ALL_PRODUCTS = tuple(range(700, 712))
+START, END = date(2022, 1, 1), date(2022, 3, 31)
+VERSION = ("v1",)
+
+@pytest.fixture
+def cache(standin):
+    cache = SubsumptionCache()
+    frame = db.load_sales_filtered(standin, START, END, (), ALL_PRODUCTS)
+    cache.add(START, END, (), ALL_PRODUCTS, VERSION, frame)
+    return cache
+
+def _same(got, expected, keys):
+    got = got.sort_values(keys).reset_index(drop=True)
+    expected = expected.sort_values(keys).reset_index(drop=True)
+    pd.testing.assert_frame_equal(
+        got[keys], expected[keys], check_dtype=False, check_categorical=False
+    )
+    assert got["SalesValue"].to_numpy() == pytest.approx(expected["SalesValue"].to_numpy())
+
+@pytest.mark.parametrize(
+    "window, states, products",
+    [
+        ((START, END), (), ALL_PRODUCTS),
+        ((date(2022, 2, 1), date(2022, 2, 15)), (), ALL_PRODUCTS),
+        ((START, END), (1, 4), ALL_PRODUCTS),
+        ((date(2022, 1, 10), date(2022, 1, 10)), (2,), (700, 705)),
+        ((START, END), (), ()),
+    ],
+)
+def test_narrower_filters_are_answered_locally(standin, cache, window, states, products):
+    got = cache.sales(*window, states, products, VERSION)
+    expected = db.load_sales_filtered(standin, *window, states, products)
+
+    assert got is not None
+    _same(got, expected, ["OrderDate", "StateProvinceID", "ProductID"])
+
+def test_map_is_reaggregated_from_superset(standin, cache):
+    got = cache.sales_by_state(date(2022, 2, 1), END, (701, 702, 703), VERSION)
+    expected = db.load_sales_by_state(standin, date(2022, 2, 1), END, (701, 702, 703))
+    _same(got, expected, ["StateCode"])
+
+@pytest.mark.parametrize(
+    "window, states, version",
+    [
+        ((date(2021, 12, 1), END), (), VERSION),  # janela maior
+        ((START, END), (), ("v2",)),  # dados mudaram
+    ],
+)
+def test_wider_or_stale_requests_miss(cache, window, states, version):
+    assert cache.sales(*window, states, ALL_PRODUCTS, version) is None
+
+def test_state_subset_cannot_answer_all_states(standin):
+    cache = SubsumptionCache()
+    frame = db.load_sales_filtered(standin, START, END, (1,), ALL_PRODUCTS)
+    cache.add(START, END, (1,), ALL_PRODUCTS, VERSION, frame)
+
+    assert cache.sales(START, END, (), ALL_PRODUCTS, VERSION) is None
+    assert cache.sales_by_state(START, END, ALL_PRODUCTS, VERSION) is None
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 0, 2, 0.0)
+
+def test_byte_limit_evicts_least_recently_used_frames(standin):
+    frames = {
+        state: db.load_sales_filtered(standin, START, END, (state,), ALL_PRODUCTS)
+        for state in (1, 2, 3)
+    }
+    limit = sum(value_nbytes(frames[s]) for s in (2, 3))
+    cache = SubsumptionCache(max_bytes=limit)
+    for state, frame in frames.items():
+        cache.add(START, END, (state,), ALL_PRODUCTS, VERSION, frame)
+
+    assert cache.sales(START, END, (1,), ALL_PRODUCTS, VERSION) is None
+    assert cache.sales(START, END, (3,), ALL_PRODUCTS, VERSION) is not None
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["bytes"] == limit
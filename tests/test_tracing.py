@@ -0,0 +1,47 @@
+import json
+from datetime import date
+
+import db
+import tracing
+
+PRODUCTS = list(range(700, 712))
+
+def test_spans_nest_and_record_queries(standin):
+    trace = tracing.start_trace()
+    with tracing.span("get_sales_df", "data", cache="memory"):
+        tracing.annotate(cache="miss")
+        db.load_sales_filtered(standin, date(2022, 1, 1), date(2022, 2, 1), (), PRODUCTS)
+    tracing.finish_trace(trace)
+
+    query, data = trace.spans
+    assert data.name == "get_sales_df" and data.attributes["cache"] == "miss"
+    assert query.kind == "query" and query.parent_id == data.span_id
+    assert query.attributes["params"] == 3  # datas + lista de produtos (um parâmetro)
+    assert query.attributes["rows"] > 0 and query.attributes["bytes"] > 0
+
+def test_fingerprint_ignores_in_list_length(standin):
+    trace = tracing.start_trace()
+    for products in (PRODUCTS[:1], PRODUCTS[:5], PRODUCTS):
+        db.load_sales_by_state(standin, date(2022, 1, 1), date(2022, 2, 1), products)
+    tracing.finish_trace(trace)
+
+    assert len({s.attributes["sql_fingerprint"] for s in trace.spans}) == 1
+
+def test_no_trace_means_no_spans(standin):
+    with tracing.span("outside") as current:
+        current.set(rows=1)
+    db.load_sales_by_state(standin, date(2022, 1, 1), date(2022, 2, 1), PRODUCTS)
+    assert tracing.current_trace() is None
+
+def test_jsonl_export(tmp_path):
+    trace = tracing.start_trace()
+    with tracing.span("render_map", "render"):
+        pass
+    tracing.finish_trace(trace)
+
+    path = tmp_path / "trace.jsonl"
+    tracing.export_jsonl(trace, path)
+    (record,) = [json.loads(line) for line in path.read_text().splitlines()]
+    assert record["traceId"] == trace.trace_id
+    assert record["name"] == "render_map" and record["endTimeUnixNano"] >= record["startTimeUnixNano"]
+    assert "render_map" in set(tracing.percentiles()["name"])
@@ -0,0 +1,224 @@
+import contextvars
+import functools
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# Painel de desempenho na sidebar (também via ?debug=1 na URL)
+DEBUG = os.environ.get("HEXAGON_DEBUG") == "1"
+
+# Se definido, cada rerun é anexado a este arquivo (um span por linha)
+TRACE_FILE = os.environ.get("HEXAGON_TRACE_FILE")
+
+# Spans mantidos em memória para p50/p95 do processo (todas as sessões)
+RECENT_SPANS = 5000
+
+_current_trace = contextvars.ContextVar("hexagon_trace", default=None)
+_current_span = contextvars.ContextVar("hexagon_span", default=None)
+
+_recent = deque(maxlen=RECENT_SPANS)
+_export_lock = threading.Lock()
+
+class Span:
+    __slots__ = ("name", "kind", "span_id", "parent_id", "start_ns", "end_ns", "attributes")
+
+    def __init__(self, name, kind, parent_id, start_ns, attributes):
+        self.name = name
+        self.kind = kind
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start_ns = start_ns
+        self.end_ns = None
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+class _NullSpan:
+    def set(self, **attributes):
+        pass
+
+NULL_SPAN = _NullSpan()
+
+class Trace:
+    """Spans de um rerun (o script principal e as threads que ele dispara)."""
+
+    def __init__(self, name="rerun"):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    @property
+    def duration_ms(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def records(self):
+        """Spans no formato dos registros OpenTelemetry (JSON)."""
+        with self._lock:
+            spans = list(self.spans)
+        return [
+            {
+                "traceId": self.trace_id,
+                "spanId": s.span_id,
+                "parentSpanId": s.parent_id,
+                "name": s.name,
+                "kind": s.kind,
+                "startTimeUnixNano": s.start_ns,
+                "endTimeUnixNano": s.end_ns,
+                "durationMs": round(s.duration_ms, 3),
+                "attributes": s.attributes,
+            }
+            for s in spans
+        ]
+
+# =========================
+# Ciclo do trace
+# =========================
+def start_trace(name="rerun"):
+    trace = Trace(name)
+    _current_trace.set(trace)
+    _current_span.set(None)
+    return trace
+
+def finish_trace(trace):
+    trace.end_ns = time.time_ns()
+    _current_trace.set(None)
+    _recent.extend((s.kind, s.name, s.duration_ms) for s in trace.spans)
+    _recent.append(("rerun", trace.name, trace.duration_ms))
+    if TRACE_FILE:
+        export_jsonl(trace, TRACE_FILE)
+
+def to_json(record):
+    return json.dumps(record, default=str)
+
+def export_jsonl(trace, path):
+    lines = [to_json(r) for r in trace.records()]
+    with _export_lock, open(path, "a", encoding="utf-8") as fh:
+        fh.write("\n".join(lines) + "\n")
+
+def current_trace():
+    return _current_trace.get()
+
+# =========================
+# Spans
+# =========================
+@contextmanager
+def span(name, kind="internal", **attributes):
+    """Mede o bloco como filho do span atual; não faz nada fora de um trace."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield NULL_SPAN
+        return
+
+    parent = _current_span.get()
+    current = Span(name, kind, parent.span_id if parent else None, time.time_ns(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as exc:
+        current.set(error=type(exc).__name__)
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        trace.add(current)
+
+def record(name, kind, start_ns, **attributes):
+    """Registra um span já terminado (ex.: medido dentro de um gerador)."""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    parent = _current_span.get()
+    finished = Span(name, kind, parent.span_id if parent else None, start_ns, attributes)
+    finished.end_ns = time.time_ns()
+    trace.add(finished)
+
+def annotate(**attributes):
+    """Acrescenta atributos ao span atual (ex.: cache="miss")."""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
+
+def result_size(result):
+    # (linhas, bytes) de um DataFrame ou de uma tupla de DataFrames
+    frames = result if isinstance(result, tuple) else (result,)
+    frames = [f for f in frames if isinstance(f, pd.DataFrame)]
+    if not frames:
+        return None, None
+    rows = sum(len(f) for f in frames)
+    size = sum(int(f.memory_usage(index=False).sum()) for f in frames)
+    return rows, size
+
+def traced(name=None, kind="data", **attributes):
+    """Decorador: cada chamada vira um span com linhas/bytes do resultado."""
+
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return fn(*args, **kwargs)
+            with span(span_name, kind, **attributes) as current:
+                result = fn(*args, **kwargs)
+                rows, size = result_size(result)
+                if rows is not None:
+                    current.set(rows=rows, bytes=size)
+                return result
+
+        return wrapper
+
+    return decorator
+
+# =========================
+# SQL
+# =========================
+_IN_LIST = re.compile(r"\(\s*\?(\s*,\s*\?)*\s*\)")
+_SPACES = re.compile(r"\s+")
+
+def normalize_sql(sql):
+    # Listas IN de qualquer tamanho viram "(?...)" e o espaçamento é unificado
+    return _SPACES.sub(" ", _IN_LIST.sub("(?...)", sql)).strip()
+
+def sql_fingerprint(sql):
+    return hashlib.sha1(normalize_sql(sql).encode("utf-8")).hexdigest()[:12]
+
+# =========================
+# Agregados do processo
+# =========================
+def percentiles():
+    """p50/p95 por (tipo, nome) dos spans recentes de todas as sessões."""
+    by_name = {}
+    for kind, name, ms in list(_recent):
+        by_name.setdefault((kind, name), []).append(ms)
+    rows = [
+        {
+            "kind": kind,
+            "name": name,
+            "count": len(values),
+            "p50_ms": float(np.percentile(values, 50)),
+            "p95_ms": float(np.percentile(values, 95)),
+        }
+        for (kind, name), values in by_name.items()
+    ]
+    return pd.DataFrame(rows, columns=["kind", "name", "count", "p50_ms", "p95_ms"])